@@ -8,8 +8,6 @@ from datetime import datetime
 # Set UTF-8 encoding for stdout to handle Unicode characters
 if sys.stdout.encoding != 'utf-8':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-import requests
-import segno
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.platypus import Table, TableStyle, Paragraph
@@ -25,6 +23,7 @@ import re
 from datetime import datetime
 from reportlab.lib.utils import ImageReader
 from PyPDF2 import PdfFileReader, PdfFileWriter
+from zwennpay_qr import QRPrefetch, build_qr_payload, get_qr_concurrency, make_qr_image
 
 # Verify font files exist
 cambria_regular_path = os.path.join(os.path.dirname(__file__), 'fonts', 'cambria.ttf')
@@ -228,6 +227,45 @@ styles['TableTextBold'] = ParagraphStyle(
     alignment=1
 )
 
+def build_full_name(first_name, surname):
+    """Build the QR customer label: first initial + surname, max 24 chars"""
+    # Handle NaN and non-string values safely
+    first_initial = ''
+    if first_name and isinstance(first_name, str) and len(first_name) > 0 and first_name.lower() != 'nan':
+        first_initial = first_name[0].upper()
+    # Handle surname safely (check for NaN and non-string values)
+    surname_part = ''
+    if surname and isinstance(surname, str) and surname.lower() != 'nan':
+        surname_part = surname.strip()
+
+    # Combine and ensure max 24 characters
+    if first_initial and surname_part:
+        return f"{first_initial} {surname_part}"[:24]
+    elif surname_part:
+        return surname_part[:24]
+    return ''
+
+
+def build_row_qr_payload(row):
+    """Build the ZwennPay QR payload for one row (merchant 151, NIC as purpose)"""
+    policy_no = str(row.get('Policy No', '')) if pd.notna(row.get('Policy No', '')) else ''
+    full_name = build_full_name(row.get('Owner 1 First Name', ''), row.get('Owner 1 Surname', ''))
+    return build_qr_payload(151, policy_no.replace('/', '.'), row.get('MOBILE_NO', ''), full_name,
+                            purpose=row.get('NIC', ''))
+
+
+def needs_qr_code(row):
+    """True when the row has a policy number, i.e. a letter will be generated"""
+    policy_no = row.get('Policy No', '')
+    return pd.notna(policy_no) and str(policy_no).strip() != ''
+
+
+# Fetch every row's QR code concurrently over one keep-alive session while PDFs render
+qr_prefetch = QRPrefetch(
+    {index: build_row_qr_payload(row) for index, row in df.iterrows() if needs_qr_code(row)},
+    get_qr_concurrency(sys.argv)
+)
+
 # Iterate through each row in the DataFrame to process individual policyholder data
 for index, row in df.iterrows():
     # Enhanced progress reporting for large files
@@ -297,23 +335,7 @@ for index, row in df.iterrows():
     print(f"[NIC] Record {index + 1}: NIC = '{nic}' (type: {type(nic)})")
     
     # Create full_name variable (first letter of first name + surname, max 24 chars)
-    # Handle NaN and non-string values safely
-    first_initial = ''
-    if owner1_first_name and isinstance(owner1_first_name, str) and len(owner1_first_name) > 0 and owner1_first_name.lower() != 'nan':
-        first_initial = owner1_first_name[0].upper()
-    # Handle surname safely (check for NaN and non-string values)
-    surname_part = ''
-    if owner1_surname and isinstance(owner1_surname, str) and owner1_surname.lower() != 'nan':
-        surname_part = owner1_surname.strip()
-    
-    # Combine and ensure max 24 characters
-    if first_initial and surname_part:
-        full_name_temp = f"{first_initial} {surname_part}"
-        full_name = full_name_temp[:24] if len(full_name_temp) > 24 else full_name_temp
-    elif surname_part:
-        full_name = surname_part[:24] if len(surname_part) > 24 else surname_part
-    else:
-        full_name = ''
+    full_name = build_full_name(owner1_first_name, owner1_surname)
     
     print(f"[DEBUG] Full Name (max 24 chars): '{full_name}' (length: {len(full_name)})")
     
@@ -340,72 +362,29 @@ for index, row in df.iterrows():
         safe_name = re.sub(r'[^\w\s-]', '', name).strip().replace(' ', '_')
         safe_policy = re.sub(r'[^\w\s-]', '_', str(policy_no)).strip()
 
-    # Generate QR Code for payment
+    # QR Code for payment, requested in the background by qr_prefetch
     if total_rows > 1000 and current_row % 50 == 0:
-        print(f"[PROGRESS] Row {current_row}: Generating QR code...")
+        print(f"[PROGRESS] Row {current_row}: Waiting for prefetched QR code...")
+    qr_result = qr_prefetch.get(index)
     try:
-        payload = {
-            "MerchantId": 151,
-            "SetTransactionAmount": False,
-            "TransactionAmount": 0,
-            "SetConvenienceIndicatorTip": False,
-            "ConvenienceIndicatorTip": 0,
-            "SetConvenienceFeeFixed": False,
-            "ConvenienceFeeFixed": 0,
-            "SetConvenienceFeePercentage": False,
-            "ConvenienceFeePercentage": 0,
-            "SetAdditionalBillNumber": True,
-            "AdditionalRequiredBillNumber": False,
-            "AdditionalBillNumber": str(policy_no_api),
-            "SetAdditionalMobileNo": True,
-            "AdditionalRequiredMobileNo": False,
-            "AdditionalMobileNo": str(mobile_no),
-            "SetAdditionalStoreLabel": False,
-            "AdditionalRequiredStoreLabel": False,
-            "AdditionalStoreLabel": "",
-            "SetAdditionalLoyaltyNumber": False,
-            "AdditionalRequiredLoyaltyNumber": False,
-            "AdditionalLoyaltyNumber": "",
-            "SetAdditionalReferenceLabel": False,
-            "AdditionalRequiredReferenceLabel": False,
-            "AdditionalReferenceLabel": "",
-            "SetAdditionalCustomerLabel": True,
-            "AdditionalRequiredCustomerLabel": False,
-            "AdditionalCustomerLabel": str(full_name),
-            "SetAdditionalTerminalLabel": False,
-            "AdditionalRequiredTerminalLabel": False,
-            "AdditionalTerminalLabel": "",
-            "SetAdditionalPurposeTransaction": True,
-            "AdditionalRequiredPurposeTransaction": False,
-            "AdditionalPurposeTransaction": str(nic)
-        }
-        
-        if total_rows > 1000 and current_row % 50 == 0:
-            print(f"[PROGRESS] Row {current_row}: Making API call for QR code...")
-        
-        response = requests.post(
-            "https://api.zwennpay.com:9425/api/v1.0/Common/GetMerchantQR",
-            headers={"accept": "text/plain", "Content-Type": "application/json"},
-            json=payload,
-            timeout=20
-        )
-        
-        if response.status_code == 200:
-            qr_data = str(response.text).strip()
-            if not qr_data or qr_data.lower() in ('null', 'none', 'nan'):
+        if qr_result['network_error']:
+            print(f"⚠️ Network error while generating QR for {name}: {qr_result['error']}")
+            continue
+        if qr_result['error']:
+            print(f"⚠️ Error generating QR for {name}: {qr_result['error']}")
+            continue
+
+        if qr_result['status_code'] == 200:
+            qr_data = qr_result['qr_data']
+            if not qr_data:
                 print(f"⚠️ No valid QR data received for {name}")
                 continue
                 
-            qr = segno.make(qr_data, error='L')
-            qr_filename = f"qr_{safe_policy}.png"
-            qr.save(qr_filename, scale=8, border=2, dark='#000000')
+            qr_image = make_qr_image(qr_data)
         else:
-            print(f"❌ API request failed for {name}: {response.status_code} - {response.text}")
+            print(f"❌ API request failed for {name}: {qr_result['status_code']} - {qr_result['response_text']}")
             continue
 
-    except requests.exceptions.RequestException as e:
-        print(f"⚠️ Network error while generating QR for {name}: {str(e)}")
-        continue
     except Exception as e:
         print(f"⚠️ Error generating QR for {name}: {str(e)}")
         continue
@@ -594,7 +573,7 @@ for index, row in df.iterrows():
     y_pos -= para11.height + 10  # Space before QR code section
 
     # Compact QR code section with logos for single page layout
-    if os.path.exists(qr_filename):
+    if qr_image:
         page_center_x = width / 2
         
         # Add maucas logo (bigger size using available space)
@@ -616,7 +595,7 @@ for index, row in df.iterrows():
         # Add QR code (optimal size for scanning)
         qr_size = 100  # Back to 100px for reliable scanning
         qr_x = page_center_x - (qr_size / 2)
-        c.drawImage(qr_filename, qr_x, y_pos - qr_size, width=qr_size, height=qr_size)
+        c.drawImage(qr_image, qr_x, y_pos - qr_size, width=qr_size, height=qr_size)
         y_pos -= qr_size + 2
         
         # Add ZwennPay logo (smaller size)
@@ -727,10 +706,6 @@ for index, row in df.iterrows():
         except Exception as copy_error:
             print(f"❌ Failed to copy PDF: {str(copy_error)}")
 
-    # Clean up QR code file
-    if os.path.exists(qr_filename):
-        os.remove(qr_filename)
-
     if total_rows > 1000 and current_row % 50 == 0:
         print(f"[PROGRESS] Row {current_row}: PDF completed successfully!")
     
@@ -738,4 +713,6 @@ for index, row in df.iterrows():
     print(f"   📁 Protected: {protected_pdf_filename}")
     print(f"   📁 Unprotected: {unprotected_pdf_filename}")
 
+qr_prefetch.close()
+
 print(f"🎉 Script completed. Processed {len(df)} rows total.")
\ No newline at end of file
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# NICL Address Splitter Benchmark - Golden corpus check and micro-benchmark
+# Verifies split_mauritius_address() against address_golden.json and times it
+#
+# Usage:
+#   python address_benchmark.py                  check the golden corpus, then time it
+#   python address_benchmark.py --repeat 20      time 20 passes over the corpus
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from address_splitter import MAURITIUS_TOWNS, split_mauritius_address
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'address_golden.json')
+
+# Hand-picked shapes covering every branch of the splitter
+SAMPLE_ADDRESSES = [
+    "", "   ", "Vacoas", "Royal Road Vacoas", "12 Royal Road, Vacoas",
+    "12 Royal Road, Cite Ste Claire, Goodlands", "12 Royal Road, Cite Ste Claire",
+    "12, Royal Road, Cite Ste Claire, Near Church, Goodlands",
+    "Flat 4 Block B, Lotissement Les Pailles, Off Sir Seewoosagur Ramgoolam Street, Port Louis",
+    "Morcellement Raffray c/o ABC Ltd Quatre Bornes", "Avenue des Lilas C/O Mr Jean Pierre Grand Baie",
+    "Royal Road care of Mrs Devi Ramsamy Shop Keeper Near Market Place Ltd",
+    "Royal Road c/o nobody", "Vacoas Phoenix", "Avenue Berthaud Beau Bassin Rose Hill",
+    "Petite Riviere Noire Coastal Road", "Coastal Road Petite Riviere Noire",
+    "Cite La Cure Morcellement Avenue Port Louis", "NHDC Complex Block 2 Flat 5 Cite Argy Flacq",
+    "Pavement Street Near Estate", "Pave Pave Pave", "Rose Hill Rose Hill", "poudre d'or hamlet royal road",
+    "ROYAL ROAD CUREPIPE", "royal road curepipe", "Camp  de  Masque  Pave", "Tamarin\tBay Road",
+    "Rue Édith Cavell Curepipe", "İnci Lane Rose Belle", "Straße Moka",
+    "One Two Three Four", "One Two Three Four Five", "One Two Three Four Five Six",
+    "One Two Three Four Five Six Seven Eight Nine Ten",
+    "Lot 5 Business Park Rd Ebene", "Residence Gardens Heights Road Forest Side Curepipe",
+    "St Jean Road Quatre Bornes", "Moka", "A,B", ",,,", "A, B, C, D, E, F",
+    "c/o", "Near Bambous Virieux Village", "Bambous Virieux", "Old Pailles Road, Old Pailles",
+]
+
+STREET_WORDS = ['Royal Road', 'Main Street', 'Avenue des Lilas', 'Sir Virgil Naz Street', 'La Paix Lane',
+                'Jasmin Close', 'Coastal Rd', 'St Jean Rd', 'Boulevard Victoria', 'Rue Desforges',
+                'Impasse Bois Cheri', 'Ave Berthaud', 'Trunk Road', 'Cemetery Way', 'Hermitage Drive']
+AREA_WORDS = ['Morcellement Raffray', 'Cite Ste Claire', 'NHDC Complex', 'Lotissement Les Pailles',
+              'Residence La Tour', 'Camp Levieux', 'Business Park', 'Gardens Estate', 'Block A Flat 3',
+              'Near Police Station', 'Opposite Temple', 'Ebene Heights', 'Tower 2', 'Court House']
+NAME_WORDS = ['Mr Jean Pierre', 'ABC Ltd', 'Mrs Devi Ramsamy', 'NIC Head Office', 'Shop Keeper',
+              'Hardware Store', 'Ltd Company', 'Ms Li']
+
+
+def build_corpus(count=3000, seed=2024):
+    """Deterministic synthetic addresses (no customer data) plus the hand-picked shapes"""
+    rng = random.Random(seed)
+    towns = MAURITIUS_TOWNS + ['Ebene', 'Bagatelle', 'Pointe aux Sables', 'Unknown Village']
+    corpus = list(SAMPLE_ADDRESSES)
+    for _ in range(count):
+        number = str(rng.randint(1, 250))
+        street = rng.choice(STREET_WORDS)
+        area = rng.choice(AREA_WORDS)
+        town = rng.choice(towns)
+        name = rng.choice(NAME_WORDS)
+        shape = rng.randrange(9)
+        if shape == 0:
+            address = f"{number} {street}, {town}"
+        elif shape == 1:
+            address = f"{number}, {street}, {area}, {town}"
+        elif shape == 2:
+            address = f"{area}, {street}"
+        elif shape == 3:
+            address = f"{street} c/o {name} {town}"
+        elif shape == 4:
+            address = f"{number} {street} {area} {town}"
+        elif shape == 5:
+            address = f"{area} {number} {street} {town} {rng.choice(towns)}"
+        elif shape == 6:
+            address = f"{area} {name} {number}"
+        elif shape == 7:
+            address = f"{town} {area} {name}"
+        else:
+            address = ' '.join(rng.sample(f"{number} {street} {area} {town} {name}".split(), rng.randint(1, 8)))
+        case = rng.randrange(4)
+        if case == 1:
+            address = address.upper()
+        elif case == 2:
+            address = address.lower()
+        corpus.append(address)
+    return corpus
+
+
+def check_golden():
+    """Compare every golden split with the current splitter; return the mismatch count"""
+    with open(GOLDEN_FILE, encoding='utf-8') as handle:
+        golden = json.load(handle)
+    mismatches = 0
+    for address, expected in golden:
+        actual = split_mauritius_address(address)
+        if actual != expected:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"   ❌ {address!r}: expected {expected}, got {actual}")
+    print(f"   {'✅' if mismatches == 0 else '❌'} Golden corpus: {len(golden) - mismatches}/{len(golden)} identical splits")
+    return mismatches
+
+
+def run_benchmark(repeat):
+    """Time split_mauritius_address over the synthetic corpus"""
+    corpus = build_corpus()
+    print(f"⏱️  Splitting {len(corpus)} addresses x {repeat}...")
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for address in corpus:
+            split_mauritius_address(address)
+    elapsed = time.perf_counter() - start
+    per_address = elapsed / (repeat * len(corpus)) * 1e6
+    print(f"   {elapsed:.2f}s - {per_address:.1f} µs per address ({1e6 / per_address:,.0f} addresses/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Golden corpus check and micro-benchmark for the address splitter')
+    parser.add_argument('--repeat', type=int, default=5, help='Passes over the corpus for the timing run')
+    args = parser.parse_args()
+
+    print("🔎 Checking address splits against the golden corpus...")
+    if check_golden():
+        sys.exit(1)
+    run_benchmark(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# NICL Address Cache - Memoized split_mauritius_address results
+# The same FULL_ADDRESS comes back across products, across the L0/L1/L2/MED passes
+# and across monthly runs. A bounded in-process LRU answers repeats; behind it an
+# optional SQLite file (ADDRESS_CACHE=1) is shared by every generator and run.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from address_splitter import split_mauritius_address
+
+ADDRESS_CACHE_DB = os.environ.get(
+    'ADDRESS_CACHE_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'address_cache.sqlite')
+)
+ADDRESS_CACHE_LRU_SIZE = int(os.environ.get('ADDRESS_CACHE_LRU_SIZE', '50000'))
+ADDRESS_CACHE_MAX_ENTRIES = int(os.environ.get('ADDRESS_CACHE_MAX_ENTRIES', '500000'))
+
+# Bump when split_mauritius_address() changes its output, so stored splits are not reused
+SPLITTER_VERSION = '1'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS address_cache (
+    address_hash TEXT PRIMARY KEY,
+    lines TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_address_cache_created ON address_cache (created_at);
+"""
+
+
+def address_disk_cache_enabled():
+    """The on-disk layer is optional - switch it on with ADDRESS_CACHE=1"""
+    return os.environ.get('ADDRESS_CACHE', '0').lower() in ('1', 'true', 'yes', 'on')
+
+
+def normalize_address(full_address):
+    """The text the splitter actually works on (it keeps inner spacing and case)"""
+    return str(full_address).strip()
+
+
+def address_hash(normalized):
+    """Disk cache key: splitter version + normalized address"""
+    return hashlib.sha1(f"{SPLITTER_VERSION}\0{normalized}".encode('utf-8')).hexdigest()
+
+
+class AddressCache:
+    """Bounded LRU of address splits with an optional SQLite layer behind it
+
+    The SQLite table is read in one query on first use and new splits are written
+    in one batch by flush(), so the disk layer never costs a query per address.
+    """
+
+    def __init__(self, lru_size=ADDRESS_CACHE_LRU_SIZE, db_path=None, max_entries=ADDRESS_CACHE_MAX_ENTRIES):
+        self.lru_size = lru_size
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._disk = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open_default(cls):
+        """Process-wide cache, with the disk layer when ADDRESS_CACHE=1"""
+        return cls(db_path=ADDRESS_CACHE_DB if address_disk_cache_enabled() else None)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _load_disk(self):
+        """Read every stored split once (empty when the disk layer is off or unusable)"""
+        self._disk = {}
+        if not self.db_path:
+            return
+        try:
+            conn = self._connect()
+            try:
+                self._disk = dict(conn.execute('SELECT address_hash, lines FROM address_cache'))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"[WARNING] Address cache unavailable ({self.db_path}): {str(e)}")
+            self.db_path = None
+
+    def split(self, full_address):
+        """split_mauritius_address(full_address), answered from the cache when possible"""
+        if not full_address:
+            return split_mauritius_address(full_address)
+        normalized = normalize_address(full_address)
+        with self._lock:
+            lines = self._lru.get(normalized)
+            if lines is not None:
+                self._lru.move_to_end(normalized)
+                self.hits += 1
+                return list(lines)
+
+            if self._disk is None:
+                self._load_disk()
+            key = address_hash(normalized)
+            stored = self._disk.get(key)
+            if stored is not None:
+                lines = json.loads(stored)
+                self.disk_hits += 1
+            else:
+                lines = split_mauritius_address(full_address)
+                self.misses += 1
+                if self.db_path:
+                    self._pending[key] = json.dumps(lines, ensure_ascii=False)
+
+            self._lru[normalized] = tuple(lines)
+            if len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+            return list(lines)
+
+    def flush(self):
+        """Write the splits computed since the last flush and trim the table"""
+        with self._lock:
+            if not self.db_path or not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            try:
+                conn = self._connect()
+                try:
+                    now = time.time()
+                    conn.executemany('INSERT OR REPLACE INTO address_cache VALUES (?, ?, ?)',
+                                     [(key, lines, now) for key, lines in pending.items()])
+                    count = conn.execute('SELECT COUNT(*) FROM address_cache').fetchone()[0]
+                    if count > self.max_entries:
+                        conn.execute(
+                            'DELETE FROM address_cache WHERE address_hash IN '
+                            '(SELECT address_hash FROM address_cache ORDER BY created_at LIMIT ?)',
+                            (count - self.max_entries,)
+                        )
+                    conn.commit()
+                finally:
+                    conn.close()
+                self._disk.update(pending)
+            except sqlite3.Error as e:
+                print(f"[WARNING] Could not update address cache ({self.db_path}): {str(e)}")
+
+    def summary(self):
+        """One line for the run summary"""
+        total = self.hits + self.disk_hits + self.misses
+        source = f", {self.disk_hits} from disk" if self.db_path else ""
+        return (f"Address cache: {self.hits + self.disk_hits}/{total} hits "
+                f"({self.hits} in memory{source}), {self.misses} misses")
+
+
+_default_cache = None
+
+def get_address_cache():
+    """The process-wide AddressCache shared by every letter template"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AddressCache.open_default()
+    return _default_cache
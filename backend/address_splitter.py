@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+# NICL Address Splitter - FULL_ADDRESS to three letter lines
+# The town list and street/area indicators are compiled once at import into
+# regular expressions, so each address is scanned in a single pass instead of
+# once per town. address_benchmark.py checks the splits against a golden corpus.
+
+import re
+
+import pandas as pd
+
+# Comprehensive Mauritius locations list - the order decides which town wins
+MAURITIUS_TOWNS = [
+    # Major Cities & Towns
+    'Port Louis', 'Curepipe', 'Quatre Bornes', 'Vacoas', 'Rose Hill',
+    'Beau Bassin', 'Phoenix', 'Floreal', 'Moka', 'Mahebourg',
+
+    # Port Louis District
+    'Pamplemousses', 'Triolet', 'Goodlands', 'Grand Baie', 'Terre Rouge',
+    'Sodnac', 'Coromandel', 'Camp Thorel', 'Arsenal', 'Mapou',
+
+    # Plaines Wilhems District
+    'Forest Side', 'Vacoas Phoenix', 'Beau Bassin Rose Hill',
+
+    # Moka District
+    'Quartier Militaire', 'Dagotiere', 'Providence', 'Melrose', 'Verdun',
+
+    # Rivière du Rempart District
+    'Riviere du Rempart', 'Pereybere', 'Cap Malheureux', 'Poudre d\'Or',
+    'Poudre D\'or Hamlet', 'Grand Gaube', 'Calodyne', 'Anse La Raie',
+
+    # Flacq District
+    'Centre de Flacq', 'Central Flacq', 'Flacq', 'Belle Mare',
+    'Trou d\'Eau Douce', 'Quatre Cocos', 'Bras d\'Eau', 'Camp de Masque',
+    'Ecroignard', 'Poste de Flacq', 'Queen Victoria', 'Sebastopol',
+
+    # Grand Port District
+    'Rose Belle', 'New Grove', 'Plaine Magnien', 'Riviere des Anguilles',
+    'Cluny', 'Union Park', 'Grand Sable', 'Bambous Virieux', 'Carre Curieux',
+    'Ferney', 'Vieux Grand Port', 'Bel Air Riviere Seche',
+
+    # Savanne District
+    'Souillac', 'Riviere des Galets', 'Bel Ombre', 'Chemin Grenier',
+    'Baie du Cap', 'Saint Felix', 'Tyack', 'Britannia', 'Saint Aubin',
+    'Surinam', 'L\'Escalier', 'Riambel',
+
+    # Black River District
+    'Tamarin', 'Flic en Flac', 'Albion', 'La Gaulette', 'Case Noyale',
+    'Chamarel', 'Le Morne', 'Petite Riviere Noire', 'Grande Riviere Noire',
+    'Bambous', 'Yemen', 'Cascavelle', 'Wolmar',
+
+    # Additional Areas from Sample Data
+    'Petite Riviere', 'Les Mariannes', 'Long Mountain', 'Palma', 'Bon Air',
+    'Saint Pierre', 'Pave', 'Mont Roches', 'Amaury', 'Lalmatie',
+    'Plaine Des Papayes', 'Fond Du Sac', 'Camp Charlot', 'Camp Barbe',
+    'Lagrement', 'La Source', 'Dispensary Road', 'Old Pailles',
+
+    # Rodrigues
+    'Port Mathurin', 'Mont Lubin', 'La Ferme', 'Anse aux Anglais',
+    'Coromandel', 'Graviers', 'Patate', 'Roche Bon Dieu'
+]
+
+# Street indicators (expanded)
+STREET_INDICATORS = ['Street', 'Road', 'Avenue', 'Lane', 'Close', 'Way', 'Drive',
+                     'Crescent', 'St', 'Rd', 'Ave', 'Boulevard', 'Blvd']
+
+# Area indicators
+AREA_INDICATORS = ['Morcellement', 'Cite', 'Complex', 'Tower', 'Court', 'House',
+                   'Building', 'Estate', 'Park', 'Gardens', 'Heights', 'Lotissement',
+                   'NHDC', 'Business']
+
+
+def _trie_pattern(names):
+    """Regex matching the longest of names at a position, built from a character trie"""
+    trie = {}
+    for name in names:
+        node = trie
+        for char in name:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def pattern(node):
+        branches = [re.escape(char) + pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if '' in node:
+            # Greedy optional group: the longer name is tried first
+            return f"(?:{'|'.join(branches)})?"
+        return branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+
+    return pattern(trie)
+
+
+class Gazetteer:
+    """Place names compiled into one trie regex, searched case-insensitively in list order
+
+    Each scan reports every listed name occurring in the text, including names
+    nested at the same position ('Vacoas' inside 'Vacoas Phoenix'), so callers
+    can pick the first name in list order exactly as a loop over the list would.
+    """
+
+    def __init__(self, names):
+        # Lowercased names in list order (a repeated name keeps its first rank)
+        self.names = list(dict.fromkeys(name.lower() for name in names))
+        self._rank = {name: rank for rank, name in enumerate(self.names)}
+        trie = _trie_pattern(self.names)
+        # Zero-width lookaheads so overlapping occurrences are all reported
+        self._anywhere = re.compile(f"(?=({trie}))")
+        self._whole_words = re.compile(f"(?<![^ ])(?=({trie})(?![^ ]))")
+        # Names that also match wherever a longer name matches
+        self._nested = {
+            name: [other for other in self.names if name.startswith(other)] for name in self.names
+        }
+        self._nested_words = {
+            name: [other for other in self._nested[name] if len(other) == len(name) or name[len(other)] == ' ']
+            for name in self.names
+        }
+
+    def _occurrences(self, text, whole_words=False):
+        """{name: [start positions]} for every listed name in the lowercased text"""
+        pattern, nested = (self._whole_words, self._nested_words) if whole_words else (self._anywhere, self._nested)
+        found = {}
+        for match in pattern.finditer(text):
+            for name in nested[match.group(1)]:
+                found.setdefault(name, []).append(match.start())
+        return found
+
+    def contains_any(self, text):
+        """True when any listed name is a substring of text (case-insensitive)"""
+        return self._anywhere.search(text.lower()) is not None
+
+    def first_listed(self, text):
+        """The first listed name (lowercased) that is a substring of text, or None"""
+        found = self._occurrences(text.lower())
+        return min(found, key=self._rank.get) if found else None
+
+    def first_listed_words(self, words, last=False):
+        """Word index of the first listed name spelled by consecutive words, or None
+
+        Returns its first occurrence, or its last one when last is True.
+        """
+        joined = ' '.join(words).lower()
+        found = self._occurrences(joined, whole_words=True)
+        if not found:
+            return None
+        positions = found[min(found, key=self._rank.get)]
+        position = positions[-1] if last else positions[0]
+        return joined.count(' ', 0, position)
+
+
+def _indicator_pattern(indicators):
+    """Regex finding any indicator inside a lowercased word"""
+    return re.compile('|'.join(re.escape(indicator.lower()) for indicator in indicators))
+
+
+TOWNS = Gazetteer(MAURITIUS_TOWNS)
+STREET_PATTERN = _indicator_pattern(STREET_INDICATORS)
+AREA_PATTERN = _indicator_pattern(AREA_INDICATORS)
+
+
+def _first_indicator(words, indicator_pattern):
+    """Index of the first word containing an indicator, or None"""
+    for i, word in enumerate(words):
+        if indicator_pattern.search(word.lower()):
+            return i
+    return None
+
+
+# Function to split Mauritius addresses intelligently
+def split_mauritius_address(full_address):
+    """Split FULL_ADDRESS into 3 lines based on real Mauritius address patterns"""
+    if not full_address or pd.isna(full_address):
+        return ["", "", ""]
+
+    address = str(full_address).strip()
+
+    parts = []
+
+    # Step 1: Handle comma-separated addresses first
+    if ',' in address:
+        comma_parts = [part.strip() for part in address.split(',') if part.strip()]
+        if len(comma_parts) >= 2:
+            # Check if last part is a town
+            last_part = comma_parts[-1]
+            is_town_last = TOWNS.contains_any(last_part)
+
+            if is_town_last:
+                if len(comma_parts) == 2:
+                    parts = [comma_parts[0], "", comma_parts[1]]
+                else:
+                    parts = [comma_parts[0], ' '.join(comma_parts[1:-1]), comma_parts[-1]]
+            else:
+                # Distribute comma parts across 3 lines
+                if len(comma_parts) == 2:
+                    parts = [comma_parts[0], comma_parts[1], ""]
+                elif len(comma_parts) == 3:
+                    parts = comma_parts
+                else:
+                    parts = [comma_parts[0], ' '.join(comma_parts[1:-1]), comma_parts[-1]]
+
+    # Step 2: Handle C/O patterns
+    if not parts and ('c/o' in address.lower() or 'care of' in address.lower()):
+        # Pattern: [street] C/O [company/details] [town]
+        co_match = re.search(r'(.*?)\s+(c/o|care of)\s+(.*)', address, re.IGNORECASE)
+        if co_match:
+            before_co = co_match.group(1).strip()
+            co_part = f"{co_match.group(2)} {co_match.group(3)}".strip()
+
+            # Find town in C/O part
+            town = TOWNS.first_listed(co_part)
+            if town:
+                town_idx = co_part.lower().rfind(town)
+                co_details = co_part[:town_idx].strip()
+                town_part = co_part[town_idx:].strip()
+                parts = [before_co, co_details, town_part]
+            else:
+                # No town found, split C/O part
+                co_words = co_part.split()
+                if len(co_words) > 6:
+                    mid = len(co_words) // 2
+                    parts = [before_co, ' '.join(co_words[:mid]), ' '.join(co_words[mid:])]
+                else:
+                    parts = [before_co, co_part, ""]
+
+    # Step 3: Handle regular patterns without commas or C/O
+    if not parts:
+        words = address.split()
+
+        # Find the town (usually at the end) - last occurrence of the first listed town
+        town_start_idx = TOWNS.first_listed_words(words, last=True)
+
+        if town_start_idx:
+            before_town_words = words[:town_start_idx]
+            town_words = words[town_start_idx:]
+
+            # Look for street indicators or area indicators in before_town_words
+            split_idx = 0
+
+            # First, look for street indicators
+            street_idx = _first_indicator(before_town_words, STREET_PATTERN)
+            if street_idx is not None:
+                split_idx = street_idx + 1
+
+            # If no street indicator, look for area indicators
+            if split_idx == 0:
+                area_idx = _first_indicator(before_town_words, AREA_PATTERN)
+                if area_idx is not None:
+                    split_idx = area_idx
+
+            # If still no split point and we have enough words, split roughly in middle
+            if split_idx == 0 and len(before_town_words) > 3:
+                split_idx = len(before_town_words) // 2
+
+            if split_idx > 0 and split_idx < len(before_town_words):
+                parts = [
+                    ' '.join(before_town_words[:split_idx]),
+                    ' '.join(before_town_words[split_idx:]),
+                    ' '.join(town_words)
+                ]
+            else:
+                parts = [
+                    ' '.join(before_town_words),
+                    "",
+                    ' '.join(town_words)
+                ]
+        else:
+            # No town found (or nothing before it), try to split by street indicators
+            street_idx = _first_indicator(words, STREET_PATTERN)
+            split_idx = street_idx + 1 if street_idx is not None else 0
+
+            if split_idx > 0 and split_idx < len(words):
+                remaining_words = words[split_idx:]
+                if len(remaining_words) > 3:
+                    mid = len(remaining_words) // 2
+                    parts = [
+                        ' '.join(words[:split_idx]),
+                        ' '.join(remaining_words[:mid]),
+                        ' '.join(remaining_words[mid:])
+                    ]
+                else:
+                    parts = [
+                        ' '.join(words[:split_idx]),
+                        ' '.join(remaining_words),
+                        ""
+                    ]
+
+    # If no clear separators, try intelligent splitting
+    if not parts:
+        words = address.split()
+
+        # Look for street indicators to separate street from area
+        street_part = []
+        area_part = []
+        town_part = []
+
+        street_idx = _first_indicator(words, STREET_PATTERN)
+        if street_idx is not None:
+            street_part = words[:street_idx + 1]
+            remaining_words = words[street_idx + 1:]
+
+            if remaining_words:
+                # Look for town names in remaining words
+                town_idx = TOWNS.first_listed_words(remaining_words)
+                if town_idx is not None:
+                    area_part = remaining_words[:town_idx]
+                    town_part = remaining_words[town_idx:]
+                else:
+                    # If no town found, split remaining words between area and town
+                    mid_point = len(remaining_words) // 2
+                    area_part = remaining_words[:mid_point]
+                    town_part = remaining_words[mid_point:]
+
+        # Create parts based on what we found
+        if street_part:
+            parts.append(' '.join(street_part))
+        if area_part:
+            parts.append(' '.join(area_part))
+        if town_part:
+            parts.append(' '.join(town_part))
+
+    # If still no parts, try splitting by town names
+    if not parts:
+        town = TOWNS.first_listed(address)
+        if town:
+            idx = address.lower().find(town)
+            before = address[:idx].strip()
+            town_and_after = address[idx:].strip()
+
+            if before:
+                # Try to split the "before" part if it's long
+                before_words = before.split()
+                if len(before_words) > 4:
+                    mid = len(before_words) // 2
+                    parts.append(' '.join(before_words[:mid]))
+                    parts.append(' '.join(before_words[mid:]))
+                else:
+                    parts.append(before)
+
+            parts.append(town_and_after)
+
+    # Final fallback: intelligent word distribution
+    if not parts:
+        words = address.split()
+        if len(words) <= 3:
+            parts = words
+        elif len(words) <= 6:
+            # For 4-6 words, try to make meaningful groups
+            if len(words) == 4:
+                parts = [words[0], ' '.join(words[1:2]), ' '.join(words[2:])]
+            elif len(words) == 5:
+                parts = [' '.join(words[:2]), words[2], ' '.join(words[3:])]
+            else:  # 6 words
+                parts = [' '.join(words[:2]), ' '.join(words[2:4]), ' '.join(words[4:])]
+        else:
+            # For longer addresses, distribute more evenly
+            third = len(words) // 3
+            parts = [
+                ' '.join(words[:third+1]),
+                ' '.join(words[third+1:2*third+1]),
+                ' '.join(words[2*third+1:])
+            ]
+
+    # Clean up and ensure exactly 3 lines, avoiding empty lines in the middle
+    result = []
+    for part in parts:
+        if part and part.strip():
+            result.append(part.strip())
+
+    # Ensure exactly 3 lines
+    while len(result) < 3:
+        result.append("")
+
+    # If more than 3 parts, combine intelligently
+    if len(result) > 3:
+        if len(result) == 4:
+            # Combine middle two parts
+            result = [result[0], f"{result[1]} {result[2]}", result[3]]
+        else:
+            # Keep first, combine middle parts, keep last
+            result = [result[0], ' '.join(result[1:-1]), result[-1]]
+
+    return result[:3]
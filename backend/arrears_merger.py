@@ -5,16 +5,113 @@ NICL Arrears Letters Merger
 Merges all individual arrears letters from respective folders into single PDFs for printing
 Handles L0, L1, L2, and MED recovery action types
 Maintains Excel row order through sequential filename sorting
+--optimize inserts each letter as a whole document and saves with object
+deduplication and stream compression (smaller print files, faster merges)
+--workers N merges ranges of letters in N processes and joins them in order (0 = one per CPU core)
+--concurrent-types merges L0, L1, L2 and MED at the same time, one process per type
+--compare also runs the original page-by-page merge of each type into a temporary
+file and reports its size and time next to the merge above
+Each merged PDF has one bookmark per letter and a <name>.index.json sidecar mapping
+sequence, POL_NO and policyholder to its pages (see letter_index.py)
 """
 
 import os
+import sys
 import glob
+import shutil
+import tempfile
+import time
 import fitz  # PyMuPDF
 import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from letter_index import bookmarks, clean_indexes, index_entries, index_path, write_index
+from letter_pool import get_worker_count
+from pdf_merge import merge_files_parallel
+from progress_events import emit
 
-def merge_recovery_letters(input_folder, output_folder, letter_type):
-    """Merge all letters from a specific recovery type folder"""
+# Save options of the --optimize mode: garbage=4 drops unused objects and merges
+# duplicates (the logos and font subsets every letter carries), deflate compresses
+# every uncompressed stream including images and fonts
+OPTIMIZED_SAVE_OPTIONS = {'garbage': 4, 'deflate': True, 'deflate_images': True, 'deflate_fonts': True}
+
+def merge_in_process(pdf_files, output_filepath, letter_type, optimize=False, report=True):
+    """Merge pdf_files in order in this process: whole documents with optimize, else page by page
+
+    Returns (files merged, pages, [(file name, pages, document info)] of the merged letters);
+    nothing is written when no file could be merged.
+    """
+    # Create new merged document
+    merged_doc = fitz.open()
+
+    total_pages = 0
+    processed_files = 0
+    letters = []
+
+    for i, pdf_file in enumerate(pdf_files, 1):
+        try:
+            filename = os.path.basename(pdf_file)
+
+            # Open the arrears letter PDF
+            letter_doc = fitz.open(pdf_file)
+            page_count = letter_doc.page_count
+
+            # Add all pages from this letter
+            if optimize:
+                merged_doc.insert_pdf(letter_doc)
+            else:
+                for page_num in range(page_count):
+                    merged_doc.insert_pdf(letter_doc, from_page=page_num, to_page=page_num)
+            letters.append((filename, page_count, letter_doc.metadata))
+
+            letter_doc.close()
+
+            total_pages += page_count
+            processed_files += 1
+
+            if report and (i % 50 == 0 or i == len(pdf_files)):  # Progress update every 50 files
+                print(f"   🔄 {letter_type} progress: {i}/{len(pdf_files)} files processed")
+
+        except Exception as e:
+            if report:
+                print(f"   ❌ Failed to process {filename}: {str(e)}")
+            continue
+
+    if processed_files == 0:
+        merged_doc.close()
+        return processed_files, total_pages, letters
+
+    # Save the merged PDF with one bookmark per letter
+    if report:
+        print(f"   💾 Saving merged PDF...")
+    merged_doc.set_toc(bookmarks(letters))
+    # garbage=4 stores identical streams once - the logos shared by every letter
+    if optimize:
+        merged_doc.save(output_filepath, **OPTIMIZED_SAVE_OPTIONS)
+    else:
+        merged_doc.save(output_filepath, garbage=4)
+    merged_doc.close()
+    return processed_files, total_pages, letters
+
+def measure_baseline(pdf_files, output_folder, letter_type):
+    """(size in MB, seconds) of the original page-by-page merge, written to a temporary file"""
+    temp_folder = tempfile.mkdtemp(prefix='.compare_', dir=output_folder)
+    try:
+        baseline_path = os.path.join(temp_folder, 'baseline.pdf')
+        started = time.time()
+        processed_files, _, _ = merge_in_process(pdf_files, baseline_path, letter_type, report=False)
+        elapsed = time.time() - started
+        if processed_files == 0:
+            return None, None
+        return os.path.getsize(baseline_path) / (1024 * 1024), elapsed
+    finally:
+        shutil.rmtree(temp_folder, ignore_errors=True)
+
+def merge_recovery_letters(input_folder, output_folder, letter_type, optimize=False, workers=1, compare=False):
+    """Merge all letters from a specific recovery type folder (workers > 1: parallel tree merge)
+
+    With compare, the page-by-page merge is also timed (see measure_baseline()).
+    """
     
     # Create output folder if it doesn't exist
     if not os.path.exists(output_folder):
@@ -50,52 +147,37 @@ def merge_recovery_letters(input_folder, output_folder, letter_type):
     print(f"   📂 Input folder: {input_folder}")
     print(f"   📄 Output file: {output_filename}")
     print(f"   📊 Found {len(pdf_files)} letters to merge in Excel sequence order")
+    if optimize:
+        print(f"   ⚡ Optimized merge: whole-document insert, deduplicated and compressed save")
     
+    started = time.time()
     try:
-        # Create new merged document
-        merged_doc = fitz.open()
-        
-        total_pages = 0
-        processed_files = 0
-        
-        for i, pdf_file in enumerate(pdf_files, 1):
-            try:
-                filename = os.path.basename(pdf_file)
-                
-                # Open the arrears letter PDF
-                letter_doc = fitz.open(pdf_file)
-                page_count = letter_doc.page_count
-                
-                # Add all pages from this letter
-                for page_num in range(page_count):
-                    merged_doc.insert_pdf(letter_doc, from_page=page_num, to_page=page_num)
-                
-                letter_doc.close()
-                
-                total_pages += page_count
-                processed_files += 1
-                
-                if i % 50 == 0 or i == len(pdf_files):  # Progress update every 50 files
-                    print(f"   🔄 Progress: {i}/{len(pdf_files)} files processed")
-                
-            except Exception as e:
-                print(f"   ❌ Failed to process {filename}: {str(e)}")
-                continue
-        
-        if processed_files == 0:
-            print(f"   ❌ No {letter_type} files could be processed successfully!")
-            merged_doc.close()
-            return None
-        
-        # Save the merged PDF
-        print(f"   💾 Saving merged PDF...")
-        merged_doc.save(output_filepath)
-        merged_doc.close()
+        if workers > 1 and len(pdf_files) > 1:
+            # Tree merge: workers merge contiguous ranges, then the chunks are joined in order
+            print(f"   ⚡ Parallel merge with {workers} worker processes")
+            def report_progress(files_done, total_files):
+                print(f"   🔄 {letter_type} progress: {files_done}/{total_files} files processed")
+            save_options = OPTIMIZED_SAVE_OPTIONS if optimize else {'garbage': 4}
+            processed_files, total_pages, failures, letters = merge_files_parallel(
+                pdf_files, output_filepath, workers, save_options, on_progress=report_progress, toc=bookmarks)
+            for filename, error in failures:
+                print(f"   ❌ Failed to process {filename}: {error}")
+            if processed_files == 0:
+                print(f"   ❌ No {letter_type} files could be processed successfully!")
+                return None
+        else:
+            processed_files, total_pages, letters = merge_in_process(pdf_files, output_filepath, letter_type,
+                                                                     optimize)
+            if processed_files == 0:
+                print(f"   ❌ No {letter_type} files could be processed successfully!")
+                return None
+        elapsed = time.time() - started
         
         # Verify the output file
         if os.path.exists(output_filepath):
             file_size = os.path.getsize(output_filepath)
             file_size_mb = file_size / (1024 * 1024)
+            write_index(output_filepath, index_entries(letters))
             
             result = {
                 'type': letter_type,
@@ -103,11 +185,21 @@ def merge_recovery_letters(input_folder, output_folder, letter_type):
                 'processed_files': processed_files,
                 'total_files': len(pdf_files),
                 'total_pages': total_pages,
-                'file_size_mb': file_size_mb
+                'file_size_mb': file_size_mb,
+                'elapsed_seconds': elapsed
             }
             
             print(f"   ✅ {letter_type} merge completed!")
-            print(f"   📊 {processed_files}/{len(pdf_files)} files, {total_pages} pages, {file_size_mb:.2f} MB")
+            print(f"   🔖 {len(letters)} letters bookmarked and indexed in {os.path.basename(index_path(output_filepath))}")
+            print(f"   📊 {processed_files}/{len(pdf_files)} files, {total_pages} pages, {file_size_mb:.2f} MB "
+                  f"in {elapsed:.1f}s")
+            
+            if compare:
+                print(f"   ⏱️  Timing the page-by-page merge for comparison...")
+                result['baseline_size_mb'], result['baseline_seconds'] = measure_baseline(
+                    pdf_files, output_folder, letter_type)
+                if result['baseline_size_mb'] is not None:
+                    print(f"   📊 {comparison(result)}")
             
             return result
             
@@ -176,6 +268,7 @@ def cleanup_old_merged_files():
     total_cleaned = 0
     for folder in merge_folders:
         if os.path.exists(folder):
+            clean_indexes(folder)
             # Find all PDF files in the folder
             pdf_files = glob.glob(os.path.join(folder, "*.pdf"))
             
@@ -201,11 +294,94 @@ def cleanup_old_merged_files():
         print("✅ Cleanup completed - no old merged PDFs found")
     print()
 
-def merge_all_arrears_letters():
+def count_letters(input_folder):
+    """Number of letter PDFs waiting in a recovery type folder"""
+    return len(glob.glob(os.path.join(input_folder, "*.pdf")))
+
+class LineWriter:
+    """stdout wrapper handing each batch of complete lines to the OS in one write
+
+    print() writes the text and the newline separately, so the lines of processes
+    sharing one pipe could otherwise be spliced together.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.pending = ''
+
+    def write(self, text):
+        self.pending += text
+        if '\n' in self.pending:
+            lines, self.pending = self.pending.rsplit('\n', 1)
+            self.stream.write(lines + '\n')
+            self.stream.flush()
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+def _init_merge_process():
+    """Whole-line output, so the progress lines of concurrent merges interleave cleanly"""
+    if not isinstance(sys.stdout, LineWriter):
+        sys.stdout = LineWriter(sys.stdout)
+
+def comparison(result):
+    """One line comparing a merge with the page-by-page merge measured by --compare"""
+    size_change = (result['file_size_mb'] / result['baseline_size_mb'] - 1) * 100 if result['baseline_size_mb'] else 0
+    speedup = result['baseline_seconds'] / result['elapsed_seconds'] if result['elapsed_seconds'] else 0
+    return (f"Page-by-page merge: {result['baseline_size_mb']:.2f} MB in {result['baseline_seconds']:.1f}s "
+            f"(this merge: {size_change:+.1f}% size, {speedup:.1f}x speed)")
+
+def merge_types_concurrently(recovery_mappings, optimize=False, workers=1, compare=False):
+    """Merge every recovery type in its own process at the same time
+
+    --workers N is shared out between the types for their tree merges, in proportion
+    to their letter counts. Progress is reported per type as each merge finishes;
+    results come back in mapping order.
+    """
+    _init_merge_process()
+    letter_counts = {mapping['letter_type']: count_letters(mapping['input_folder']) for mapping in recovery_mappings}
+    total_letters = sum(letter_counts.values()) or 1
+    print(f"⚡ Merging {len(recovery_mappings)} recovery types concurrently")
+    
+    started = time.time()
+    results = {}
+    with ProcessPoolExecutor(max_workers=len(recovery_mappings), initializer=_init_merge_process) as pool:
+        futures = {}
+        for mapping in recovery_mappings:
+            letter_type = mapping['letter_type']
+            type_workers = max(1, round(workers * letter_counts[letter_type] / total_letters))
+            emit('stage_start', stage=letter_type, total=letter_counts[letter_type])
+            future = pool.submit(merge_recovery_letters, mapping['input_folder'], mapping['output_folder'],
+                                 letter_type, optimize, type_workers, compare)
+            futures[future] = mapping
+        
+        for future in as_completed(futures):
+            letter_type = futures[future]['letter_type']
+            try:
+                results[letter_type] = future.result()
+            except Exception as e:
+                print(f"   ❌ Error during {letter_type} merging: {str(e)}")
+                results[letter_type] = None
+            result = results[letter_type]
+            if result:
+                print(f"   ✅ {letter_type} merged after {time.time() - started:.1f}s "
+                      f"({result['processed_files']} files, {result['total_pages']} pages)")
+            emit('stage_done', stage=letter_type, total=letter_counts[letter_type],
+                 status='success' if result else 'skipped')
+    
+    print(f"⏱️  Concurrent merge finished in {time.time() - started:.1f}s")
+    return [results[mapping['letter_type']] for mapping in recovery_mappings if results[mapping['letter_type']]]
+
+def merge_all_arrears_letters(optimize=False, workers=1, concurrent_types=False, compare=False):
     """Merge all arrears letters by recovery type"""
     
     print("🚀 NICL Arrears Letters Merger Started")
     print("=" * 60)
+    if optimize:
+        print("⚡ Optimized mode: whole-document insert, deduplicated and compressed save")
     
     # Clean up old merged files first
     cleanup_old_merged_files()
@@ -237,15 +413,24 @@ def merge_all_arrears_letters():
     # Process each recovery type
     results = []
     
-    for mapping in recovery_mappings:
-        result = merge_recovery_letters(
-            mapping['input_folder'],
-            mapping['output_folder'], 
-            mapping['letter_type']
-        )
+    if concurrent_types:
+        results = merge_types_concurrently(recovery_mappings, optimize, workers, compare)
+    else:
+        for mapping in recovery_mappings:
+            emit('stage_start', stage=mapping['letter_type'], total=count_letters(mapping['input_folder']))
+            result = merge_recovery_letters(
+                mapping['input_folder'],
+                mapping['output_folder'], 
+                mapping['letter_type'],
+                optimize,
+                workers,
+                compare
+            )
+            emit('stage_done', stage=mapping['letter_type'], total=count_letters(mapping['input_folder']),
+                 status='success' if result else 'skipped')
         
-        if result:
-            results.append(result)
+            if result:
+                results.append(result)
     
     # Print final summary
     print(f"\n📊 FINAL MERGE SUMMARY:")
@@ -259,17 +444,24 @@ def merge_all_arrears_letters():
     total_files = 0
     total_pages = 0
     total_size_mb = 0
+    total_seconds = 0
     
     for result in results:
         print(f"{result['type']:3} | Files: {result['processed_files']:4}/{result['total_files']:4} | "
-              f"Pages: {result['total_pages']:4} | Size: {result['file_size_mb']:6.2f} MB")
+              f"Pages: {result['total_pages']:4} | Size: {result['file_size_mb']:6.2f} MB | "
+              f"Time: {result['elapsed_seconds']:6.1f}s")
+        
+        if result.get('baseline_size_mb') is not None:
+            print(f"    | {comparison(result)}")
         
         total_files += result['processed_files']
         total_pages += result['total_pages']
         total_size_mb += result['file_size_mb']
+        total_seconds += result['elapsed_seconds']
     
     print("-" * 60)
-    print(f"{'TOT':3} | Files: {total_files:4}      | Pages: {total_pages:4} | Size: {total_size_mb:6.2f} MB")
+    print(f"{'TOT':3} | Files: {total_files:4}      | Pages: {total_pages:4} | Size: {total_size_mb:6.2f} MB | "
+          f"Time: {total_seconds:6.1f}s")
     
     print(f"\n🎉 Merge process completed!")
     print(f"📁 Merged PDFs available in respective folders:")
@@ -300,6 +492,12 @@ def print_usage():
     print("• L2_Merge/ - Merged L2 letters") 
     print("• MED_Merge/ - Merged MED letters")
     print()
+    print("Options:")
+    print("• --optimize - whole-document insert and a deduplicated, compressed save")
+    print("• --workers N - parallel tree merge with N processes (0 = one per CPU core)")
+    print("• --concurrent-types - merge L0, L1, L2 and MED at the same time")
+    print("• --compare - also time the page-by-page merge and report its size and time")
+    print()
     print("Prerequisites:")
     print("1. Run recovery_processor.py to generate individual letters")
     print("2. Ensure PyMuPDF is installed: pip install PyMuPDF")
@@ -308,14 +506,16 @@ def print_usage():
     print("• Timestamped output files")
     print("• Alphabetical ordering of letters")
     print("• Progress tracking for large batches")
+    print("• Per-letter bookmarks and a page index (single letters extracted on request)")
     print("• Comprehensive statistics")
     print()
 
 if __name__ == "__main__":
     try:
-        import fitz
         print_usage()
-        merge_all_arrears_letters()
+        merge_all_arrears_letters(optimize='--optimize' in sys.argv, workers=get_worker_count(sys.argv),
+                                  concurrent_types='--concurrent-types' in sys.argv,
+                                  compare='--compare' in sys.argv)
         
     except ImportError:
         print("❌ PyMuPDF not installed. Please install it:")
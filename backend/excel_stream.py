@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+# NICL Excel Stream - Memory-bounded reading and writing of large letter workbooks
+# Rows are read with openpyxl in read-only mode and handed out as DataFrame chunks
+# numbered like pd.read_excel rows; COMMENTS are written into a copy of the workbook
+# by patching its sheet XML, so neither direction holds the whole extract in memory.
+
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from openpyxl.utils import column_index_from_string, get_column_letter, range_boundaries
+from pandas.io.parsers import TextParser
+
+# Rows per chunk - each chunk is validated, prefetched and rendered before the next is read
+STREAM_CHUNK_ROWS = 5000
+
+ROW_PATTERN = re.compile(rb'<row\b[^>]*?\br="(\d+)"[^>]*?(?:/>|>(.*?)</row>)', re.S)
+# Row element split into its start tag (group 1, without '>') and its cells (group 3)
+ROW_PARTS = re.compile(rb'(<row\b[^>]*?\br="(\d+)"[^>]*?)(?:/>|>(.*?)</row>)', re.S)
+CELL_PATTERN = re.compile(rb'<c\b[^>]*?\br="([A-Z]+)\d+"[^>]*?(?:/>|>.*?</c>)', re.S)
+DIMENSION_PATTERN = re.compile(rb'<dimension\b[^>]*?\bref="([^"]+)"')
+ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def get_chunk_rows(argv, default=STREAM_CHUNK_ROWS):
+    """Read the --chunk-rows N option from the command line"""
+    for i, arg in enumerate(argv):
+        if arg == '--chunk-rows' and i + 1 < len(argv):
+            try:
+                return max(1, int(argv[i + 1]))
+            except ValueError:
+                print(f"[WARNING] Invalid --chunk-rows value '{argv[i + 1]}', using {default}")
+    return default
+
+
+def convert_cell(cell):
+    """A cell value as pd.read_excel's openpyxl reader converts it ('' for empty)"""
+    if cell.value is None:
+        return ''
+    if cell.data_type == TYPE_ERROR:
+        return float('nan')
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+
+def _trimmed(cells):
+    """Converted row without its trailing empty cells"""
+    row = [convert_cell(cell) for cell in cells]
+    while row and row[-1] == '':
+        row.pop()
+    return row
+
+
+def _has_value(row_xml):
+    return bool(row_xml) and (b'<v>' in row_xml or b'<v ' in row_xml or b'<is>' in row_xml)
+
+
+def _last_data_row(workbook, sheet):
+    """Number of the last sheet row holding a value, from a raw scan of the sheet XML
+
+    Much cheaper than parsing every cell; None when the sheet part cannot be
+    scanned (no raw part, or row elements written with a namespace prefix).
+    """
+    path = getattr(sheet, '_worksheet_path', None)
+    archive = getattr(workbook, '_archive', None)
+    if not path or archive is None:
+        return None
+    last = 0
+    seen = False
+    try:
+        with archive.open(path) as source:
+            pending = b''
+            for block in iter(lambda: source.read(1 << 20), b''):
+                data = pending + block
+                cut = data.rfind(b'<row')
+                complete, pending = (data[:cut], data[cut:]) if cut >= 0 else (data, b'')
+                for match in ROW_PATTERN.finditer(complete):
+                    seen = True
+                    if _has_value(match.group(2)):
+                        last = int(match.group(1))
+            for match in ROW_PATTERN.finditer(pending):
+                seen = True
+                if _has_value(match.group(2)):
+                    last = int(match.group(1))
+    except (KeyError, zipfile.BadZipFile, OSError):
+        return None
+    return last if seen else None
+
+
+class ExcelStream:
+    """First sheet of a workbook as DataFrame chunks with a global 0..n-1 index
+
+    Values and row numbers match pd.read_excel: cells are converted the same way,
+    blank rows inside the data are kept and trailing ones dropped. Column types
+    are inferred per chunk. Cells beyond the last header are ignored.
+    """
+
+    def __init__(self, path, chunk_rows=STREAM_CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.header = []
+        self.total_rows = self._count_rows()
+
+    def _open(self):
+        workbook = load_workbook(self.path, read_only=True, data_only=True)
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        return workbook, sheet
+
+    def _count_rows(self):
+        """Data rows below the header (read before rendering - it sets the file name padding)"""
+        workbook, sheet = self._open()
+        try:
+            rows = sheet.iter_rows()
+            self.header = _trimmed(next(rows, ()))
+            last = _last_data_row(workbook, sheet)
+            if last is None:
+                # No raw sheet XML - count with openpyxl instead
+                last = 1
+                for number, row in enumerate(rows, start=2):
+                    if any(cell.value is not None for cell in row):
+                        last = number
+            return max(last - 1, 0)
+        finally:
+            workbook.close()
+
+    def _frame(self, rows, start):
+        """DataFrame of converted rows, typed by pandas' own Excel text parser"""
+        width = len(self.header)
+        data = [list(self.header)] + [(row + [''] * width)[:width] for row in rows]
+        df = TextParser(data, header=0, skip_blank_lines=False).read()
+        df.index = range(start, start + len(df))
+        return df
+
+    def chunks(self):
+        """Yield the data rows in DataFrames of up to chunk_rows rows"""
+        workbook, sheet = self._open()
+        try:
+            rows = sheet.iter_rows()
+            next(rows, None)
+            chunk = []
+            start = 0
+            for position, cells in enumerate(rows):
+                if position >= self.total_rows:
+                    break
+                chunk.append(_trimmed(cells))
+                if len(chunk) == self.chunk_rows:
+                    yield self._frame(chunk, start)
+                    start += len(chunk)
+                    chunk = []
+            if chunk:
+                yield self._frame(chunk, start)
+        finally:
+            workbook.close()
+
+
+def write_comments(input_path, output_path, comments):
+    """Copy the first sheet of input_path to output_path with COMMENTS filled from comments
+
+    comments is a list with one value per data row (None keeps the cell). Both
+    workbooks are streamed, so the copy holds one row at a time.
+    """
+    source = load_workbook(input_path, read_only=True, data_only=True)
+    target = Workbook(write_only=True)
+    sheet = target.create_sheet()
+    try:
+        source_sheet = source.worksheets[0]
+        source_sheet.reset_dimensions()
+        rows = source_sheet.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        while header and header[-1] is None:
+            header.pop()
+        if 'COMMENTS' not in header:
+            header.append('COMMENTS')
+        column = header.index('COMMENTS')
+        sheet.append(header)
+        for position, values in enumerate(rows):
+            if position >= len(comments):
+                break
+            row = (list(values) + [None] * len(header))[:len(header)]
+            if comments[position] is not None:
+                row[column] = comments[position]
+            sheet.append(row)
+    finally:
+        source.close()
+
+    temp_path = f"{output_path}.tmp.xlsx"
+    target.save(temp_path)
+    os.replace(temp_path, output_path)
+
+
+class _Unpatchable(Exception):
+    """The sheet XML is not laid out the way fill_comments() patches it"""
+
+
+def _inline_cell(ref, value):
+    text = escape(ILLEGAL_XML_CHARS.sub('', str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'.encode('utf-8')
+
+
+class _CommentsPatch:
+    """Rewrites the rows of a sheet part with one cell per row set in a column"""
+
+    def __init__(self, column, comments):
+        self.column = column
+        self.letter = get_column_letter(column)
+        self.comments = comments
+        self.next_row = 1
+
+    def _value(self, number):
+        if number == 1:
+            return 'COMMENTS'
+        position = number - 2
+        if position < len(self.comments) and self.comments[position] is not None:
+            return self.comments[position]
+        return None
+
+    def _set_cell(self, cells, number, value):
+        found = list(CELL_PATTERN.finditer(cells))
+        if len(found) != cells.count(b'<c ') + cells.count(b'<c>'):
+            raise _Unpatchable('cell without a reference')
+        new_cell = _inline_cell(f"{self.letter}{number}", value)
+        for match in found:
+            index = column_index_from_string(match.group(1).decode('ascii'))
+            if index == self.column:
+                return cells[:match.start()] + new_cell + cells[match.end():]
+            if index > self.column:
+                return cells[:match.start()] + new_cell + cells[match.start():]
+        return cells + new_cell
+
+    def _missing_rows(self, until):
+        """Rows with a value to set that the sheet does not have, up to row until (exclusive)"""
+        out = []
+        while self.next_row < until:
+            value = self._value(self.next_row)
+            if value is not None:
+                out.append(f'<row r="{self.next_row}">'.encode('ascii')
+                           + _inline_cell(f"{self.letter}{self.next_row}", value) + b'</row>')
+            self.next_row += 1
+        return b''.join(out)
+
+    def rows(self, data):
+        """Patch a run of complete row elements"""
+        if data.count(b'<row') != len(ROW_PARTS.findall(data)):
+            raise _Unpatchable('row without a reference')
+        out = []
+        position = 0
+        for match in ROW_PARTS.finditer(data):
+            number = int(match.group(2))
+            if number < self.next_row or (self.next_row == 1 and number != 1):
+                raise _Unpatchable('header not on the first row, or rows out of order')
+            out.append(data[position:match.start()])
+            out.append(self._missing_rows(number))
+            value = self._value(number)
+            if value is None:
+                out.append(match.group(0))
+            else:
+                start = re.sub(rb'\sspans="[^"]*"', b'', match.group(1))
+                out.append(start + b'>' + self._set_cell(match.group(3) or b'', number, value) + b'</row>')
+            self.next_row = number + 1
+            position = match.end()
+        out.append(data[position:])
+        return b''.join(out)
+
+    def finish(self):
+        """Rows still to add after the last row of the sheet"""
+        return self._missing_rows(len(self.comments) + 2)
+
+
+def _patch_sheet(source, target, patch):
+    """Stream sheet XML from source to target through a _CommentsPatch"""
+    pending = b''
+    in_rows = False
+    for block in iter(lambda: source.read(1 << 20), b''):
+        data = pending + block
+        if not in_rows:
+            start = data.find(b'<sheetData')
+            end = data.find(b'>', start) if start >= 0 else -1
+            if end < 0:
+                pending = data
+                continue
+            if data[end - 1:end] == b'/':
+                raise _Unpatchable('empty sheet')
+            head = data[:end + 1]
+            dimension = DIMENSION_PATTERN.search(head)
+            if dimension:
+                min_col, min_row, max_col, max_row = range_boundaries(dimension.group(1).decode('ascii'))
+                ref = (f"{get_column_letter(min_col or 1)}{min_row or 1}:"
+                       f"{get_column_letter(max(max_col or 1, patch.column))}"
+                       f"{max(max_row or 1, len(patch.comments) + 1)}")
+                head = head[:dimension.start(1)] + ref.encode('ascii') + head[dimension.end(1):]
+            target.write(head)
+            data = data[end + 1:]
+            in_rows = True
+        cut = data.rfind(b'<row')
+        if cut > 0:
+            target.write(patch.rows(data[:cut]))
+            data = data[cut:]
+        pending = data
+    end = pending.find(b'</sheetData>')
+    if not in_rows or end < 0:
+        raise _Unpatchable('no sheetData')
+    target.write(patch.rows(pending[:end]))
+    target.write(patch.finish())
+    target.write(pending[end:])
+
+
+def fill_comments(input_path, output_path, comments):
+    """Write input_path to output_path with COMMENTS filled from comments (None keeps the cell)
+
+    Copies the workbook package and patches only the first sheet's XML, adding
+    one inline-string cell per row - much faster than re-serialising every cell,
+    and formatting and other sheets are kept. Falls back to write_comments()
+    for sheets laid out differently.
+    """
+    workbook = load_workbook(input_path, read_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet_path = getattr(sheet, '_worksheet_path', '').lstrip('/')
+        first = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        header = list(first)
+        while header and header[-1] is None:
+            header.pop()
+    finally:
+        workbook.close()
+
+    column = header.index('COMMENTS') + 1 if 'COMMENTS' in header else len(header) + 1
+    patch = _CommentsPatch(column, comments)
+
+    temp_path = f"{output_path}.tmp.xlsx"
+    try:
+        with zipfile.ZipFile(input_path) as source, \
+                zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as target:
+            if sheet_path not in source.namelist():
+                raise _Unpatchable('no sheet part')
+            for info in source.infolist():
+                if info.filename == sheet_path:
+                    sheet_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                    sheet_info.compress_type = zipfile.ZIP_DEFLATED
+                    with source.open(info) as sheet_source, \
+                            target.open(sheet_info, 'w', force_zip64=True) as sheet_target:
+                        _patch_sheet(sheet_source, sheet_target, patch)
+                else:
+                    target.writestr(info, source.read(info))
+    except _Unpatchable:
+        os.remove(temp_path)
+        write_comments(input_path, output_path, comments)
+        return
+    os.replace(temp_path, output_path)
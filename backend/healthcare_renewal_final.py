@@ -8,8 +8,6 @@ from datetime import datetime
 # Set UTF-8 encoding for stdout to handle Unicode characters
 if sys.stdout.encoding != 'utf-8':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-import requests
-import segno
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.platypus import Table, TableStyle, Paragraph
@@ -25,6 +23,7 @@ import re
 from datetime import datetime
 from reportlab.lib.utils import ImageReader
 from PyPDF2 import PdfFileReader, PdfFileWriter
+from zwennpay_qr import QRPrefetch, build_qr_payload, clean_mobile_number, get_qr_concurrency, make_qr_image
 
 # Verify font files exist
 cambria_regular_path = os.path.join(os.path.dirname(__file__), 'fonts', 'cambria.ttf')
@@ -194,7 +193,40 @@ def check_new_page(c, y_pos, required_space, width, height, margin):
             return nic_logo_y - 30
         else:
             return height - margin
-    return y_pos# Process each row in the DataFrame
+    return y_pos
+
+
+def build_row_qr_payload(row):
+    """Build the ZwennPay QR payload for one renewal row (merchant 153)"""
+    pol_no = str(row.get('POL_NO', '')) if pd.notna(row.get('POL_NO', '')) else ''
+    name = str(row.get('NAME', '')) if pd.notna(row.get('NAME', '')) else ''
+    surname = str(row.get('SURNAME', '')) if pd.notna(row.get('SURNAME', '')) else ''
+
+    # Create first initial + surname for customer label (max 24 chars)
+    first_initial = name[0].upper() if name and len(name) > 0 else ''
+    surname_part = surname.strip() if surname else ''
+    if first_initial and surname_part:
+        customer_label = f"{first_initial} {surname_part}"[:24]
+    else:
+        customer_label = surname_part[:24]
+
+    return build_qr_payload(153, pol_no.replace('/', '.'), clean_mobile_number(row.get('MOB_NO', '')),
+                            customer_label, purpose="Healthcare Renewal")
+
+
+def needs_qr_code(row):
+    """True when the row has the policy number and name needed for a letter"""
+    return pd.notna(row.get('POL_NO', '')) and str(row.get('POL_NO', '')) != '' and \
+        pd.notna(row.get('NAME', '')) and str(row.get('NAME', '')) != ''
+
+
+# Fetch every row's QR code concurrently over one keep-alive session while PDFs render
+qr_prefetch = QRPrefetch(
+    {index: build_row_qr_payload(row) for index, row in df.iterrows() if needs_qr_code(row)},
+    get_qr_concurrency(sys.argv)
+)
+
+# Process each row in the DataFrame
 for index, row in df.iterrows():
     print(f"[PROCESSING] Row {index + 1} of {len(df)}")
     
@@ -269,75 +301,19 @@ for index, row in df.iterrows():
     # Create cover period string
     cover_period = f"{expiry_from_formatted} to {expiry_to_formatted}"    
 # Generate QR Code for payment
-    qr_filename = None
+    qr_image = None
     try:
-        # Create first initial + surname for customer label (max 24 chars)
-        first_initial = name[0].upper() if name and len(name) > 0 else ''
-        surname_part = surname.strip() if surname else ''
-        
-        if first_initial and surname_part:
-            customer_label_temp = f"{first_initial} {surname_part}"
-            customer_label = customer_label_temp[:24] if len(customer_label_temp) > 24 else customer_label_temp
-        elif surname_part:
-            customer_label = surname_part[:24] if len(surname_part) > 24 else surname_part
-        else:
-            customer_label = ''
-        
-        # API payload for QR generation
-        payload = {
-            "MerchantId": 153,
-            "SetTransactionAmount": False,
-            "TransactionAmount": 0,
-            "SetConvenienceIndicatorTip": False,
-            "ConvenienceIndicatorTip": 0,
-            "SetConvenienceFeeFixed": False,
-            "ConvenienceFeeFixed": 0,
-            "SetConvenienceFeePercentage": False,
-            "ConvenienceFeePercentage": 0,
-            "SetAdditionalBillNumber": True,
-            "AdditionalRequiredBillNumber": False,
-            "AdditionalBillNumber": str(pol_no).replace('/', '.'),
-            "SetAdditionalMobileNo": True,
-            "AdditionalRequiredMobileNo": False,
-            "AdditionalMobileNo": str(mobile_no),
-            "SetAdditionalStoreLabel": False,
-            "AdditionalRequiredStoreLabel": False,
-            "AdditionalStoreLabel": "",
-            "SetAdditionalLoyaltyNumber": False,
-            "AdditionalRequiredLoyaltyNumber": False,
-            "AdditionalLoyaltyNumber": "",
-            "SetAdditionalReferenceLabel": False,
-            "AdditionalRequiredReferenceLabel": False,
-            "AdditionalReferenceLabel": "",
-            "SetAdditionalCustomerLabel": True,
-            "AdditionalRequiredCustomerLabel": False,
-            "AdditionalCustomerLabel": str(customer_label),
-            "SetAdditionalTerminalLabel": False,
-            "AdditionalRequiredTerminalLabel": False,
-            "AdditionalTerminalLabel": "",
-            "SetAdditionalPurposeTransaction": True,
-            "AdditionalRequiredPurposeTransaction": False,
-            "AdditionalPurposeTransaction": "Healthcare Renewal"
-        }
-        
-        response = requests.post(
-            "https://api.zwennpay.com:9425/api/v1.0/Common/GetMerchantQR",
-            headers={"accept": "text/plain", "Content-Type": "application/json"},
-            json=payload,
-            timeout=20
-        )
-        
-        if response.status_code == 200:
-            qr_data = str(response.text).strip()
-            if qr_data and qr_data.lower() not in ('null', 'none', 'nan'):
-                qr = segno.make(qr_data, error='L')
-                qr_filename = f"qr_{safe_policy}.png"
-                qr.save(qr_filename, scale=8, border=2, dark='#000000')
+        qr_result = qr_prefetch.get(index)
+        if qr_result['error']:
+            print(f"⚠️ Error generating QR for {full_customer_name}: {qr_result['error']}")
+        elif qr_result['status_code'] == 200:
+            if qr_result['qr_data']:
+                qr_image = make_qr_image(qr_result['qr_data'])
                 print(f"✅ QR code generated for {full_customer_name}")
             else:
                 print(f"⚠️ No valid QR data received for {full_customer_name}")
         else:
-            print(f"❌ API request failed for {full_customer_name}: {response.status_code}")
+            print(f"❌ API request failed for {full_customer_name}: {qr_result['status_code']}")
 
     except Exception as e:
         print(f"⚠️ Error generating QR for {full_customer_name}: {str(e)}")    # Create PDF
@@ -505,7 +481,7 @@ for index, row in df.iterrows():
     y_pos = add_paragraph(c, bank_transfer_text, styles['BodyText'], margin, y_pos, content_width)
     
     # Add QR code and logo after the premium text
-    if qr_filename and os.path.exists(qr_filename):
+    if qr_image:
         # Add payment instruction
         y_pos = add_paragraph(c, "For your convenience, you may settle payments via the QR code below using apps such as Juice or MyT Money.", styles['BoldText'], margin, y_pos, content_width)
         y_pos -= 8  # Reduced spacing
@@ -561,7 +537,7 @@ for index, row in df.iterrows():
         # Add QR code (centered, larger size for better scanning)
         qr_size = 100  # Increased from 85 to 100 for much better scanning
         qr_x = page_center_x - (qr_size / 2)
-        c.drawImage(qr_filename, qr_x, y_pos - qr_size, width=qr_size, height=qr_size)
+        c.drawImage(qr_image, qr_x, y_pos - qr_size, width=qr_size, height=qr_size)
         y_pos -= qr_size + 4  # Slightly more spacing
         
         # Add "NIC Health Insurance" text below QR code (centered)
@@ -649,8 +625,6 @@ for index, row in df.iterrows():
     
     print(f"✅ Healthcare renewal PDF generated for {full_customer_name}")
     
-    # Clean up QR file
-    if qr_filename and os.path.exists(qr_filename):
-        os.remove(qr_filename)
+qr_prefetch.close()
 
 print(f"🎉 Healthcare renewal script completed. Processed {len(df)} rows total.")
\ No newline at end of file
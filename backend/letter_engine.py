@@ -0,0 +1,1214 @@
+# -*- coding: utf-8 -*-
+# NICL Letter Engine - Shared rendering for the arrears letter generators
+# Font registration, data loading, address splitting, QR handling, the A4 canvas
+# layout and the validate -> prefetch -> render -> write-back job live here once.
+# L0/L1/L2/GI_MED_Arrears/NonMotor_L0/Inactive_Policy_Arrears only declare a
+# LetterTemplate: input columns, subject and paragraphs, deadline and merchant ID.
+
+import copy
+import hashlib
+import io
+import math
+import os
+import re
+import string
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfdoc, pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Paragraph, Table, TableStyle
+
+from address_cache import get_address_cache
+from excel_stream import ExcelStream, get_chunk_rows
+from letter_index import clean_indexes
+from letter_journal import LetterJournal, clean_journals, file_sha256
+from letter_manifest import LetterManifest, layout_version, letter_fingerprint
+from letter_redate import redate_letter
+from letter_pool import DEFAULT_SHARD_SIZE, get_worker_count, render_rows_parallel
+from letter_print import PrintRun, get_print_chunk, print_only
+from letter_records import build_records, print_schema_report, resolve_schema
+from letter_validation import validate_arrears_rows
+from outcome_ledger import export_workbook, ledger_path, remove_ledger, write_outcomes
+from progress_events import emit, log_row
+from upload_cache import read_upload
+from zwennpay_qr import (QRPrefetch, build_customer_label, build_qr_payload,
+                         clean_mobile_number, fetch_qr_data, get_qr_concurrency, make_qr_image)
+
+LETTER_GENERATED = 'Letter generated successfully'
+
+# Font file locations
+cambria_regular_path = os.path.join(os.path.dirname(__file__), 'fonts', 'cambria.ttf')
+cambria_bold_path = os.path.join(os.path.dirname(__file__), 'fonts', 'cambriab.ttf')
+
+# Paragraph styles shared by every letter; templates override single attributes
+BASE_STYLES = {
+    'BodyText': dict(fontName='Cambria', fontSize=10.5, leading=12, spaceAfter=3, alignment=TA_JUSTIFY),
+    'BoldText': dict(fontName='Cambria-Bold', fontSize=11, leading=15, spaceAfter=12),
+    'AddressText': dict(fontName='Cambria-Bold', fontSize=10.5, leading=12, spaceAfter=3),
+    'TableText': dict(fontName='Cambria', fontSize=9, leading=12, spaceAfter=4, alignment=TA_CENTER),
+    'TableTextBold': dict(fontName='Cambria-Bold', fontSize=9, leading=12, spaceAfter=4, alignment=TA_CENTER),
+    'CenterGrey': dict(fontName='Cambria', fontSize=9, leading=12, spaceAfter=6, alignment=TA_CENTER,
+                       textColor=colors.Color(0.5, 0.5, 0.5)),
+}
+
+# Column names of the recovery_processor.py workbooks (temp_L0/L1/L2/MED.xlsx)
+ARREARS_COLUMNS = {
+    'title': ['PH_TITLE'],
+    'holder': ['POLICY_HOLDER'],
+    'pol_no': ['POL_NO'],
+    'amount': ['TrueArrears'],
+    'start_date': ['POL_FROM_DT'],
+    'end_date': ['POL_TO_DT'],
+    'mobile': ['PH_MOBILE'],
+    # Rows with an email address also get their individual PDF with --print-only
+    'email': ['PH_EMAIL'],
+    'product': [],
+    # POL_PH_ADDR3 is ignored as per requirement
+    'address': [['POL_PH_ADDR1'], ['POL_PH_ADDR2'], ['POL_PH_ADDR4']],
+    'full_address': ['FULL_ADDRESS'],
+}
+
+# Letter fields that differ on every row - paragraphs using them are laid out per letter,
+# all others (static wording, run dates, product and banking text) once per run
+ROW_FIELDS = {'pol_no', 'amount', 'cover_period'}
+
+# Letter fields that change with the run date only - kept out of the letter fingerprint
+# and stamped on the reused letters (--incremental)
+RUN_DATE_FIELDS = {'current_date', 'deadline_date'}
+
+# Bookkeeping of one letter type's run: checkpoint journal, previous manifest, layout
+# version, the LetterRecords and address lines of the rows being planned, the
+# (fingerprint, run dates) of every valid row so far, the input size, output
+# folder, --incremental flag, the resumed/reused/re-rendered and row outcome counts,
+# the stage name used in progress events and file names (the template code or the
+# recovery action) and the PrintRun the letters are appended to with --print-only
+# (else None)
+LetterRun = namedtuple('LetterRun', 'journal manifest version records address_lines fingerprints '
+                                    'total_records output_folder incremental counts stage print_run')
+
+# Size and spacing of the MauCAS logo / QR code / ZwennPay logo block
+QRLayout = namedtuple('QRLayout', 'pre_space maucas_width maucas_gap qr_size qr_gap label zwenn_width zwenn_gap')
+
+# 80% size block without the label, used by the first notices
+QR_COMPACT = QRLayout(8, 88, 2, 80, 2, None, 64, 8)
+# Full size block with the "NIC Health Insurance" label, used by L1/L2/MED
+QR_STANDARD = QRLayout(20, 110, 4, 100, 4, 'NIC Health Insurance', 80, 15)
+
+
+def register_fonts():
+    """Verify font files exist and register the Cambria fonts (once per process)"""
+    if not os.path.isfile(cambria_regular_path):
+        raise FileNotFoundError(f"Font file not found: {cambria_regular_path}")
+    if not os.path.isfile(cambria_bold_path):
+        raise FileNotFoundError(f"Font file not found: {cambria_bold_path}")
+
+    try:
+        pdfmetrics.registerFont(TTFont('Cambria', cambria_regular_path))
+        pdfmetrics.registerFont(TTFont('Cambria-Bold', cambria_bold_path))
+        print("[OK] Cambria fonts registered successfully")
+    except Exception as e:
+        raise Exception(f"Failed to register fonts: {str(e)}")
+
+def prepare_comments(df):
+    """Ensure df has a string COMMENTS column with missing values as ''"""
+    if 'COMMENTS' not in df.columns:
+        df['COMMENTS'] = ''
+        print("[INFO] Added COMMENTS column to Excel file")
+    else:
+        print("[INFO] COMMENTS column already exists")
+
+    df['COMMENTS'] = df['COMMENTS'].astype(str)
+    df.loc[df['COMMENTS'] == 'nan', 'COMMENTS'] = ''
+    return df
+
+def load_letter_data(input_file):
+    """Read the Excel file containing arrears data and prepare the COMMENTS column"""
+    try:
+        df = read_upload(input_file)
+        print(f"[OK] Excel file loaded successfully with {len(df)} rows")
+        print(f"[INFO] Available columns: {list(df.columns)}")
+
+        if len(df) == 0:
+            print("[WARNING] Excel file is empty")
+            sys.exit(1)
+
+        prepare_comments(df)
+
+    except FileNotFoundError:
+        print(f"[ERROR] Excel file '{input_file}' not found in the current directory")
+        sys.exit(1)
+    except Exception as e:
+        print(f"[ERROR] Error reading Excel file: {str(e)}")
+        sys.exit(1)
+
+    return df
+
+def build_styles(overrides=None):
+    """Create the paragraph styles, applying per-template attribute overrides"""
+    overrides = overrides or {}
+    return {
+        name: ParagraphStyle(name=name, **dict(attributes, **overrides.get(name, {})))
+        for name, attributes in BASE_STYLES.items()
+    }
+
+# Function to format dates from Excel to "23 October 2025" format
+def format_date(date_value, dayfirst=True):
+    if pd.isna(date_value):
+        return ""
+    try:
+        if isinstance(date_value, (int, float)):
+            # Excel serial number - convert using Excel's date origin
+            date_obj = pd.to_datetime(date_value, origin='1899-12-30', unit='D')
+        elif dayfirst:
+            # String date - explicitly parse as DD/MM/YYYY (Mauritius format)
+            date_obj = pd.to_datetime(date_value, format='%d/%m/%Y', dayfirst=True)
+        else:
+            date_obj = pd.to_datetime(date_value)
+        return date_obj.strftime('%d %B %Y')
+    except:
+        if not dayfirst:
+            return str(date_value)
+        # Fallback: try auto-detection with dayfirst=True
+        try:
+            date_obj = pd.to_datetime(date_value, dayfirst=True)
+            return date_obj.strftime('%d %B %Y')
+        except:
+            return str(date_value)
+
+# Function to format currency
+def format_currency(amount):
+    try:
+        rounded_amount = round(float(amount))
+        return f"MUR {rounded_amount:,}"
+    except:
+        return "MUR 0"
+
+# Function to create safe filenames
+def sanitize_filename(filename):
+    """Create a safe filename by removing invalid characters"""
+    if not filename:
+        return "unknown"
+
+    # Remove or replace invalid characters for Windows filenames
+    invalid_chars = r'[<>:"/\\|?*\n\r\t]'
+    safe_name = re.sub(invalid_chars, '_', str(filename))
+
+    # Remove multiple underscores and spaces
+    safe_name = re.sub(r'[_\s]+', '_', safe_name)
+
+    # Remove leading/trailing underscores and dots
+    safe_name = safe_name.strip('_. ')
+
+    # Limit length to avoid filesystem issues
+    if len(safe_name) > 50:
+        safe_name = safe_name[:50].rstrip('_')
+
+    # Ensure we have a valid filename
+    if not safe_name or safe_name in ['', '.', '..']:
+        safe_name = "unknown"
+
+    return safe_name
+
+# Function to map Product Name to simplified product type for subject line
+def map_product_name(product_name):
+    """Map Excel Product Name to simplified product type for letter subject"""
+    if not product_name or pd.isna(product_name):
+        return "MOTOR"
+    
+    product_name = str(product_name).strip()
+    
+    # Product name mapping
+    product_mapping = {
+        "Motor Private": "MOTOR",
+        "Motor Commercial": "MOTOR",
+        "Motor Fleet": "MOTOR",
+        "Travel Insurance": "TRAVEL",
+        "Fire & Allied Perils": "FIRE & ALLIED PERILS",
+        "Group Personal Accident": "GROUP PERSONAL ACCIDENT",
+        "Public Liability": "PUBLIC LIABILITY",
+        "Employer's Liability": "EMPLOYER'S LIABILITY",
+        "Money Insurance": "MONEY INSURANCE",
+        "Professional Indemnity": "PROFESSIONAL INDEMNITY",
+        "Electronic Equipment": "ELECTRONIC EQUIPMENT",
+        "Workmen Compensation": "WORKMEN COMPENSATION",
+        "Contractor's Plant & Machinery": "CONTRACTOR'S PLANT & MACHINERY",
+        "Contractors All Risk": "CONTRACTORS ALL RISK",
+        "All Risks": "ALL RISKS",
+        "Machinery All Risks": "MACHINERY ALL RISKS",
+        "Marine Hull": "MARINE HULL",
+        "Fidelity Guarantee": "FIDELITY GUARANTEE",
+        "Director's and Officer's Liability": "DIRECTOR'S AND OFFICER'S LIABILITY",
+        "Sabotage and Terrorism": "SABOTAGE AND TERRORISM"
+    }
+    
+    # Check for OASIS products (any OASIS with numbers becomes just "OASIS")
+    if "OASIS" in product_name.upper():
+        return "OASIS"
+    
+    # Try exact match first
+    if product_name in product_mapping:
+        return product_mapping[product_name]
+    
+    # If no match, return original product name in uppercase
+    return product_name.upper()
+
+def product_merchant_id(product_type):
+    """ZwennPay merchant for general insurance letters (Motor uses 155, other products 171)"""
+    return 155 if product_type == "MOTOR" else 171
+
+def get_output_folder(argv, default):
+    """Read the --output FOLDER option from the command line"""
+    for i, arg in enumerate(argv):
+        if arg == '--output' and i + 1 < len(argv):
+            return argv[i + 1]
+    return default
+
+def get_stage(argv):
+    """Read the --stage NAME option (the recovery action a letter script renders)"""
+    for i, arg in enumerate(argv):
+        if arg == '--stage' and i + 1 < len(argv):
+            return argv[i + 1]
+    return None
+
+def clean_pdf_folder(folder, label='PDF files'):
+    """Delete the PDF files (and their resume journals or merged file indexes) left in folder by a previous run"""
+    print(f"[CLEANUP] Removing old {label} from {folder}...")
+    try:
+        if os.path.exists(folder):
+            clean_journals(folder)
+            clean_indexes(folder)
+            old_files = [f for f in os.listdir(folder) if f.endswith('.pdf')]
+            for old_file in old_files:
+                os.remove(os.path.join(folder, old_file))
+            if old_files:
+                print(f"[CLEANUP] Removed {len(old_files)} old {label}")
+            else:
+                print(f"[CLEANUP] No old {label} found to remove")
+        else:
+            print(f"[CLEANUP] {folder} doesn't exist yet")
+    except Exception as e:
+        print(f"[WARNING] Could not clean up old {label}: {str(e)}")
+
+def load_qr_image(qr_result, full_customer_name):
+    """Turn a ZwennPay result into an image, returning (image, API error comment)"""
+    try:
+        if qr_result['qr_data']:
+            qr_image = make_qr_image(qr_result['qr_data'])
+            log_row(f"✅ QR code generated for {full_customer_name}")
+            return qr_image, None
+        if qr_result['network_error']:
+            print(f"⚠️ Network error while generating QR for {full_customer_name}: {qr_result['error']}")
+            return None, f"API Error - Network error: {qr_result['error'][:100]}"
+        if qr_result['error']:
+            print(f"⚠️ Error generating QR for {full_customer_name}: {qr_result['error']}")
+            return None, f"API Error due to data issues: {qr_result['error'][:100]}"
+        if qr_result['status_code'] == 200:
+            print(f"⚠️ No valid QR data received for {full_customer_name}")
+            return None, 'API Error due to data issues - no valid QR data'
+        print(f"❌ API request failed for {full_customer_name}: {qr_result['status_code']} - {qr_result['response_text']}")
+        return None, f"API Error due to data issues - HTTP {qr_result['status_code']}: {qr_result['response_text'][:100]}"
+    except Exception as e:
+        print(f"⚠️ Error generating QR for {full_customer_name}: {str(e)}")
+        return None, f'API Error due to data issues: {str(e)[:100]}'
+
+
+class StaticImage:
+    """A logo read, measured and encoded into a PDF image XObject once per process
+
+    Every letter canvas registers a shallow copy of the same XObject under the
+    same name, so the JPEG stream is never re-read or re-encoded per row and
+    merged output can store it once (see image_asset()).
+
+    Registering it relies on reportlab internals (checked against reportlab 5.0,
+    see the pinned range in PROJECT_SPECIFICATION.md). If they change, the logo
+    is drawn with plain drawImage(), which reads and encodes it for every letter.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.width, self.height = ImageReader(path).getSize()
+        # Same name canvas.drawImage() derives for a file path without a mask
+        self._name = hashlib.md5(f"{path}None".encode('utf-8')).hexdigest()
+        self._xobject = pdfdoc.PDFImageXObject(self._name, path)
+        self._shared = True
+
+    def scaled_height(self, width):
+        return width * (self.height / self.width)
+
+    def _register(self, c):
+        """Add the shared XObject to c's document the way drawImage() adds a new image"""
+        doc = c._doc
+        reg_name = doc.getXObjectName(self._name)
+        if reg_name not in doc.idToObject:
+            xobject = copy.copy(self._xobject)
+            c._setXObjects(xobject)
+            doc.Reference(xobject, reg_name)
+            doc.addForm(self._name, xobject)
+
+    def draw(self, c, x, y, width, height):
+        if self._shared:
+            try:
+                self._register(c)
+            except AttributeError as e:
+                self._shared = False
+                print(f"⚠️ Warning: shared logo images unavailable with this reportlab ({str(e)}), "
+                      f"drawing {self.path} per letter")
+        c.drawImage(self.path, x, y, width=width, height=height)
+
+
+# Process-wide image asset registry: path -> StaticImage (None when the file is missing)
+_IMAGE_ASSETS = {}
+
+def image_asset(path):
+    """The StaticImage for a logo, loaded and measured on first use by any letter type"""
+    if path not in _IMAGE_ASSETS:
+        _IMAGE_ASSETS[path] = StaticImage(path) if os.path.exists(path) else None
+    return _IMAGE_ASSETS[path]
+
+
+class StaticBackground:
+    """The parts of a letter that are the same for every row, compiled once per run
+
+    Holds the wrapped Paragraphs of every text that does not use a ROW_FIELDS
+    field (logos come from image_asset()); LetterPage only lays out the date,
+    address, subject, amount table and QR code per row.
+    """
+
+    def __init__(self, styles):
+        self.styles = styles
+        self._paragraphs = {}
+        self._row_specific = {}
+
+    def is_static(self, text):
+        if text not in self._row_specific:
+            fields = {name for _, name, _, _ in string.Formatter().parse(text) if name}
+            self._row_specific[text] = bool(fields & ROW_FIELDS)
+        return not self._row_specific[text]
+
+    def paragraph(self, c, text, fields, style, width, height):
+        """A wrapped Paragraph for text, reused across letters when it is static"""
+        if not self.is_static(text):
+            para = Paragraph(text.format(**fields), self.styles[style])
+            para.wrapOn(c, width, height)
+            return para
+        key = (text.format(**fields), style)
+        para = self._paragraphs.get(key)
+        if para is None:
+            para = self._paragraphs[key] = Paragraph(key[0], self.styles[style])
+            para.wrapOn(c, width, height)
+        return para
+
+
+class LetterPage:
+    """A4 canvas plus the running y position shared by the layout blocks"""
+
+    def __init__(self, pdf_filename, styles, fields, full_customer_name, address_lines, qr_image,
+                 background=None):
+        # pdf_filename may also be a file object (print files render into memory)
+        self.c = canvas.Canvas(pdf_filename, pagesize=A4)
+        # Read back by the mergers for the index of the merged file (see letter_index.py)
+        self.c.setTitle(full_customer_name)
+        self.c.setSubject(fields['pol_no'])
+        self.width, self.height = A4
+        self.margin = 50
+        self.content_width = self.width - 2 * self.margin
+        self.y = self.height - self.margin
+        self.styles = styles
+        self.fields = fields
+        self.full_customer_name = full_customer_name
+        self.address_lines = address_lines
+        self.qr_image = qr_image
+        self.background = background or StaticBackground(styles)
+
+    def new_page(self):
+        self.c.showPage()
+        self.y = self.height - self.margin
+
+    def layout(self, text, style='BodyText', max_height=1000):
+        """The wrapped Paragraph for a text template (cached by the background when static)"""
+        return self.background.paragraph(self.c, text, self.fields, style, self.content_width, max_height)
+
+    def paragraph(self, text, style='BodyText'):
+        para = self.layout(text, style)
+        para.drawOn(self.c, self.margin, self.y - para.height)
+        self.y -= para.height + self.styles[style].spaceAfter
+
+    def draw_image_centered(self, image, image_width):
+        """Draw a StaticImage centered on the page below y and return its height"""
+        img_height = image.scaled_height(image_width)
+        image.draw(self.c, self.width / 2 - (image_width / 2), self.y - img_height, image_width, img_height)
+        return img_height
+
+    def save(self):
+        self.c.save()
+
+
+# Layout blocks - each factory returns a callable that draws onto a LetterPage.
+# Paragraph texts are str.format templates over the letter fields: pol_no, amount,
+# current_date, deadline_date, cover_period, product, product_lower, banking_text.
+
+def header(date_gap=20, address_gap=20, isphere=True):
+    """NIC logo, letter date, customer name and address, optional I.sphere logo"""
+    def draw(page):
+        c = page.c
+
+        # Add NIC logo at the top center (pushed up for better spacing)
+        page.y = page.height - page.margin + 15  # Push up by 15px for breathing space
+        nic_logo_img = image_asset("NICLOGO.jpg")
+        if nic_logo_img:
+            nic_logo_width = 120
+            nic_logo_height = nic_logo_img.scaled_height(nic_logo_width)
+            nic_logo_x = (page.width - nic_logo_width) / 2  # Center horizontally
+            nic_logo_y = page.y - nic_logo_height
+            nic_logo_img.draw(c, nic_logo_x, nic_logo_y, nic_logo_width, nic_logo_height)
+            page.y = nic_logo_y - 12
+            log_row(f"✅ NIC logo added to arrears letter (positioned higher)")
+        else:
+            print(f"⚠️ Warning: NICLOGO.jpg not found - skipping NIC logo")
+            page.y = page.height - page.margin
+
+        # Add current date (top left)
+        date_para = page.layout("{current_date}", 'BodyText', page.height)
+        date_para.drawOn(c, page.margin, page.y - date_para.height)
+        page.y -= date_para.height + date_gap
+
+        # Add customer address (Initial Caps instead of ALL CAPS)
+        address_lines_with_name = [page.full_customer_name.title()] + [line.title() for line in page.address_lines]
+        for line in address_lines_with_name:
+            if line:  # Only add non-empty lines
+                addr_para = Paragraph(line, page.styles['AddressText'])
+                addr_para.wrapOn(c, page.content_width, page.height)
+                addr_para.drawOn(c, page.margin, page.y - addr_para.height)
+                page.y -= addr_para.height + 3
+
+        # Add NIC I.sphere app logo in the space to the right of the address
+        if isphere:
+            isphere_img = image_asset("isphere_logo.jpg")
+            if isphere_img:
+                isphere_width = 200
+                isphere_height = isphere_img.scaled_height(isphere_width)
+                nic_logo_bottom = page.height - page.margin - 120 - 12  # Approximate NIC logo bottom
+                isphere_x = page.width - page.margin - isphere_width  # Right aligned with margin
+                isphere_y = nic_logo_bottom - 60  # 60px below NIC logo for proper clearance
+                isphere_img.draw(c, isphere_x, isphere_y, isphere_width, isphere_height)
+                log_row(f"✅ NIC I.sphere logo positioned professionally in designated space")
+            else:
+                print(f"⚠️ Warning: isphere_logo.jpg not found - skipping NIC I.sphere logo")
+
+        page.y -= address_gap
+    return draw
+
+def paragraph(text, style='BodyText'):
+    """A wrapped paragraph followed by its style's spaceAfter"""
+    def draw(page):
+        page.paragraph(text, style)
+    return draw
+
+def heading(text, style='BoldText', gap=20):
+    """A paragraph followed by a fixed gap instead of the style's spaceAfter"""
+    def draw(page):
+        para = page.layout(text, style, page.height)
+        para.drawOn(page.c, page.margin, page.y - para.height)
+        page.y -= para.height + gap
+    return draw
+
+def space(points):
+    """Move down by points (negative values move back up)"""
+    def draw(page):
+        page.y -= points
+    return draw
+
+def page_break_below(limit):
+    """Start a new page when less than limit points remain"""
+    def draw(page):
+        if page.y < limit:
+            page.new_page()
+    return draw
+
+def arrears_table(gap=12):
+    """Cover period / policy number / amount in arrears table"""
+    def draw(page):
+        styles = page.styles
+        table_headers = [
+            Paragraph('<font name="Cambria-Bold">Cover Period</font>', styles['TableTextBold']),
+            Paragraph('<font name="Cambria-Bold">Policy Number</font>', styles['TableTextBold']),
+            Paragraph('<font name="Cambria-Bold">Amount in Arrears (MUR)</font>', styles['TableTextBold'])
+        ]
+        table_data = [
+            [
+                Paragraph(page.fields['cover_period'], styles['TableText']),
+                Paragraph(page.fields['pol_no'], styles['TableText']),
+                Paragraph(page.fields['amount'], styles['TableText'])
+            ]
+        ]
+        col_widths = [
+            page.content_width * 0.40,  # Cover Period - 40%
+            page.content_width * 0.30,  # Policy Number - 30%
+            page.content_width * 0.30   # Amount in Arrears - 30%
+        ]
+        table = Table([table_headers] + table_data, colWidths=col_widths)
+        table.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Cambria'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ROWHEIGHT', (0, 0), (-1, -1), 30),
+            ('LEFTPADDING', (0, 0), (-1, -1), 4),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ]))
+        table_width, table_height = table.wrap(page.content_width, 0)
+        table.drawOn(page.c, page.margin, page.y - table_height)
+        page.y -= table_height + gap
+    return draw
+
+def qr_section(layout=QR_COMPACT):
+    """MauCAS logo, QR code and ZwennPay logo, centered (skipped when no QR was generated)"""
+    def draw(page):
+        if page.qr_image is None:
+            return
+        c = page.c
+
+        # Check if we need a new page for QR section
+        if page.y < 200:
+            page.new_page()
+
+        page_center_x = page.width / 2
+        page.y -= layout.pre_space
+
+        maucas_img = image_asset("maucas2.jpeg")
+        if maucas_img:
+            page.y -= page.draw_image_centered(maucas_img, layout.maucas_width) + layout.maucas_gap
+
+        qr_x = page_center_x - (layout.qr_size / 2)
+        c.drawImage(page.qr_image, qr_x, page.y - layout.qr_size, width=layout.qr_size, height=layout.qr_size)
+        page.y -= layout.qr_size + layout.qr_gap
+
+        if layout.label:
+            c.setFont("Cambria-Bold", 11)
+            text_width = c.stringWidth(layout.label, "Cambria-Bold", 11)
+            c.drawString(page_center_x - (text_width / 2), page.y - 10, layout.label)
+            page.y -= 14
+
+        zwenn_img = image_asset("zwennPay.jpg")
+        if zwenn_img:
+            page.y -= page.draw_image_centered(zwenn_img, layout.zwenn_width) + layout.zwenn_gap
+        else:
+            print(f"⚠️ Warning: zwennPay.jpg not found - skipping ZwennPay logo")
+            page.y -= layout.zwenn_gap
+    return draw
+
+def grey_note(text):
+    """Centered light grey paragraph (computer generated document note)"""
+    def draw(page):
+        note = page.layout(text, 'CenterGrey', page.height)
+        note.drawOn(page.c, page.margin, page.y - note.height)
+        page.y -= note.height
+    return draw
+
+def disclaimer(text):
+    """Centered light grey single line drawn 10 points below y"""
+    def draw(page):
+        c = page.c
+        c.setFont("Cambria", 9)
+        c.setFillColor(colors.Color(0.5, 0.5, 0.5))  # Light grey color
+        text_width = c.stringWidth(text, "Cambria", 9)
+        c.drawString((page.width - text_width) / 2, page.y - 10, text)
+    return draw
+
+def signature(closing, signatory):
+    """Closing salutation and signatory line"""
+    def draw(page):
+        c = page.c
+        c.setFont("Cambria", 10.5)
+        c.setFillColor(colors.black)
+        c.drawString(page.margin, page.y, closing)
+        page.y -= 18
+        c.setFont("Cambria-Bold", 10.5)
+        c.drawString(page.margin, page.y, signatory)
+        page.y -= 15
+    return draw
+
+
+class LetterTemplate:
+    """Per-letter-type spec: data columns, QR merchant, wording, deadline and layout blocks
+
+    columns maps the fields read from a row (see ARREARS_COLUMNS) to the column
+    name variations tried in order; merchant_id and banking_text may be callables
+    taking the mapped product type. product_label fixes the product named in the
+    subject, otherwise the row's 'Product Name' is mapped with map_product_name().
+    The amount is the first positive one among the amount columns, or with
+    first_positive_amount=False the first non-missing one.
+    """
+
+    def __init__(self, code, blocks, input_file=None, output_folder=None, columns=ARREARS_COLUMNS,
+                 filename_suffix='arrears', output_excel=None, merchant_id=153, qr_purpose="Arrears Payment",
+                 qr_set_mobile=True, strip_titles=True, require_qr=False, deadline_days=10,
+                 date_dayfirst=True, title_case_name=False, product_label=None, banking_text='',
+                 style_overrides=None, progress_every=50, clean_output=False, merge_folder=None,
+                 success_message="✅ Arrears letter PDF generated for {name}", first_positive_amount=True):
+        self.code = code
+        self.blocks = blocks
+        self.input_file = input_file
+        self.output_folder = output_folder
+        self.columns = dict(ARREARS_COLUMNS, **columns)
+        self.filename_suffix = filename_suffix
+        self.output_excel = output_excel
+        self.merchant_id = merchant_id
+        self.qr_purpose = qr_purpose
+        self.qr_set_mobile = qr_set_mobile
+        self.strip_titles = strip_titles
+        self.require_qr = require_qr
+        self.deadline_days = deadline_days
+        self.date_dayfirst = date_dayfirst
+        self.title_case_name = title_case_name
+        self.product_label = product_label
+        self.banking_text = banking_text
+        self.style_overrides = style_overrides
+        self.progress_every = progress_every
+        self.clean_output = clean_output
+        self.merge_folder = merge_folder
+        self.success_message = success_message
+        self.first_positive_amount = first_positive_amount
+        self._styles = None
+        self._background = None
+
+    @property
+    def styles(self):
+        if self._styles is None:
+            self._styles = build_styles(self.style_overrides)
+        return self._styles
+
+    @property
+    def background(self):
+        """Static paragraph layouts, compiled on first use in each process"""
+        if self._background is None:
+            self._background = StaticBackground(self.styles)
+        return self._background
+
+    def register_fonts(self):
+        register_fonts()
+
+    def resolve_columns(self, df):
+        """Map the input's headers to this template's fields once, and report the mapping"""
+        schema = resolve_schema(self.columns, list(df.columns))
+        print_schema_report(schema)
+        return schema
+
+    def records(self, df, schema):
+        """LetterRecord of every row of df, keyed by DataFrame index"""
+        return build_records(schema, df, self.first_positive_amount)
+
+    def product_type(self, record):
+        return map_product_name(record.product)
+
+    def customer_name(self, record):
+        """Title + policy holder as printed on the letter and used in the file name"""
+        title = record.title
+        policy_holder = record.holder
+        if not self.title_case_name:
+            return f"{title} {policy_holder}".strip()
+        if title and title.strip() and title.lower() != 'nan':
+            return f"{title.strip()} {policy_holder.strip()}".title()
+        return policy_holder.strip().title()
+
+    def address_lines(self, record, full_customer_name):
+        """Address fields of the row, or the split FULL_ADDRESS when they are all blank"""
+        lines = record.address
+        if not any(lines):
+            full_address = record.full_address
+            if full_address:
+                return [line for line in get_address_cache().split(full_address) if line]
+            print(f"⚠️ Warning: No address data available for {full_customer_name}")
+            return ["Address not available"]
+        return [line.strip() for line in lines if line.strip()]
+
+    def qr_payload(self, record):
+        """Build the ZwennPay QR payload for one row"""
+        policy_holder = record.holder
+        pol_no = record.pol_no
+        mobile = record.mobile
+        merchant_id = self.merchant_id(self.product_type(record)) if callable(self.merchant_id) else self.merchant_id
+        return build_qr_payload(merchant_id, pol_no.replace('/', '.'), clean_mobile_number(mobile),
+                                build_customer_label(policy_holder, strip_titles=self.strip_titles),
+                                purpose=self.qr_purpose, set_mobile=self.qr_set_mobile)
+
+    def letter_path(self, index, record, total_records, output_folder):
+        """PDF file of a row: sequence number (Excel order, padded to the input size), policy and name"""
+        padding = len(str(total_records))
+        sequence_num = f"{index + 1:0{padding}d}"
+        safe_name = sanitize_filename(self.customer_name(record))
+        safe_policy = sanitize_filename(record.pol_no)
+        return f"{output_folder}/{sequence_num}_{self.code}_{safe_policy}_{safe_name}_{self.filename_suffix}.pdf"
+
+    def print_folder(self, output_folder):
+        """Folder of the merged print files: merge_folder, else <code>_Merge as for the recovery levels"""
+        if self.merge_folder:
+            return self.merge_folder.format(output_folder=output_folder)
+        return f"{self.code}_Merge"
+
+    def emailed(self, record):
+        """Whether the row's letter is also sent by email (needs its individual PDF)"""
+        return '@' in record.email
+
+    def letter_fields(self, record):
+        """Values substituted into the blocks' text for one row"""
+        product_type = self.product_type(record)
+        subject_product = self.product_label or product_type
+        start_date = format_date(record.start_date, self.date_dayfirst)
+        end_date = format_date(record.end_date, self.date_dayfirst)
+        return {
+            'pol_no': record.pol_no,
+            'amount': format_currency(record.amount),
+            'cover_period': f"{start_date} to {end_date}",
+            'current_date': datetime.now().strftime("%d %B %Y"),
+            'deadline_date': (datetime.now() + pd.Timedelta(days=self.deadline_days)).strftime("%d %B %Y"),
+            'product': subject_product,
+            'product_lower': subject_product.lower(),
+            'banking_text': self.banking_text(product_type) if callable(self.banking_text) else self.banking_text,
+        }
+
+    def fingerprint(self, record, address_lines, version):
+        """(fingerprint of everything printed on the row's letter but the run dates, {run date field: text})"""
+        fields = self.letter_fields(record)
+        content = {name: value for name, value in fields.items() if name not in RUN_DATE_FIELDS}
+        content.update(name=self.customer_name(record), address=address_lines, qr=self.qr_payload(record))
+        return letter_fingerprint(version, content), {name: fields[name] for name in sorted(RUN_DATE_FIELDS)}
+
+    def render_letter(self, index, record, total_records, output_folder, qr_result=None, address_lines=None,
+                      print_file=None):
+        """Render the letter for one LetterRecord and return its COMMENTS outcome
+
+        qr_result and address_lines may be prepared by the caller (see generate_letters).
+        With a PrintFile (--print-only) the letter is rendered in memory and appended to
+        it, and the individual PDF is only written when the row is emailed.
+        """
+        current_row = index + 1
+
+        if current_row % self.progress_every == 0 or current_row == 1 or current_row == total_records:
+            log_row(f"[PROGRESS] Processing row {current_row} of {total_records} ({(current_row/total_records*100):.1f}%)")
+
+        log_row(f"[PROCESSING] Row {current_row} of {total_records}")
+
+        # Skip rules were applied to the whole DataFrame by validate_arrears_rows()
+        full_customer_name = self.customer_name(record)
+        if address_lines is None:
+            address_lines = self.address_lines(record, full_customer_name)
+        fields = self.letter_fields(record)
+        pol_no = fields['pol_no']
+
+        log_row(f"[DEBUG] Processing: {full_customer_name} - Policy: {pol_no}")
+
+        # QR prefetched by run_letter_job(), or fetched now for a single row
+        if qr_result is None:
+            qr_result = fetch_qr_data(self.qr_payload(record))
+        qr_image, qr_error = load_qr_image(qr_result, full_customer_name)
+        if self.require_qr and qr_image is None:
+            print(f"⚠️ Skipping PDF generation for {full_customer_name} due to API error")
+            return qr_error
+
+        pdf_filename = self.letter_path(index, record, total_records, output_folder)
+
+        # A print file only receives the letter once it is completely rendered
+        target = pdf_filename if print_file is None else io.BytesIO()
+        page = LetterPage(target, self.styles, fields, full_customer_name, address_lines, qr_image,
+                          self.background)
+        for block in self.blocks:
+            block(page)
+        page.save()
+        if print_file is not None:
+            pdf_bytes = target.getvalue()
+            if self.emailed(record):
+                with open(pdf_filename, 'wb') as handle:
+                    handle.write(pdf_bytes)
+            print_file.add_letter(pdf_bytes, os.path.basename(pdf_filename), pol_no, full_customer_name)
+
+        log_row(self.success_message.format(name=full_customer_name, pol_no=pol_no))
+        return LETTER_GENERATED
+
+
+def validate_letters(schema, df, run=None, first_positive_amount=True):
+    """Apply the arrears skip rules to the columns resolved by LetterTemplate.resolve_columns()
+
+    With the run of the rows, each skipped row is reported as a row_skipped event.
+    """
+    columns = schema.fields
+    valid_df, counts = validate_arrears_rows(
+        df, columns['pol_no'], columns['holder'], columns['amount'],
+        columns['address'] + [columns['full_address']], first_positive_amount
+    )
+    if run is not None:
+        skipped = df.index.difference(valid_df.index)
+        run.counts['skipped'] += len(skipped)
+        for index in skipped:
+            emit('row_skipped', stage=run.stage, seq=int(index) + 1, reason=df.at[index, 'COMMENTS'])
+    return valid_df, counts
+
+def apply_outcomes(df, outcomes):
+    """Write render outcomes into COMMENTS in one pass (None leaves the row unchanged)"""
+    for index, comment in outcomes.items():
+        if comment is not None:
+            df.at[index, 'COMMENTS'] = comment
+
+def open_letter_run(template, module_name, total_records, output_folder, argv, stage=None, input_file=None):
+    """Open the journal and manifest of a run (see plan_letters/record_outcomes/finish_letter_run)
+
+    The journal keeps its records with --resume; with --incremental the previous
+    run's letters are moved aside until plan_letters() claims them. stage names the
+    run in progress events and its manifest (default: the template code) - the
+    recovery actions sharing a letter type each keep their own; the journal is
+    also kept per input_file (the workbook read, if any). With --print-only
+    [--print-chunk N] the letters are drawn into print files as they are rendered.
+    """
+    incremental = '--incremental' in argv
+    stage = stage or template.code
+    print_run = None
+    if print_only(argv):
+        # Print files hold no per-letter state to resume from or reuse
+        if incremental or '--resume' in argv:
+            print("[ERROR] --print-only cannot be combined with --resume or --incremental")
+            sys.exit(1)
+        label = sanitize_filename(stage) if stage != template.code else None
+        print_run = PrintRun(template.print_folder(output_folder), template.code, get_print_chunk(argv), label)
+    journal_key = sanitize_filename(stage)
+    if input_file:
+        journal_key += '_' + sanitize_filename(os.path.splitext(os.path.basename(input_file))[0])
+    run = LetterRun(LetterJournal(output_folder, journal_key, resume='--resume' in argv),
+                    LetterManifest(output_folder, sanitize_filename(stage)), layout_version(module_name),
+                    {}, {}, {}, total_records, output_folder, incremental,
+                    {'resumed': 0, 'reused': 0, 'redated': 0, 'new': 0, 'changed': 0, 'redate_failed': 0,
+                     'generated': 0, 'failed': 0, 'skipped': 0},
+                    stage, print_run)
+    if incremental:
+        run.manifest.stage()
+    emit('stage_start', stage=run.stage, total=total_records)
+    return run
+
+def plan_letters(template, run, valid_df, schema):
+    """Build the LetterRecords of valid rows and split off the letters needing no render
+
+    --resume skips the rows the journal shows as done with the same content,
+    --incremental reuses the unchanged letters of the previous run, with the
+    new run dates stamped on them if those moved.
+    Returns (records to render, {index: LETTER_GENERATED} for the others).
+    """
+    records = template.records(valid_df, schema)
+    run.records.clear()
+    run.records.update(records)
+    run.address_lines.clear()
+    for index, record in records.items():
+        run.address_lines[index] = template.address_lines(record, template.customer_name(record))
+        run.fingerprints[index] = template.fingerprint(record, run.address_lines[index], run.version)
+    get_address_cache().flush()
+
+    done = {}
+    if run.journal.resumed:
+        for index, record in records.items():
+            path = template.letter_path(index, record, run.total_records, run.output_folder)
+            if run.journal.completed(index + 1, run.fingerprints[index][0], LETTER_GENERATED, path):
+                done[index] = LETTER_GENERATED
+        run.counts['resumed'] += len(done)
+        for index in done:
+            emit('row_done', stage=run.stage, seq=index + 1, status='resumed')
+        print(f"[INFO] Resume: {len(done)} letters already generated, {len(records) - len(done)} left to render")
+
+    if run.incremental:
+        reused = {}
+        redated = 0
+        for index, record in records.items():
+            if index in done:
+                continue
+            fingerprint, dates = run.fingerprints[index]
+            previous = run.manifest.take(fingerprint, dates, file_sha256)
+            if previous is None:
+                run.counts[run.manifest.classify(record.pol_no)] += 1
+                continue
+            staged_path, previous_dates = previous
+            path = template.letter_path(index, record, run.total_records, run.output_folder)
+            if previous_dates == dates:
+                os.replace(staged_path, path)
+            else:
+                stamped = redate_letter(staged_path, {previous_dates[name]: dates[name] for name in dates}, path)
+                os.remove(staged_path)
+                if not stamped:
+                    run.counts['redate_failed'] += 1
+                    continue
+                redated += 1
+            reused[index] = LETTER_GENERATED
+        run.counts['reused'] += len(reused)
+        run.counts['redated'] += redated
+        record_outcomes(template, run, reused.items(), status='reused')
+        done.update(reused)
+        print(f"[INFO] Incremental: {len(reused)} letters reused ({redated} re-dated), "
+              f"{len(records) - len(done)} to render")
+
+    return {index: record for index, record in records.items() if index not in done}, done
+
+def record_outcomes(template, run, outcomes, status=None):
+    """Append (index, COMMENTS) outcomes to the journal with the generated PDF paths
+
+    Each outcome is also reported as a row_done event: generated or failed, or the
+    given status for letters that were not rendered (reused).
+    """
+    for index, comment in outcomes:
+        record = run.records[index]
+        generated = comment == LETTER_GENERATED
+        written = generated and (run.print_run is None or template.emailed(record))
+        path = template.letter_path(index, record, run.total_records, run.output_folder) if written else None
+        run.journal.record(index + 1, record.pol_no, run.fingerprints[index][0], comment, path)
+        if status is None:
+            run.counts['generated' if generated else 'failed'] += 1
+            emit('row_done', stage=run.stage, seq=index + 1, status='generated' if generated else 'failed',
+                 comment=None if generated else comment)
+        else:
+            emit('row_done', stage=run.stage, seq=index + 1, status=status)
+
+def finish_letter_run(run, status=None):
+    """Close the journal, drop the stage's stale letters (--incremental), write the manifest and report stage_done"""
+    # Called from finally blocks: by default an exception on its way out marks the stage as failed
+    status = status or ('error' if sys.exc_info()[0] else 'success')
+    run.journal.close()
+    letters = []
+    for index, (fingerprint, dates) in run.fingerprints.items():
+        record = run.journal.records.get(index + 1)
+        if (record and record['status'] == LETTER_GENERATED and record.get('sha256')
+                and record.get('fingerprint') == fingerprint):
+            letters.append({'fingerprint': fingerprint, 'dates': dates, 'policy': record['policy'],
+                            'path': record['path'], 'sha256': record['sha256']})
+    if run.incremental:
+        # Only letters of this stage's previous manifest - other stages may share the folder
+        run.manifest.discard_staged()
+    try:
+        run.manifest.save(letters)
+    except OSError as e:
+        print(f"⚠️ Warning: Could not write letter manifest: {str(e)}")
+    counts = run.counts
+    if run.print_run is not None:
+        print_files = run.print_run.close()
+        print(f"🖨️ Print files: {counts['generated']} letters in {len(print_files)} files "
+              f"({run.print_run.folder})")
+    emit('stage_done', stage=run.stage, total=run.total_records, status=status,
+         generated=counts['generated'], failed=counts['failed'], skipped=counts['skipped'],
+         resumed=counts['resumed'], reused=counts['reused'])
+
+def prepare_letter_inputs(template, records, run):
+    """QR payload and address lines of every record to render, keyed by DataFrame index"""
+    qr_payloads = {index: template.qr_payload(record) for index, record in records.items()}
+    address_lines = {index: run.address_lines[index] for index in records}
+    return qr_payloads, address_lines
+
+def render_letters(template, module_name, template_name, run, records, argv, quiet_workers=False,
+                   progress_start=0, progress_total=None):
+    """Prefetch the QR codes of records and render them; returns {index: COMMENTS value}"""
+    # QR payloads and address lines are prepared here, so the address cache sees
+    # every row even when the letters are rendered by worker processes
+    qr_payloads, address_lines = prepare_letter_inputs(template, records, run)
+
+    # Fetch QR codes for every letter concurrently over one keep-alive session
+    qr_prefetch = QRPrefetch(qr_payloads, get_qr_concurrency(argv))
+
+    # Render sequentially, or shard rows across a process pool with --workers N
+    workers = get_worker_count(argv)
+    print_run = run.print_run
+    def journal_outcomes(shard_outcomes):
+        record_outcomes(template, run, shard_outcomes)
+
+    try:
+        if workers > 1 and len(records) > 1:
+            shard_size, print_paths = DEFAULT_SHARD_SIZE, None
+            if print_run is not None:
+                # One print file per contiguous range of rows keeps the parts in sequence order
+                shard_size = max(1, min(print_run.chunk_letters, math.ceil(len(records) / workers)))
+                print_paths = [print_run.next_path() for _ in range(math.ceil(len(records) / shard_size))]
+            return render_rows_parallel(module_name, template_name, records, run.output_folder, workers,
+                                        qr_results=qr_prefetch.results(), total_records=run.total_records,
+                                        shard_size=shard_size, quiet=quiet_workers, address_lines=address_lines,
+                                        on_outcomes=journal_outcomes, progress_start=progress_start,
+                                        progress_total=progress_total, print_paths=print_paths)
+        # Sequential rendering consumes each QR as soon as its fetch completes
+        outcomes = {}
+        for index, record in records.items():
+            try:
+                print_file = print_run.file_for_letter() if print_run is not None else None
+                outcomes[index] = template.render_letter(index, record, run.total_records, run.output_folder,
+                                                         qr_prefetch.get(index), address_lines[index],
+                                                         print_file)
+            except Exception as e:
+                print(f"❌ Error generating letter for row {index + 1}: {str(e)}")
+                outcomes[index] = f'Letter generation error: {str(e)[:100]}'
+            journal_outcomes([(index, outcomes[index])])
+        return outcomes
+    finally:
+        qr_prefetch.close()
+
+def generate_letters(template, module_name, template_name, df, output_folder, argv=None, quiet_workers=False,
+                     stage=None, input_file=None):
+    """Validate, prefetch QR codes and render the letters for an in-memory DataFrame
+
+    df must have a 0..n-1 index (file sequence numbers are index + 1); its COMMENTS
+    column is updated in place. module_name/template_name let --workers processes
+    import the same template; quiet_workers silences their per-row output.
+    stage names the run in progress events and input_file the workbook df was read
+    from, if any (see open_letter_run()). Returns (outcomes, skip_counts).
+    """
+    argv = sys.argv if argv is None else argv
+
+    register_fonts()
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Resolve the input's columns once, then classify skipped rows for the whole
+    # DataFrame; only valid rows are rendered
+    # Every outcome is journaled as it arrives; --resume skips rows already generated
+    # and --incremental reuses the letters that did not change since the last run
+    schema = template.resolve_columns(df)
+    run = open_letter_run(template, module_name, len(df), output_folder, argv, stage, input_file)
+    try:
+        valid_df, skip_counts = validate_letters(schema, df, run, template.first_positive_amount)
+        records, done = plan_letters(template, run, valid_df, schema)
+        outcomes = render_letters(template, module_name, template_name, run, records, argv, quiet_workers)
+    finally:
+        finish_letter_run(run)
+    skip_counts.update(run.counts)
+
+    outcomes.update(done)
+    apply_outcomes(df, outcomes)
+    return outcomes, skip_counts
+
+def stream_letters(template, module_name, template_name, input_file, output_folder, argv, stage=None):
+    """Generate the letters of a workbook chunk by chunk (--stream)
+
+    Rows are read with ExcelStream and each chunk is validated, prefetched and
+    rendered before the next one is read, so memory stays flat as the input
+    grows. stage names the run as in generate_letters(). Returns (COMMENTS of
+    every data row in order, outcomes of valid rows, skip_counts).
+    """
+    register_fonts()
+    os.makedirs(output_folder, exist_ok=True)
+
+    stream = ExcelStream(input_file, get_chunk_rows(argv))
+    print(f"[OK] Streaming {stream.total_rows} rows from {input_file} in chunks of {stream.chunk_rows}")
+    if stream.total_rows == 0:
+        print("[WARNING] Excel file is empty")
+        sys.exit(1)
+
+    schema = None
+    comments = []
+    outcomes = {}
+    skip_counts = {'missing_data': 0, 'low_amount': 0, 'no_address': 0, 'valid': 0}
+    run = open_letter_run(template, module_name, stream.total_rows, output_folder, argv, stage, input_file)
+    try:
+        for chunk in stream.chunks():
+            prepare_comments(chunk)
+            if schema is None:
+                schema = template.resolve_columns(chunk)
+            valid_df, chunk_counts = validate_letters(schema, chunk, run, template.first_positive_amount)
+            for name, count in chunk_counts.items():
+                skip_counts[name] += count
+
+            records, done = plan_letters(template, run, valid_df, schema)
+            chunk_outcomes = render_letters(template, module_name, template_name, run, records, argv,
+                                            progress_start=chunk.index[0] + len(chunk) - len(records),
+                                            progress_total=stream.total_rows)
+            chunk_outcomes.update(done)
+            apply_outcomes(chunk, chunk_outcomes)
+            outcomes.update(chunk_outcomes)
+            comments.extend(chunk['COMMENTS'].tolist())
+    finally:
+        finish_letter_run(run)
+    skip_counts.update(run.counts)
+    return comments, outcomes, skip_counts
+
+def incremental_summary(counts):
+    """One line for the run summary: letters reused (as is or re-dated) vs re-rendered"""
+    rerendered = counts['new'] + counts['changed'] + counts['redate_failed']
+    return (f"Incremental - Reused: {counts['reused']} ({counts['redated']} re-dated), Re-rendered: {rerendered} "
+            f"({counts['new']} new, {counts['changed']} changed, {counts['redate_failed']} date not stampable)")
+
+def run_letter_job(template, module_name, template_name, input_file=None, output_folder=None, argv=None):
+    """Read the input workbook, generate its letters and record COMMENTS in its outcome ledger
+
+    Options read from argv: --output FOLDER, --workers N, --qr-concurrency N,
+    --resume (keep the PDFs of an interrupted run and render only the rest),
+    --incremental (reuse the letters unchanged since the previous run),
+    --stream [--chunk-rows N] (read and render the workbook in chunks),
+    --print-only [--print-chunk N] (write the merged print files while rendering,
+    individual PDFs only for emailed rows), --stage NAME (the recovery action
+    rendered, see open_letter_run()) and
+    --write-excel (also write the annotated workbook to output_excel or the input).
+    """
+    argv = sys.argv if argv is None else argv
+    input_file = input_file or template.input_file
+    streaming = '--stream' in argv
+    stage = get_stage(argv)
+    started = time.time()
+
+    if not streaming:
+        df = load_letter_data(input_file)
+    elif not os.path.exists(input_file):
+        print(f"[ERROR] Excel file '{input_file}' not found in the current directory")
+        sys.exit(1)
+
+    output_folder = output_folder or get_output_folder(argv, template.output_folder)
+    print(f"[INFO] Using output folder: {output_folder}")
+
+    # CLEANUP: Delete old PDF files (and old merged PDFs) before generation
+    if template.clean_output and '--resume' not in argv and '--incremental' not in argv:
+        clean_pdf_folder(output_folder)
+    if template.merge_folder:
+        clean_pdf_folder(template.merge_folder.format(output_folder=output_folder), 'merged PDF files')
+
+    if streaming:
+        comments, outcomes, skip_counts = stream_letters(template, module_name, template_name, input_file,
+                                                         output_folder, argv, stage)
+        total_records = len(comments)
+    else:
+        outcomes, skip_counts = generate_letters(template, module_name, template_name, df, output_folder, argv,
+                                                 stage=stage, input_file=input_file)
+        total_records = len(df)
+
+    # Record COMMENTS in the outcome ledger - the annotated workbook is written on demand
+    try:
+        write_outcomes(input_file, comments if streaming else df['COMMENTS'].tolist())
+        print(f"✅ Outcomes recorded in {ledger_path(input_file)}")
+        if '--write-excel' in argv:
+            output_excel = template.output_excel or input_file
+            export_workbook(input_file, output_excel)
+            if os.path.abspath(output_excel) == os.path.abspath(input_file):
+                remove_ledger(input_file)  # The input now carries its COMMENTS itself
+            print(f"✅ Excel file updated with comments")
+    except Exception as e:
+        print(f"⚠️ Warning: Could not record outcomes: {str(e)}")
+
+    # Print summary statistics
+    generated_count = sum(1 for comment in outcomes.values() if comment == LETTER_GENERATED)
+
+    print(f"\n📊 SUMMARY:")
+    print(f"Total records: {total_records}")
+    print(f"Letters generated: {generated_count}")
+    print(f"Skipped - Low amount (< MUR 100): {skip_counts['low_amount']}")
+    print(f"Skipped - No address: {skip_counts['no_address']}")
+    print(f"Skipped - Missing data: {skip_counts['missing_data']}")
+    if skip_counts['resumed']:
+        print(f"Resumed - Already generated: {skip_counts['resumed']}")
+    if '--incremental' in argv:
+        print(incremental_summary(skip_counts))
+    address_cache = get_address_cache()
+    print(address_cache.summary())
+    elapsed = time.time() - started
+    emit('metrics', stage=template.code, rows=total_records, generated=generated_count,
+         elapsed_seconds=round(elapsed, 3), rows_per_second=round(total_records / elapsed, 2) if elapsed else None,
+         address_cache_hits=address_cache.hits + address_cache.disk_hits, address_cache_misses=address_cache.misses)
+    print(f"🎉 Arrears letter generation completed!")
+    return outcomes
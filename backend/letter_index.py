@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# NICL Letter Index - Sidecar index and bookmarks of merged letter PDFs
+# Every merged print file gets <name>.index.json listing, in print order, each letter's
+# sequence number, individual file name, POL_NO, policyholder and page range, and one
+# bookmark per letter. A single letter can then be cut out of the merged file on
+# request, so the individual PDFs are only a cache.
+#
+# Usage: python letter_index.py <merged folder> <letter file name> <output PDF>
+
+import glob
+import json
+import os
+import re
+import sys
+
+import fitz  # PyMuPDF
+
+INDEX_SUFFIX = '.index.json'
+
+# Document info reportlab writes when a letter does not set its own
+_DEFAULT_INFO = {'', 'untitled', 'unspecified', 'anonymous'}
+
+
+def index_path(merged_path):
+    return os.path.splitext(merged_path)[0] + INDEX_SUFFIX
+
+
+def letter_entry(filename, first_page, pages, pol_no=None, policyholder=None):
+    """Index entry of one letter; the sequence number is the file name's numeric prefix"""
+    match = re.match(r'^(\d+)_', filename)
+    return {'seq': int(match.group(1)) if match else None, 'file': filename, 'pol_no': pol_no,
+            'policyholder': policyholder, 'first_page': first_page, 'last_page': first_page + pages - 1}
+
+
+def letter_identity(metadata):
+    """(POL_NO, policyholder) the generator stored in a letter's document info (subject, title)"""
+    metadata = metadata or {}
+    pol_no = metadata.get('subject') or ''
+    policyholder = metadata.get('title') or ''
+    return (None if pol_no in _DEFAULT_INFO else pol_no,
+            None if policyholder in _DEFAULT_INFO else policyholder)
+
+
+def index_entries(letters):
+    """Index entries of merged letters given as (file name, pages, document info) in merge order"""
+    entries = []
+    first_page = 1
+    for filename, pages, metadata in letters:
+        entries.append(letter_entry(filename, first_page, pages, *letter_identity(metadata)))
+        first_page += pages
+    return entries
+
+
+def bookmark_title(entry):
+    """'<seq> - <POL_NO> - <policyholder>', or the file name for letters without document info"""
+    if not entry['pol_no']:
+        return os.path.splitext(entry['file'])[0]
+    parts = [entry['seq'], entry['pol_no'], entry['policyholder']]
+    return ' - '.join(str(part) for part in parts if part)
+
+
+def bookmarks(letters):
+    """PyMuPDF table of contents with one bookmark per merged letter"""
+    return [[1, bookmark_title(entry), entry['first_page']] for entry in index_entries(letters)]
+
+
+def write_index(merged_path, entries):
+    """Write the sidecar index of a merged PDF"""
+    with open(index_path(merged_path), 'w', encoding='utf-8') as handle:
+        json.dump({'merged_file': os.path.basename(merged_path), 'letters': entries}, handle,
+                  ensure_ascii=False, indent=1)
+
+
+def clean_indexes(folder):
+    """Delete the sidecar indexes of a folder whose merged PDFs are being cleaned"""
+    for path in glob.glob(os.path.join(folder, f"*{INDEX_SUFFIX}")):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"⚠️ Warning: Could not delete {path}: {str(e)}")
+
+
+def find_letter(folder, filename):
+    """(merged PDF path, index entry) of a letter file in the merged PDFs of folder, newest first"""
+    indexes = sorted(glob.glob(os.path.join(folder, f"*{INDEX_SUFFIX}")), key=os.path.getmtime, reverse=True)
+    for path in indexes:
+        try:
+            with open(path, encoding='utf-8') as handle:
+                index = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        merged_path = os.path.join(folder, index['merged_file'])
+        if not os.path.exists(merged_path):
+            continue
+        for entry in index['letters']:
+            if entry['file'] == filename:
+                return merged_path, entry
+    return None, None
+
+
+def extract_letter(merged_path, entry, output_path):
+    """Write the pages of one indexed letter to output_path"""
+    merged_doc = fitz.open(merged_path)
+    letter_doc = fitz.open()
+    try:
+        letter_doc.insert_pdf(merged_doc, from_page=entry['first_page'] - 1, to_page=entry['last_page'] - 1)
+        # Readers of the cache never see a partly written letter
+        temp_path = f"{output_path}.tmp"
+        letter_doc.save(temp_path, garbage=4, deflate=True)
+        os.replace(temp_path, output_path)
+    finally:
+        letter_doc.close()
+        merged_doc.close()
+
+
+def main():
+    """python letter_index.py <merged folder> <letter file name> <output PDF> - extract one letter"""
+    if len(sys.argv) < 4:
+        print("Usage: python letter_index.py <merged folder> <letter file name> <output PDF>")
+        sys.exit(1)
+    folder, filename, output_path = sys.argv[1], sys.argv[2], sys.argv[3]
+    merged_path, entry = find_letter(folder, filename)
+    if entry is None:
+        print(f"[ERROR] {filename} is not in any indexed merged PDF of {folder}")
+        sys.exit(2)
+    try:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        extract_letter(merged_path, entry, output_path)
+        print(f"[OK] {filename} extracted from {os.path.basename(merged_path)} "
+              f"(pages {entry['first_page']}-{entry['last_page']})")
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"[ERROR] Could not extract {filename}: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# NICL Letter Journal - Append-only checkpoint of per-row letter outcomes
+# One JSON line per rendered row (sequence, policy, letter fingerprint, status, PDF
+# path, content hash) is written as soon as the row's outcome reaches the parent
+# process, so a run that dies at row 12,000 can be restarted with --resume and only
+# render what is left.
+
+import glob
+import hashlib
+import json
+import os
+import time
+
+JOURNAL_PREFIX = '.journal_'
+
+
+def file_sha256(path):
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def clean_journals(folder):
+    """Delete the journals of a folder whose PDFs are being cleaned"""
+    for path in glob.glob(os.path.join(folder, f"{JOURNAL_PREFIX}*.jsonl")):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"⚠️ Warning: Could not delete {path}: {str(e)}")
+
+
+class LetterJournal:
+    """Checkpoint file of one stage and input, kept next to its PDFs
+
+    key names the stage (template code or recovery action) and the input
+    workbook when there is one, so runs sharing an output folder never resume
+    from or truncate each other's journal.
+
+    A fresh run truncates the journal; with resume=True the existing records are
+    loaded and a row counts as done when its record has the same letter
+    fingerprint (see letter_manifest) and file name, and the PDF still has the
+    recorded hash - so rows are matched on their content, not on the input file.
+    """
+
+    def __init__(self, output_folder, key, resume=False):
+        self.path = os.path.join(output_folder, f"{JOURNAL_PREFIX}{key}.jsonl")
+        self.records = {}
+        if resume and os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as handle:
+                for line in handle:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Partial last line of a crashed run
+                    self.records[record['seq']] = record
+        # Rows of a previous run that this one may skip
+        self.resumed = bool(self.records)
+        self._handle = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+
+    def completed(self, seq, fingerprint, status, path):
+        """True when row seq was recorded with this fingerprint, status and PDF path, and the PDF is intact"""
+        record = self.records.get(seq)
+        if (not record or record.get('fingerprint') != fingerprint or record['status'] != status
+                or record.get('path') != path):
+            return False
+        return os.path.exists(path) and file_sha256(path) == record.get('sha256')
+
+    def record(self, seq, policy, fingerprint, status, path=None):
+        """Append one row outcome and flush it to disk"""
+        entry = {'seq': seq, 'policy': policy, 'fingerprint': fingerprint, 'status': status, 'path': path,
+                 'sha256': file_sha256(path) if path and os.path.exists(path) else None,
+                 'at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        self.records[seq] = entry
+        self._handle.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._handle.flush()
+
+    def close(self):
+        self._handle.close()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# NICL Letter Manifest - Fingerprints of the letters left in an output folder
+# Each run records, per generated letter, a fingerprint of everything printed on it
+# except the run dates, and those dates. With --incremental the next run reuses the
+# PDFs whose fingerprint is unchanged - stamping the new dates on them when the run
+# date moved (see letter_redate.py) - and only renders new or changed letters.
+
+import hashlib
+import importlib.util
+import json
+import os
+
+MANIFEST_PREFIX = '.manifest_'
+# Previous letters are moved aside under this suffix while a run claims its file names
+REUSE_SUFFIX = '.reuse'
+
+
+def layout_version(*module_names):
+    """Hash of the letter engine and template sources - a wording change invalidates every letter"""
+    digest = hashlib.sha1()
+    for name in ('letter_engine',) + module_names:
+        # find_spec also locates a template module that runs as __main__
+        spec = importlib.util.find_spec(name)
+        path = spec.origin if spec else None
+        if path and os.path.exists(path):
+            with open(path, 'rb') as handle:
+                digest.update(handle.read())
+    return digest.hexdigest()[:12]
+
+
+def letter_fingerprint(version, content):
+    """Fingerprint of one letter: layout version + its printed fields (JSON-serialisable)"""
+    payload = json.dumps([version, content], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class LetterManifest:
+    """Previous run's letters of one stage, matched by fingerprint
+
+    key names the stage (the template code, or the recovery action when several
+    actions render the same letter type into one folder), so each stage only
+    reuses and removes the letters its own previous run listed.
+    stage() moves the previous PDFs aside, take() hands each of them out at most
+    once (duplicate rows still get one file each) and discard_staged() removes
+    the ones nobody took. classify() explains why a letter has no PDF to reuse.
+    """
+
+    def __init__(self, output_folder, key):
+        self.path = os.path.join(output_folder, f"{MANIFEST_PREFIX}{key}.json")
+        self.previous = {}
+        self.policies = set()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as handle:
+                    entries = json.load(handle).get('letters', [])
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Warning: Ignoring unreadable manifest {self.path}: {str(e)}")
+                entries = []
+            for entry in entries:
+                self.previous.setdefault(entry['fingerprint'], []).append(entry)
+                self.policies.add(entry['policy'])
+
+    def stage(self):
+        """Move every previous PDF to <path>.reuse, so this run's file names are free"""
+        for entries in self.previous.values():
+            for entry in entries:
+                staged = entry['path'] + REUSE_SUFFIX
+                if os.path.exists(entry['path']):
+                    os.replace(entry['path'], staged)
+                entry['staged'] = staged
+
+    def classify(self, policy):
+        """Why a letter has no reusable PDF: 'changed' or 'new'"""
+        return 'changed' if policy in self.policies else 'new'
+
+    def take(self, fingerprint, dates, file_hash):
+        """(staged path, dates printed on it) of an intact previous PDF with this fingerprint, or None
+
+        A PDF printed with the same dates is handed out first.
+        """
+        entries = self.previous.get(fingerprint, [])
+        for entry in sorted(entries, key=lambda entry: entry['dates'] != dates):
+            staged = entry.get('staged')
+            if staged and os.path.exists(staged) and file_hash(staged) == entry['sha256']:
+                entries.remove(entry)
+                return staged, entry['dates']
+        return None
+
+    def discard_staged(self):
+        """Delete the staged PDFs that no letter of this run reused - the stage's stale letters"""
+        for entries in self.previous.values():
+            for entry in entries:
+                staged = entry.get('staged')
+                if staged and os.path.exists(staged):
+                    os.remove(staged)
+
+    def save(self, letters):
+        """Replace the manifest with this run's letters (list of dicts)"""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump({'letters': letters}, handle, ensure_ascii=False)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+# NICL Letter Pool - Parallel letter rendering across worker processes
+# Shards LetterRecords across a process pool and collects COMMENTS outcomes
+
+import importlib
+import os
+import queue
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from letter_print import PrintFile
+
+# Rows sent to a worker in one task - small enough to balance load, large
+# enough to keep pickling overhead low
+DEFAULT_SHARD_SIZE = 25
+
+_worker_template = None
+_worker_templates = {}
+
+
+def get_worker_count(argv, default=1):
+    """Read the --workers N option from the command line (0 = one per CPU core)"""
+    for i, arg in enumerate(argv):
+        if arg == '--workers' and i + 1 < len(argv):
+            try:
+                workers = int(argv[i + 1])
+            except ValueError:
+                print(f"[WARNING] Invalid --workers value '{argv[i + 1]}', using {default}")
+                return default
+            if workers <= 0:
+                workers = os.cpu_count() or 1
+            return workers
+    return default
+
+
+def _init_worker(module_name, template_name, quiet=False):
+    """Import the generator script once per worker, look up its letter template and register fonts"""
+    global _worker_template
+    if quiet:
+        sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+    _worker_template = getattr(importlib.import_module(module_name), template_name)
+    _worker_template.register_fonts()
+
+
+def _render_shard(shard, total_records, output_folder, print_path=None):
+    """Render one shard of (index, record, qr_result, address_lines) tuples and return their outcomes
+
+    With print_path the shard's letters are drawn into that print file (--print-only).
+    """
+    print_file = PrintFile(print_path) if print_path else None
+    outcomes = []
+    for index, record, qr_result, address_lines in shard:
+        try:
+            comment = _worker_template.render_letter(index, record, total_records, output_folder, qr_result,
+                                                     address_lines, print_file)
+        except Exception as e:
+            print(f"❌ Error generating letter for row {index + 1}: {str(e)}")
+            comment = f'Letter generation error: {str(e)[:100]}'
+        outcomes.append((index, comment))
+    if print_file is not None:
+        print_file.close()
+    return outcomes
+
+
+def _init_shared_worker(quiet=False):
+    """Worker of a pool shared by several letter types - templates are loaded on demand"""
+    if quiet:
+        sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+
+
+def _render_job_shard(module_name, template_name, shard, total_records, output_folder, print_path=None):
+    """Render one shard of any letter type, importing its template once per worker"""
+    global _worker_template
+    key = (module_name, template_name)
+    if key not in _worker_templates:
+        template = getattr(importlib.import_module(module_name), template_name)
+        if not _worker_templates:
+            template.register_fonts()
+        _worker_templates[key] = template
+    _worker_template = _worker_templates[key]
+    return _render_shard(shard, total_records, output_folder, print_path)
+
+
+def render_rows_parallel(module_name, template_name, records, output_folder, workers, qr_results=None,
+                         total_records=None, shard_size=DEFAULT_SHARD_SIZE, quiet=False, address_lines=None,
+                         on_outcomes=None, progress_start=0, progress_total=None, print_paths=None):
+    """Render records ({DataFrame index: LetterRecord}) with the LetterTemplate module_name.template_name
+    across a process pool
+
+    qr_results maps DataFrame index -> prefetched ZwennPay result; rows without an
+    entry fetch their QR inside the worker; address_lines likewise maps index ->
+    lines split by the caller. total_records is the size of the full
+    input (records may be only the rows that passed validation) and sets the padding.
+    quiet discards the workers' per-row output (the caller captures its own stdout).
+    on_outcomes(list of (index, comment)) is called in this process as each shard completes.
+    progress_start/progress_total place the [PROGRESS] lines within a larger run (--stream).
+    print_paths gives each shard, in order, the print file its letters are drawn into (--print-only).
+    Returns a dict mapping DataFrame index -> COMMENTS value (None = leave unchanged).
+    File names are derived from the row index, so the {sequence_num}_... ordering is
+    identical to a sequential run regardless of which worker renders a row.
+    """
+    total_records = total_records or len(records)
+    qr_results = qr_results or {}
+    address_lines = address_lines or {}
+    rows = [(index, record, qr_results.get(index), address_lines.get(index))
+            for index, record in records.items()]
+    shards = [rows[start:start + shard_size] for start in range(0, len(rows), shard_size)]
+
+    print(f"[INFO] Rendering {len(rows)} rows with {workers} worker processes ({len(shards)} shards)")
+
+    outcomes = {}
+    completed = progress_start
+    progress_total = progress_total or len(rows)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(module_name, template_name, quiet)) as executor:
+        futures = [executor.submit(_render_shard, shard, total_records, output_folder,
+                                   print_paths[number] if print_paths else None)
+                   for number, shard in enumerate(shards)]
+        for future in as_completed(futures):
+            shard_outcomes = future.result()
+            for index, comment in shard_outcomes:
+                outcomes[index] = comment
+            if on_outcomes:
+                on_outcomes(shard_outcomes)
+            completed += len(shard_outcomes)
+            print(f"[PROGRESS] Processing row {completed} of {progress_total} "
+                  f"({(completed/progress_total*100):.1f}%)")
+
+    return outcomes
+
+
+def render_jobs_parallel(jobs, workers, shard_size=DEFAULT_SHARD_SIZE, quiet=False, on_shard_done=None,
+                         qr_prefetch=None):
+    """Render several letter jobs on one shared process pool (a global worker budget)
+
+    jobs maps a key -> dict with module_name, template_name, records, output_folder,
+    qr_results, address_lines and total_records (as for render_rows_parallel), and
+    optionally shard_size and print_paths (one print file per shard, --print-only).
+    Shards of all jobs are interleaved so every job progresses together. With a
+    QRPrefetch keyed by (job key, DataFrame index), each shard is sent to the pool
+    as soon as its own QR codes are fetched, so rendering overlaps the requests.
+    on_shard_done(key, shard_outcomes, job_finished) is called in the parent
+    process as each shard completes, with the shard's list of (index, comment).
+    Returns {key: {DataFrame index: COMMENTS value}}.
+    """
+    shard_lists = {}
+    for key, job in jobs.items():
+        qr_results = job.get('qr_results') or {}
+        address_lines = job.get('address_lines') or {}
+        rows = [(index, record, qr_results.get(index), address_lines.get(index))
+                for index, record in job['records'].items()]
+        size = job.get('shard_size') or shard_size
+        shard_lists[key] = [rows[start:start + size] for start in range(0, len(rows), size)]
+
+    # Round-robin over the jobs so no letter type waits for another to finish
+    ordered = []
+    for position in range(max((len(shards) for shards in shard_lists.values()), default=0)):
+        for key, shards in shard_lists.items():
+            if position < len(shards):
+                ordered.append((key, position, shards[position]))
+
+    total_rows = sum(len(shard) for _, _, shard in ordered)
+    print(f"[INFO] Rendering {total_rows} rows of {len(jobs)} letter types with {workers} worker processes "
+          f"({len(ordered)} shards)")
+
+    # Shards whose QR codes are ready and rendered shards, in the order they happen
+    events = queue.Queue()
+    outcomes = {key: {} for key in jobs}
+    remaining = {key: len(shards) for key, shards in shard_lists.items()}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_shared_worker,
+                             initargs=(quiet,)) as executor:
+        for key, number, shard in ordered:
+            ready = ('ready', key, number, shard)
+            if qr_prefetch is None:
+                events.put(ready)
+            else:
+                qr_prefetch.when_ready([(key, row[0]) for row in shard], lambda ready=ready: events.put(ready))
+
+        rendering = len(ordered)
+        while rendering:
+            event = events.get()
+            if event[0] == 'ready':
+                _, key, number, shard = event
+                job = jobs[key]
+                if qr_prefetch is not None:
+                    shard = [(index, record, qr_prefetch.get((key, index)), lines)
+                             for index, record, _, lines in shard]
+                print_paths = job.get('print_paths')
+                future = executor.submit(_render_job_shard, job['module_name'], job['template_name'], shard,
+                                         job['total_records'], job['output_folder'],
+                                         print_paths[number] if print_paths else None)
+                future.add_done_callback(lambda future, key=key: events.put(('rendered', key, future)))
+                continue
+            _, key, future = event
+            shard_outcomes = future.result()
+            outcomes[key].update(shard_outcomes)
+            remaining[key] -= 1
+            rendering -= 1
+            if on_shard_done:
+                on_shard_done(key, shard_outcomes, remaining[key] == 0)
+
+    return outcomes
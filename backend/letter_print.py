@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# NICL Letter Print - Print files written while the letters are generated (--print-only)
+# Each letter is rendered into an in-memory PDF and appended to the open print file
+# once it is complete, so a print run needs no merge pass re-reading letter PDFs from
+# disk and a letter that fails to render never leaves pages behind. Individual PDFs
+# are only written for the rows that are emailed; each print file has a bookmark per
+# letter and the same page index as a merged file (see letter_index.py).
+
+import glob
+import os
+from datetime import datetime
+
+import fitz  # PyMuPDF
+
+from letter_index import bookmark_title, letter_entry, write_index
+
+# Letters per print file - bounds the pages a print file holds in memory
+PRINT_CHUNK_LETTERS = 1000
+
+# Identical logo streams of the appended letters are stored once
+PRINT_SAVE_OPTIONS = {'garbage': 4, 'deflate': True}
+
+
+def print_only(argv):
+    return '--print-only' in argv
+
+
+def get_print_chunk(argv, default=PRINT_CHUNK_LETTERS):
+    """Read the --print-chunk N option from the command line"""
+    for i, arg in enumerate(argv):
+        if arg == '--print-chunk' and i + 1 < len(argv):
+            try:
+                return max(1, int(argv[i + 1]))
+            except ValueError:
+                print(f"[WARNING] Invalid --print-chunk value '{argv[i + 1]}', using {default}")
+    return default
+
+
+class PrintFile:
+    """The pages of consecutive letters collected in one document, saved as a single PDF"""
+
+    def __init__(self, path):
+        self.path = path
+        self.doc = fitz.open()
+        self.letters = 0
+        self.entries = []
+
+    def add_letter(self, pdf_bytes, filename, pol_no, policyholder):
+        """Append one rendered letter (a complete PDF as bytes) and index it
+
+        filename is the letter's individual PDF name.
+        """
+        letter_doc = fitz.open(stream=pdf_bytes, filetype='pdf')
+        try:
+            first_page = self.doc.page_count + 1
+            self.doc.insert_pdf(letter_doc)
+            entry = letter_entry(filename, first_page, letter_doc.page_count, pol_no, policyholder)
+        finally:
+            letter_doc.close()
+        self.entries.append(entry)
+        self.letters += 1
+
+    def close(self):
+        """Write the file and its index (nothing when no letter was added); returns the number of letters"""
+        try:
+            if self.letters:
+                self.doc.set_toc([[1, bookmark_title(entry), entry['first_page']] for entry in self.entries])
+                self.doc.save(self.path, **PRINT_SAVE_OPTIONS)
+                write_index(self.path, self.entries)
+        finally:
+            self.doc.close()
+        return self.letters
+
+
+class PrintRun:
+    """The print files of one letter run: <folder>/Arrears_<code>_Letters_Merged_<time>_partNNN.pdf
+
+    Sequentially rendered letters roll over to a new part every chunk_letters
+    letters; worker processes get a part per range of rows (see next_path()).
+    Parts sort in sequence order.
+    """
+
+    def __init__(self, folder, code, chunk_letters=PRINT_CHUNK_LETTERS, label=None):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.chunk_letters = chunk_letters
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        prefix = f"Arrears_{code}_Letters_Merged_{stamp}" + (f"_{label}" if label else "")
+        # Runs of the same letter type (recovery levels) share the folder - never reuse their names
+        suffix = 1
+        self.prefix = prefix
+        while glob.glob(os.path.join(folder, f"{glob.escape(self.prefix)}_part*.pdf")):
+            suffix += 1
+            self.prefix = f"{prefix}_{suffix}"
+        self.parts = 0
+        self.current = None
+        self.files = []
+
+    def next_path(self):
+        self.parts += 1
+        path = os.path.join(self.folder, f"{self.prefix}_part{self.parts:03d}.pdf")
+        self.files.append(path)
+        return path
+
+    def file_for_letter(self):
+        """The PrintFile taking the next letter, starting a new part when the current one is full"""
+        if self.current is None or self.current.letters >= self.chunk_letters:
+            self._close_current()
+            self.current = PrintFile(self.next_path())
+        return self.current
+
+    def _close_current(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+
+    def close(self):
+        """Save the open part; returns the print files written"""
+        self._close_current()
+        self.files = [path for path in self.files if os.path.exists(path)]
+        return self.files
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# NICL Letter Records - Columnar extraction of the fields a letter reads from its row
+# The uploaded headers are mapped to the template's fields once per input (reporting
+# unmapped and ambiguous columns), each column is converted to a plain Python list in
+# one call, and every row becomes a compact LetterRecord instead of a pandas Series
+# probed with row.get() for each field and name variation.
+
+from collections import namedtuple
+
+from letter_validation import column_candidates
+
+# Fields of a template's columns mapping that are read as text, first non-missing variation wins
+TEXT_FIELDS = ('title', 'holder', 'pol_no', 'mobile', 'email', 'product', 'full_address')
+# Fields kept as the raw cell value (dates are parsed by format_date)
+RAW_FIELDS = ('start_date', 'end_date')
+
+# Headers of an input mapped to the template's fields: fields holds, per field, the
+# variations present in the input in priority order ('address' one list per address
+# field); unmapped lists the headers no field reads, ambiguous the fields with several
+# variations present and missing the fields with none
+ColumnSchema = namedtuple('ColumnSchema', 'fields unmapped ambiguous missing')
+
+
+class LetterRecord:
+    """The input fields of one letter - address is a tuple with one text per address field"""
+
+    __slots__ = ('title', 'holder', 'pol_no', 'amount', 'start_date', 'end_date', 'mobile', 'email', 'product',
+                 'address', 'full_address')
+
+    def __init__(self, title, holder, pol_no, amount, start_date, end_date, mobile, email, product, address,
+                 full_address):
+        self.title = title
+        self.holder = holder
+        self.pol_no = pol_no
+        self.amount = amount
+        self.start_date = start_date
+        self.end_date = end_date
+        self.mobile = mobile
+        self.email = email
+        self.product = product
+        self.address = address
+        self.full_address = full_address
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+def resolve_schema(columns, headers):
+    """Map the headers of an input to the fields of a template's columns mapping"""
+    header_set = set(headers)
+    used = set()
+
+    def present(variations):
+        found = [column for column in column_candidates(variations or []) if column in header_set]
+        used.update(found)
+        return found
+
+    fields = {name: present(variations) for name, variations in columns.items() if name != 'address'}
+    fields['address'] = [present(variations) for variations in columns['address']]
+
+    ambiguous = {name: found for name, found in fields.items() if name != 'address' and len(found) > 1}
+    ambiguous.update({f"address {position + 1}": found for position, found in enumerate(fields['address'])
+                      if len(found) > 1})
+    missing = [name for name, found in fields.items()
+               if name != 'address' and not found and column_candidates(columns[name] or [])]
+    if columns['address'] and not any(fields['address']):
+        missing.append('address')
+    # COMMENTS is the outcome column written back by the generators, not an input
+    unmapped = [header for header in headers if header not in used and header != 'COMMENTS']
+    return ColumnSchema(fields, unmapped, ambiguous, missing)
+
+
+def print_schema_report(schema):
+    """One line for the mapping, plus the ambiguous fields and the unmapped headers"""
+    mapped = sum(1 for name, found in schema.fields.items() if name != 'address' and found)
+    mapped += 1 if any(schema.fields['address']) else 0
+    print(f"[INFO] Columns: {mapped}/{mapped + len(schema.missing)} fields mapped"
+          + (f", missing: {', '.join(schema.missing)}" if schema.missing else ""))
+    for name, found in schema.ambiguous.items():
+        print(f"[WARNING] Field '{name}' matches several columns {found} - "
+              f"each row uses them in that order of preference")
+    if schema.unmapped:
+        print(f"[INFO] Columns not used by the letter: {', '.join(str(header) for header in schema.unmapped)}")
+
+
+def first_present(df, columns, convert=None):
+    """Per row, the first non-missing value among the resolved columns (converted), else ''"""
+    values = [None] * len(df)
+    for column in columns:
+        cells = df[column].tolist()
+        present = df[column].notna().tolist()
+        values = [value if value is not None or not ok else (convert(cell) if convert else cell)
+                  for value, cell, ok in zip(values, cells, present)]
+    return ['' if value is None else value for value in values]
+
+
+def first_amounts(df, columns, first_positive=True):
+    """Per row, the first positive amount among the resolved columns
+
+    Like the per-row loop it replaces: unparseable cells are skipped and, when no
+    variation is positive, the last parsed amount (or 0) is kept. With
+    first_positive=False the first non-missing cell is taken, unparseable ones
+    as 0 - the same rule as amount_column() in letter_validation.
+    """
+    amounts = [0] * len(df)
+    settled = [False] * len(df)
+    for column in columns:
+        cells = df[column].tolist()
+        present = df[column].notna().tolist()
+        for position, (cell, ok) in enumerate(zip(cells, present)):
+            if ok and not settled[position]:
+                try:
+                    amounts[position] = float(cell)
+                except (ValueError, TypeError):
+                    if first_positive:
+                        continue
+                settled[position] = amounts[position] > 0 or not first_positive
+    return amounts
+
+
+def build_records(schema, df, first_positive_amount=True):
+    """LetterRecord of every row of df, keyed by DataFrame index (schema from resolve_schema)"""
+    columns = schema.fields
+    fields = {name: first_present(df, columns[name], str) for name in TEXT_FIELDS}
+    fields.update({name: first_present(df, columns[name]) for name in RAW_FIELDS})
+    fields['amount'] = first_amounts(df, columns['amount'], first_positive_amount)
+    fields['address'] = list(zip(*[first_present(df, found, str) for found in columns['address']]))
+    if not columns['address']:
+        fields['address'] = [()] * len(df)
+
+    columns_in_order = [fields[name] for name in LetterRecord.__slots__]
+    return {index: LetterRecord(*values) for index, values in zip(df.index, zip(*columns_in_order))}
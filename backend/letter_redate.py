@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# NICL Letter Redate - Stamp the new run dates on an otherwise unchanged letter
+# With --incremental a letter whose only change since the previous run is its dates
+# is not rendered again (no QR request, no layout): the old date spans are redacted
+# with PyMuPDF and the new dates drawn over them in the same font, size and baseline
+# from a small stamp page, so the month-over-month run reuses every unchanged letter.
+
+import io
+from functools import lru_cache
+
+import fitz
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+
+# A new date wider than the room left by the old one is condensed down to this
+# horizontal scale (%), beyond that the letter is rendered again
+MIN_HORIZ_SCALE = 85
+REDATE_SAVE_OPTIONS = {'garbage': 4, 'deflate': True}
+
+
+def compact(text):
+    """Text without any whitespace - extraction spacing differs once spans are removed"""
+    return ''.join(text.split())
+
+
+def page_text(page):
+    """Text of a page (no images) for extractDICT() / extractText()"""
+    return page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+
+
+def date_stamps(page, text_page, dates):
+    """Spans of the page holding exactly one old date, with the new text and the room for it
+
+    Returns [(span, new text, width available)] or None when an old date also appears
+    elsewhere on the page (split over two lines, or inside a longer span).
+    """
+    stamps = []
+    found = dict.fromkeys(dates, 0)
+    for block in text_page.extractDICT()['blocks']:
+        for line in block.get('lines', []):
+            spans = line['spans']
+            for position, span in enumerate(spans):
+                old = span['text'].strip()
+                if old not in dates:
+                    continue
+                found[old] += 1
+                x0 = span['bbox'][0]
+                # Up to the next span of the line, or the right margin (same as the left one)
+                following = [other['bbox'][0] for other in spans[position + 1:] if other['bbox'][0] > x0]
+                limit = min(following) if following else page.rect.width - line['bbox'][0]
+                stamps.append((span, dates[old], limit - x0))
+    text = compact(text_page.extractText())
+    if any(text.count(compact(old)) != count for old, count in found.items()):
+        return None
+    return stamps
+
+
+@lru_cache(maxsize=64)
+def stamp_page(font_name, size, color, text):
+    """One-page PDF of text with its baseline one font size above the bottom, and its width
+
+    Drawn by reportlab (subset fonts, like the letters) once per run for each new date.
+    """
+    width = pdfmetrics.stringWidth(text, font_name, size)
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(width, size * 2))
+    c.setFont(font_name, size)
+    c.setFillColorRGB(((color >> 16) & 255) / 255, ((color >> 8) & 255) / 255, (color & 255) / 255)
+    c.drawString(0, size, text)
+    c.save()
+    return buffer.getvalue(), width
+
+
+def stamp_rect(span, width, room):
+    """Where the stamp of a span's new date goes - condensed into room if wider, None if too wide"""
+    scale = min(1, room / width) if width else 1
+    if scale * 100 < MIN_HORIZ_SCALE:
+        return None
+    x, baseline = span['origin']
+    size = span['size']
+    return fitz.Rect(x, baseline - size, x + width * scale, baseline + size)
+
+
+def redate_letter(path, dates, target):
+    """Write the letter at path to target with its dates replaced ({old text: new text})
+
+    Returns False, without writing target, when a date cannot be swapped in place:
+    it is not a span of its own, the new text does not fit or the redaction would
+    touch any other text. The caller then renders the letter again.
+    """
+    dates = {old: new for old, new in dates.items() if old != new}
+    with fitz.open(path) as doc:
+        pages = []
+        texts = []
+        for page in doc:
+            text_page = page_text(page)
+            stamps = date_stamps(page, text_page, dates)
+            if stamps is None:
+                return False
+            pages.append(stamps)
+            texts.append(compact(text_page.extractText()))
+        if not any(pages):
+            return False
+
+        placed = []
+        for stamps in pages:
+            page_stamps = []
+            for span, new, room in stamps:
+                try:
+                    stamp, width = stamp_page(span['font'].split('+')[-1], span['size'], span['color'], new)
+                except KeyError:
+                    # Font not registered with reportlab
+                    return False
+                rect = stamp_rect(span, width, room)
+                if rect is None:
+                    return False
+                page_stamps.append((span, stamp, rect))
+            placed.append(page_stamps)
+
+        for page, page_stamps, expected in zip(doc, placed, texts):
+            if not page_stamps:
+                continue
+            for span, stamp, rect in page_stamps:
+                expected = expected.replace(compact(span['text']), '', 1)
+                # Inset so the glyphs of the neighbouring words and lines are not caught
+                x0, y0, x1, y1 = span['bbox']
+                page.add_redact_annot(fitz.Rect(x0 + 0.5, y0 + 1, x1 - 0.5, y1 - 1), fill=False)
+            page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE, graphics=fitz.PDF_REDACT_LINE_ART_NONE)
+            if compact(page_text(page).extractText()) != expected:
+                return False
+            for span, stamp, rect in page_stamps:
+                with fitz.open('pdf', stamp) as stamp_doc:
+                    page.show_pdf_page(rect, stamp_doc, 0, keep_proportion=False)
+        doc.save(target, **REDATE_SAVE_OPTIONS)
+    return True
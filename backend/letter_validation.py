@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# NICL Letter Validation - Whole-DataFrame skip classification before rendering
+# Computes the arrears skip rules as column masks, writes the skip reasons into
+# COMMENTS in bulk and hands only the surviving rows to the render loop.
+
+import pandas as pd
+
+from progress_events import log_row
+
+MISSING_DATA_COMMENT = 'Missing essential data (Policy No or Policy Holder)'
+NO_ADDRESS_COMMENT = 'No valid address available'
+MINIMUM_ARREARS = 100
+
+ARREARS_ADDRESS_COLUMNS = ['POL_PH_ADDR1', 'POL_PH_ADDR2', 'POL_PH_ADDR4', 'FULL_ADDRESS']
+
+
+def column_candidates(columns):
+    """A column name or a list of column name variations, as a list"""
+    return [columns] if isinstance(columns, str) else list(columns)
+
+
+def text_column(df, columns):
+    """First non-missing value among the column variations as strings ('' if none)"""
+    values = pd.Series('', index=df.index, dtype=object)
+    filled = pd.Series(False, index=df.index)
+    for column in column_candidates(columns):
+        if column in df.columns:
+            take = ~filled & df[column].notna()
+            values[take] = df.loc[take, column].astype(str)
+            filled |= take
+    return values
+
+
+def amount_column(df, columns, first_positive=True):
+    """First positive amount among the column variations as floats (0 if none)
+
+    Unparseable values are skipped, like the per-row float() conversion did.
+    With first_positive=False the first non-missing value is taken instead, and
+    an unparseable one counts as 0 (NonMotor_L0's rule).
+    """
+    amounts = pd.Series(0.0, index=df.index)
+    filled = pd.Series(False, index=df.index)
+    for column in column_candidates(columns):
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors='coerce')
+            if first_positive:
+                take = (amounts <= 0) & values.notna()
+                amounts[take] = values[take]
+            else:
+                take = ~filled & df[column].notna()
+                amounts[take] = values[take].fillna(0.0)
+                filled |= take
+    return amounts
+
+
+def validate_arrears_rows(df, pol_no_columns='POL_NO', holder_columns='POLICY_HOLDER',
+                          amount_columns='TrueArrears', address_columns=ARREARS_ADDRESS_COLUMNS,
+                          first_positive_amount=True):
+    """Classify every row against the arrears skip rules in one vectorized pass
+
+    Rules are applied in the same order as the original per-row checks: missing
+    policy number / holder, arrears below MUR 100, then all address fields blank.
+    Each column argument is a name or a list of name variations tried in order;
+    address_columns lists one such argument per address field.
+    first_positive_amount picks the amount rule (see amount_column()).
+    Skip reasons are written into df['COMMENTS'].
+    Returns (valid_df, counts) where counts holds missing_data, low_amount,
+    no_address and valid row totals.
+    """
+    missing_data = (text_column(df, pol_no_columns) == '') | (text_column(df, holder_columns) == '')
+
+    amounts = amount_column(df, amount_columns, first_positive_amount)
+    low_amount = ~missing_data & (amounts < MINIMUM_ARREARS)
+
+    address_blank = pd.Series(True, index=df.index)
+    for column in address_columns:
+        address_blank &= text_column(df, column).str.strip() == ''
+    no_address = ~missing_data & ~low_amount & address_blank
+
+    df.loc[missing_data, 'COMMENTS'] = MISSING_DATA_COMMENT
+    df.loc[low_amount, 'COMMENTS'] = amounts[low_amount].map(
+        lambda amount: f'Arrears amount too low (MUR {amount:.2f} < MUR {MINIMUM_ARREARS})'
+    )
+    df.loc[no_address, 'COMMENTS'] = NO_ADDRESS_COMMENT
+
+    for index in df.index[missing_data]:
+        log_row(f"⚠️ Skipping row {index + 1}: Missing essential data (Policy No or Policy Holder)")
+    for index in df.index[low_amount]:
+        log_row(f"⚠️ Skipping row {index + 1}: Arrears amount too low (MUR {amounts[index]:.2f})")
+    for index in df.index[no_address]:
+        log_row(f"⚠️ Skipping row {index + 1}: No valid address available")
+
+    valid = ~(missing_data | low_amount | no_address)
+    counts = {
+        'missing_data': int(missing_data.sum()),
+        'low_amount': int(low_amount.sum()),
+        'no_address': int(no_address.sum()),
+        'valid': int(valid.sum()),
+    }
+    print(f"[INFO] Validation: {counts['valid']} rows to render, "
+          f"{len(df) - counts['valid']} skipped before rendering")
+    return df[valid], counts
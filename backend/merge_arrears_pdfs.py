@@ -7,6 +7,10 @@ Uses PyMuPDF for reliable QR code and image preservation across Windows/Ubuntu
 Usage:
     python merge_arrears_pdfs.py --input Motor_L0 --output Motor_L0_Merge
     python merge_arrears_pdfs.py --input Inactive_Health --output Inactive_Health_Merge
+    python merge_arrears_pdfs.py --input Motor_L0 --output Motor_L0_Merge --workers 4
+
+The merged PDF has one bookmark per letter and a <name>.index.json sidecar mapping
+sequence, POL_NO and policyholder to its pages (see letter_index.py)
 """
 
 import os
@@ -24,6 +28,9 @@ except ImportError:
     print("\nPyMuPDF is required for reliable QR code preservation during PDF merging.")
     sys.exit(1)
 
+from letter_index import bookmarks, clean_indexes, index_entries, write_index
+from pdf_merge import merge_files_parallel
+
 def test_pdf_files(input_folder="Motor_L0"):
     """Test individual PDF files to check if they're readable using PyMuPDF"""
     
@@ -57,8 +64,8 @@ def test_pdf_files(input_folder="Motor_L0"):
         except Exception as e:
             print(f"❌ {os.path.basename(pdf_file)}: Error - {str(e)}")
 
-def merge_motor_pdfs(input_folder, output_folder):
-    """Merge all PDFs from input folder into a single PDF using PyMuPDF"""
+def merge_motor_pdfs(input_folder, output_folder, workers=1):
+    """Merge all PDFs from input folder into a single PDF using PyMuPDF (workers > 1: parallel tree merge)"""
     
     # Check if input folder exists
     if not os.path.exists(input_folder):
@@ -74,6 +81,7 @@ def merge_motor_pdfs(input_folder, output_folder):
     # CLEANUP: Delete all old merged PDF files before creating new ones
     print(f"🗑️ Cleaning up old merged PDFs from {output_folder}...")
     try:
+        clean_indexes(output_folder)
         old_merged_files = [f for f in os.listdir(output_folder) if f.endswith('.pdf')]
         for old_file in old_merged_files:
             os.remove(os.path.join(output_folder, old_file))
@@ -103,51 +111,69 @@ def merge_motor_pdfs(input_folder, output_folder):
     merged_filepath = os.path.join(output_folder, merged_filename)
     
     try:
-        # Create new merged document using PyMuPDF
-        merged_doc = fitz.open()
-        total_pages = 0
+        if workers > 1 and len(pdf_files) > 1:
+            # Tree merge: workers merge contiguous ranges, then the chunks are joined in order
+            print(f"⚡ Parallel merge with {workers} worker processes")
+            def report_progress(files_done, total_files):
+                print(f"📖 Processed {files_done}/{total_files} PDF files")
+            _, final_pages, failures, letters = merge_files_parallel(pdf_files, merged_filepath, workers,
+                                                                     {'garbage': 4}, on_progress=report_progress,
+                                                                     toc=bookmarks)
+            for filename, error in failures:
+                print(f"⚠️ Error processing {filename}: {error}")
+        else:
+            # Create new merged document using PyMuPDF
+            merged_doc = fitz.open()
+            total_pages = 0
+            letters = []
         
-        # Process each PDF file
-        for i, pdf_file in enumerate(pdf_files, 1):
-            try:
-                print(f"📖 Processing {i}/{len(pdf_files)}: {os.path.basename(pdf_file)}")
+            # Process each PDF file
+            for i, pdf_file in enumerate(pdf_files, 1):
+                try:
+                    print(f"📖 Processing {i}/{len(pdf_files)}: {os.path.basename(pdf_file)}")
                 
-                # Open source PDF with PyMuPDF
-                source_doc = fitz.open(pdf_file)
+                    # Open source PDF with PyMuPDF
+                    source_doc = fitz.open(pdf_file)
                 
-                # Check if PDF has pages
-                num_pages = source_doc.page_count
-                if num_pages == 0:
-                    print(f"⚠️ Skipping {pdf_file}: No pages found")
-                    source_doc.close()
-                    continue
+                    # Check if PDF has pages
+                    num_pages = source_doc.page_count
+                    if num_pages == 0:
+                        print(f"⚠️ Skipping {pdf_file}: No pages found")
+                        source_doc.close()
+                        continue
                 
-                print(f"   📄 Adding {num_pages} pages from this PDF")
+                    print(f"   📄 Adding {num_pages} pages from this PDF")
                 
-                # Insert all pages from source PDF (preserves QR codes and all content)
-                for page_num in range(num_pages):
-                    try:
-                        merged_doc.insert_pdf(source_doc, from_page=page_num, to_page=page_num)
-                        total_pages += 1
-                    except Exception as page_error:
-                        print(f"   ⚠️ Error adding page {page_num + 1}: {str(page_error)}")
-                        continue
+                    # Insert all pages from source PDF (preserves QR codes and all content)
+                    pages_added = 0
+                    for page_num in range(num_pages):
+                        try:
+                            merged_doc.insert_pdf(source_doc, from_page=page_num, to_page=page_num)
+                            total_pages += 1
+                            pages_added += 1
+                        except Exception as page_error:
+                            print(f"   ⚠️ Error adding page {page_num + 1}: {str(page_error)}")
+                            continue
+                    if pages_added:
+                        letters.append((os.path.basename(pdf_file), pages_added, source_doc.metadata))
                 
-                # Close source document
-                source_doc.close()
+                    # Close source document
+                    source_doc.close()
                         
-            except Exception as e:
-                print(f"⚠️ Error processing {pdf_file}: {str(e)}")
-                continue
+                except Exception as e:
+                    print(f"⚠️ Error processing {pdf_file}: {str(e)}")
+                    continue
         
-        # Save the merged PDF
-        merged_doc.save(merged_filepath)
+            # Save the merged PDF with one bookmark per letter
+            # garbage=4 stores identical streams once - the logos shared by every letter
+            merged_doc.set_toc(bookmarks(letters))
+            merged_doc.save(merged_filepath, garbage=4)
         
-        # Get final page count for verification
-        final_pages = merged_doc.page_count
+            # Get final page count for verification
+            final_pages = merged_doc.page_count
         
-        # Close merged document
-        merged_doc.close()
+            # Close merged document
+            merged_doc.close()
         
         print(f"✅ Successfully merged {len(pdf_files)} PDFs!")
         print(f"📄 Merged PDF saved as: {merged_filepath}")
@@ -157,6 +183,8 @@ def merge_motor_pdfs(input_folder, output_folder):
         if os.path.exists(merged_filepath):
             file_size = os.path.getsize(merged_filepath)
             print(f"📏 File size: {file_size:,} bytes")
+            write_index(merged_filepath, index_entries(letters))
+            print(f"🔖 {len(letters)} letters bookmarked and indexed")
         
     except Exception as e:
         print(f"❌ Error during merging: {str(e)}")
@@ -171,6 +199,7 @@ Examples:
   python merge_arrears_pdfs.py --input Motor_L0 --output Motor_L0_Merge
   python merge_arrears_pdfs.py --input Inactive_Health --output Inactive_Health_Merge
   python merge_arrears_pdfs.py --input Inactive_NonMotor --output Inactive_NonMotor_Merge
+  python merge_arrears_pdfs.py --input Motor_L0 --output Motor_L0_Merge --workers 0
         '''
     )
     
@@ -180,6 +209,10 @@ Examples:
     parser.add_argument('--output', '-o',
                         required=True,
                         help='Output folder for merged PDF file')
+    parser.add_argument('--workers', '-w',
+                        type=int,
+                        default=1,
+                        help='Merge ranges of files in N worker processes (0 = one per CPU core)')
     
     args = parser.parse_args()
     
@@ -191,5 +224,5 @@ Examples:
     test_pdf_files()
     
     # Then proceed with merge
-    merge_motor_pdfs(args.input, args.output)
+    merge_motor_pdfs(args.input, args.output, args.workers if args.workers > 0 else (os.cpu_count() or 1))
     print("🎉 PDF merge process completed!")
\ No newline at end of file
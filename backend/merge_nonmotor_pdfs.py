@@ -3,6 +3,8 @@
 Motor Insurance Arrears PDF Merger
 Combines all PDF files from Motor_L0 folder into a single merged PDF
 Uses PyMuPDF for reliable QR code and image preservation across Windows/Ubuntu
+The merged PDF has one bookmark per letter and a <name>.index.json sidecar mapping
+sequence, POL_NO and policyholder to its pages (see letter_index.py)
 """
 
 import os
@@ -19,6 +21,8 @@ except ImportError:
     print("\nPyMuPDF is required for reliable QR code preservation during PDF merging.")
     sys.exit(1)
 
+from letter_index import bookmarks, clean_indexes, index_entries, write_index
+
 def test_pdf_files():
     """Test individual PDF files to check if they're readable using PyMuPDF"""
     input_folder = "Motor_L0"
@@ -69,6 +73,7 @@ def merge_motor_pdfs():
     # CLEANUP: Delete all old merged PDF files before creating new ones
     print(f"🗑️ Cleaning up old merged PDFs from {output_folder}...")
     try:
+        clean_indexes(output_folder)
         old_merged_files = [f for f in os.listdir(output_folder) if f.endswith('.pdf')]
         for old_file in old_merged_files:
             os.remove(os.path.join(output_folder, old_file))
@@ -100,6 +105,7 @@ def merge_motor_pdfs():
         # Create new merged document using PyMuPDF
         merged_doc = fitz.open()
         total_pages = 0
+        letters = []
         
         # Process each PDF file
         for i, pdf_file in enumerate(pdf_files, 1):
@@ -119,13 +125,17 @@ def merge_motor_pdfs():
                 print(f"   📄 Adding {num_pages} pages from this PDF")
                 
                 # Insert all pages from source PDF (preserves QR codes and all content)
+                pages_added = 0
                 for page_num in range(num_pages):
                     try:
                         merged_doc.insert_pdf(source_doc, from_page=page_num, to_page=page_num)
                         total_pages += 1
+                        pages_added += 1
                     except Exception as page_error:
                         print(f"   ⚠️ Error adding page {page_num + 1}: {str(page_error)}")
                         continue
+                if pages_added:
+                    letters.append((os.path.basename(pdf_file), pages_added, source_doc.metadata))
                 
                 # Close source document
                 source_doc.close()
@@ -134,8 +144,10 @@ def merge_motor_pdfs():
                 print(f"⚠️ Error processing {pdf_file}: {str(e)}")
                 continue
         
-        # Save the merged PDF
-        merged_doc.save(merged_filepath)
+        # Save the merged PDF with one bookmark per letter
+        # garbage=4 stores identical streams once - the logos shared by every letter
+        merged_doc.set_toc(bookmarks(letters))
+        merged_doc.save(merged_filepath, garbage=4)
         
         # Get final page count for verification
         final_pages = merged_doc.page_count
@@ -151,6 +163,8 @@ def merge_motor_pdfs():
         if os.path.exists(merged_filepath):
             file_size = os.path.getsize(merged_filepath)
             print(f"📏 File size: {file_size:,} bytes")
+            write_index(merged_filepath, index_entries(letters))
+            print(f"🔖 {len(letters)} letters bookmarked and indexed")
         
     except Exception as e:
         print(f"❌ Error during merging: {str(e)}")
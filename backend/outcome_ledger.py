@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# NICL Outcome Ledger - COMMENTS of a run kept beside its input workbook
+# Generators record one outcome per row sequence in a small SQLite file instead of
+# rewriting the whole workbook with to_excel; the annotated workbook is produced on
+# demand (download, --write-excel) by patching the COMMENTS cells into a copy of the input.
+
+import os
+import sqlite3
+import sys
+import time
+
+from excel_stream import fill_comments
+from upload_cache import content_hash
+
+LEDGER_SUFFIX = '.outcomes.sqlite'
+
+SCHEMA = """
+CREATE TABLE ledger_source (
+    path TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    written_at REAL NOT NULL
+);
+CREATE TABLE outcomes (
+    seq INTEGER PRIMARY KEY,
+    comment TEXT
+);
+"""
+
+
+def ledger_path(input_file):
+    """Ledger of an input workbook: <name>.outcomes.sqlite next to it"""
+    return os.path.splitext(input_file)[0] + LEDGER_SUFFIX
+
+
+def write_outcomes(input_file, comments, source_hash=None):
+    """Replace the ledger of input_file with comments (one per data row, in order)
+
+    source_hash is the content hash of the workbook the run read (computed when
+    omitted), so a ledger is never applied to a different upload.
+    """
+    path = ledger_path(input_file)
+    temp_path = f"{path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = sqlite3.connect(temp_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.execute('INSERT INTO ledger_source VALUES (?, ?, ?, ?)',
+                     (os.path.basename(input_file), source_hash or content_hash(input_file), len(comments),
+                      time.time()))
+        conn.executemany('INSERT INTO outcomes VALUES (?, ?)',
+                         ((seq, None if comment is None else str(comment))
+                          for seq, comment in enumerate(comments, start=1)))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(temp_path, path)
+    return path
+
+
+def read_outcomes(input_file):
+    """COMMENTS of every data row of input_file from its ledger (None where not recorded)
+
+    Raises FileNotFoundError when there is no ledger and ValueError when the
+    workbook changed since the ledger was written.
+    """
+    path = ledger_path(input_file)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No outcomes recorded for {input_file}")
+    conn = sqlite3.connect(path)
+    try:
+        source_hash, rows = conn.execute('SELECT content_hash, rows FROM ledger_source').fetchone()
+        if source_hash != content_hash(input_file):
+            raise ValueError(f"Outcomes in {path} belong to a different version of {input_file}")
+        comments = [None] * rows
+        for seq, comment in conn.execute('SELECT seq, comment FROM outcomes'):
+            comments[seq - 1] = comment
+        return comments
+    finally:
+        conn.close()
+
+
+def remove_ledger(input_file):
+    """Delete the ledger of input_file, if any"""
+    path = ledger_path(input_file)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def export_workbook(input_file, output_file):
+    """Write input_file with its COMMENTS column filled from the ledger to output_file"""
+    fill_comments(input_file, output_file, read_outcomes(input_file))
+    return output_file
+
+
+def main():
+    """python outcome_ledger.py <input.xlsx> <output.xlsx> - write the annotated workbook"""
+    if len(sys.argv) < 3:
+        print("Usage: python outcome_ledger.py <input.xlsx> <output.xlsx>")
+        sys.exit(1)
+    input_file, output_file = sys.argv[1], sys.argv[2]
+    try:
+        started = time.time()
+        export_workbook(input_file, output_file)
+        print(f"[OK] Annotated workbook written to {output_file} in {time.time() - started:.1f}s")
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Could not export outcomes: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# NICL PDF Merge - Parallel tree merge of letter PDFs
+# Worker processes merge contiguous ranges of the sequence-sorted letter files into
+# intermediate chunk PDFs, then the chunks are appended in order to the output file
+# with incremental saves. A worker only holds its own range, and the final pass only
+# one chunk at a time, so no process ever holds the whole merged batch.
+
+import math
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fitz  # PyMuPDF
+
+# Letters per intermediate chunk - bounds the memory of each worker
+DEFAULT_CHUNK_FILES = 500
+# Save options an incremental save accepts (garbage collection rewrites the whole file)
+INCREMENTAL_SAVE_OPTIONS = ('deflate', 'deflate_images', 'deflate_fonts')
+
+
+def merge_range(pdf_files, output_path, save_options, toc=None):
+    """Merge pdf_files in order into output_path
+
+    Returns (files merged, pages, [(file name, error)], [(file name, pages, document
+    info)] of the merged letters); nothing is written when no page could be merged.
+    toc(merged letters) gives the bookmarks to add (see letter_index.bookmarks).
+    """
+    merged_doc = fitz.open()
+    processed_files = 0
+    total_pages = 0
+    failures = []
+    letters = []
+    for pdf_file in pdf_files:
+        try:
+            letter_doc = fitz.open(pdf_file)
+            try:
+                if letter_doc.page_count == 0:
+                    failures.append((os.path.basename(pdf_file), 'No pages found'))
+                    continue
+                merged_doc.insert_pdf(letter_doc)
+                letters.append((os.path.basename(pdf_file), letter_doc.page_count, letter_doc.metadata))
+                total_pages += letter_doc.page_count
+                processed_files += 1
+            finally:
+                letter_doc.close()
+        except Exception as e:
+            failures.append((os.path.basename(pdf_file), str(e)))
+    if total_pages:
+        if toc:
+            merged_doc.set_toc(toc(letters))
+        merged_doc.save(output_path, **save_options)
+    merged_doc.close()
+    return processed_files, total_pages, failures, letters
+
+
+def append_chunks(chunk_paths, output_path, save_options, toc_entries=None):
+    """Concatenate the chunk PDFs in order into output_path, one chunk in memory at a time
+
+    The first chunk becomes the output file; each following chunk is inserted and
+    written with an incremental save, then the output is reopened so its pages are
+    read back lazily from disk instead of piling up in memory. Resources shared by
+    letters of different chunks (logos, fonts) are stored once per chunk.
+    """
+    os.replace(chunk_paths[0], output_path)
+    incremental = {name: value for name, value in save_options.items() if name in INCREMENTAL_SAVE_OPTIONS}
+    for chunk_path in chunk_paths[1:]:
+        with fitz.open(output_path) as merged_doc, fitz.open(chunk_path) as chunk_doc:
+            merged_doc.insert_pdf(chunk_doc)
+            merged_doc.save(output_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, **incremental)
+        os.remove(chunk_path)
+    if toc_entries:
+        with fitz.open(output_path) as merged_doc:
+            merged_doc.set_toc(toc_entries)
+            merged_doc.save(output_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, **incremental)
+
+
+def merge_files_parallel(pdf_files, output_path, workers, save_options, chunk_files=DEFAULT_CHUNK_FILES,
+                         on_progress=None, toc=None):
+    """Merge pdf_files (already in print order) into output_path with a pool of workers
+
+    The files are split into contiguous ranges of at most chunk_files letters, at
+    least one range per worker. on_progress(files done, total files) is called as
+    ranges complete. Returns (files merged, pages, [(file name, error)], merged
+    letters) like merge_range(), which also describes toc.
+
+    Memory bound: each worker holds at most chunk_files letters, and the final
+    pass one chunk plus the output's page tree and bookmarks (see append_chunks).
+    """
+    chunk_size = max(1, min(chunk_files, math.ceil(len(pdf_files) / max(1, workers))))
+    ranges = [pdf_files[start:start + chunk_size] for start in range(0, len(pdf_files), chunk_size)]
+
+    # Chunks live in a hidden folder beside the output, so they never show up as merged files
+    temp_folder = tempfile.mkdtemp(prefix='.merge_', dir=os.path.dirname(output_path) or '.')
+    try:
+        chunk_paths = [os.path.join(temp_folder, f"chunk_{number:05d}.pdf") for number in range(len(ranges))]
+        results = [None] * len(ranges)
+        files_done = 0
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            futures = {
+                pool.submit(merge_range, files, chunk_path, save_options): number
+                for number, (files, chunk_path) in enumerate(zip(ranges, chunk_paths))
+            }
+            for future in as_completed(futures):
+                number = futures[future]
+                results[number] = future.result()
+                files_done += len(ranges[number])
+                if on_progress:
+                    on_progress(files_done, len(pdf_files))
+
+        # Final pass: append the chunks in sequence order (empty ranges wrote no chunk)
+        written = [chunk_path for chunk_path, (_, pages, _, _) in zip(chunk_paths, results) if pages]
+        total_pages = sum(result[1] for result in results)
+        letters = [letter for result in results for letter in result[3]]
+        if written:
+            append_chunks(written, output_path, save_options, toc(letters) if toc else None)
+    finally:
+        shutil.rmtree(temp_folder, ignore_errors=True)
+
+    processed_files = sum(result[0] for result in results)
+    failures = [failure for result in results for failure in result[2]]
+    return processed_files, total_pages, failures, letters
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# NICL Progress Events - JSON-lines progress channel for the Node backend
+# routes/arrears.js starts a generator with an extra pipe and PROGRESS_FD=<fd>; the
+# scripts write one typed event per line to it (stage_start, row_done, row_skipped,
+# stage_done, metrics), so Node no longer parses console output. The per-row console
+# lines are then switched off unless LETTER_ROW_LOGS=1.
+
+import json
+import os
+import threading
+
+PROGRESS_FD_ENV = 'PROGRESS_FD'
+
+_lock = threading.Lock()
+_channel = None
+_opened = False
+
+
+def _open_channel():
+    fd = os.environ.get(PROGRESS_FD_ENV)
+    if not fd:
+        return None
+    try:
+        return os.fdopen(int(fd), 'w', encoding='utf-8', buffering=1, closefd=False)
+    except (OSError, ValueError):
+        return None
+
+
+def emit(event, **fields):
+    """Write one event to the progress channel (no-op when the script was not given one)"""
+    global _channel, _opened
+    with _lock:
+        if not _opened:
+            _channel = _open_channel()
+            _opened = True
+        if _channel is None:
+            return
+        try:
+            _channel.write(json.dumps({'event': event, **fields}, ensure_ascii=False, default=str) + '\n')
+        except (OSError, ValueError):
+            _channel = None  # The reader went away - keep running without events
+
+
+def row_logging_enabled():
+    """Per-row console lines: on for console runs, off under a progress channel
+
+    LETTER_ROW_LOGS=1 or 0 overrides either way.
+    """
+    setting = os.environ.get('LETTER_ROW_LOGS')
+    if setting is not None:
+        return setting.lower() in ('1', 'true', 'yes', 'on')
+    return not os.environ.get(PROGRESS_FD_ENV)
+
+
+ROW_LOGS = row_logging_enabled()
+
+
+def log_row(message):
+    """print() for the lines written once per row"""
+    if ROW_LOGS:
+        print(message)
+
+
+def child_environment(**overrides):
+    """Environment for a script run with captured output: no progress channel, same row logging"""
+    env = {key: value for key, value in os.environ.items() if key != PROGRESS_FD_ENV}
+    env['LETTER_ROW_LOGS'] = '1' if ROW_LOGS else '0'
+    env.update(overrides)
+    return env
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# NICL QR Cache - Persistent SQLite cache of ZwennPay GetMerchantQR responses
+# The QR string for a given GetMerchantQR request never changes between monthly runs,
+# so L0 -> L1 -> L2 -> MED escalations and re-runs reuse it instead of calling the API.
+# Shared with services/qrCache.js (same file, same table, same key format).
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+QR_CACHE_DB = os.environ.get(
+    'ZWENNPAY_QR_CACHE_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'qr_cache.sqlite')
+)
+QR_CACHE_TTL_DAYS = float(os.environ.get('ZWENNPAY_QR_CACHE_TTL_DAYS', '120'))
+QR_CACHE_MAX_ENTRIES = int(os.environ.get('ZWENNPAY_QR_CACHE_MAX_ENTRIES', '200000'))
+# Cache hits whose last_used_at is written back in one statement
+QR_CACHE_TOUCH_BATCH = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS qr_cache (
+    cache_key TEXT PRIMARY KEY,
+    merchant_id TEXT NOT NULL,
+    bill_number TEXT NOT NULL,
+    mobile_no TEXT NOT NULL,
+    customer_label TEXT NOT NULL,
+    qr_data TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_qr_cache_last_used ON qr_cache (last_used_at);
+"""
+
+
+def qr_cache_enabled():
+    """The cache can be switched off with ZWENNPAY_QR_CACHE=0"""
+    return os.environ.get('ZWENNPAY_QR_CACHE', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def cache_key_fields(payload):
+    """Return the (merchant, bill, mobile, label) fields stored next to each QR for lookups by hand"""
+    return (
+        str(payload.get('MerchantId', '')),
+        str(payload.get('AdditionalBillNumber', '')),
+        str(payload.get('AdditionalMobileNo', '')),
+        str(payload.get('AdditionalCustomerLabel', '')),
+    )
+
+
+def make_cache_key(payload):
+    """Build the cache key - must match makeCacheKey() in services/qrCache.js
+
+    Every field of the request is encoded into the QR (purpose, mobile flag...), so the
+    key is the SHA-256 of the whole payload as JSON with sorted keys and no spaces.
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class QRCache:
+    """Thread-safe SQLite store of QR strings with TTL and size-based eviction"""
+
+    def __init__(self, db_path=QR_CACHE_DB, ttl_days=QR_CACHE_TTL_DAYS, max_entries=QR_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_days * 86400
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self._touched = {}
+        self._lock = threading.Lock()
+        # Generous timeout: several generator processes may share the file
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @classmethod
+    def open_default(cls):
+        """Open the shared cache, or return None if it is disabled or unusable"""
+        if not qr_cache_enabled():
+            return None
+        try:
+            return cls()
+        except sqlite3.Error as e:
+            print(f"[WARNING] QR cache unavailable ({QR_CACHE_DB}): {str(e)}")
+            return None
+
+    def get(self, payload):
+        """Return the cached QR string for payload, or None on a miss / expired entry"""
+        now = time.time()
+        key = make_cache_key(payload)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT qr_data, created_at FROM qr_cache WHERE cache_key = ?', (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= QR_CACHE_TOUCH_BATCH:
+                self._flush_touched()
+            self.hits += 1
+            return row[0]
+
+    def put(self, payload, qr_data):
+        """Store a valid QR string for payload"""
+        if not qr_data:
+            return
+        now = time.time()
+        merchant_id, bill_number, mobile_no, customer_label = cache_key_fields(payload)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO qr_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (make_cache_key(payload), merchant_id, bill_number, mobile_no, customer_label,
+                 qr_data, now, now)
+            )
+            self._conn.commit()
+            self.stored += 1
+
+    def _flush_touched(self):
+        """Write the last_used_at of the hits since the last flush (caller holds the lock)"""
+        if not self._touched:
+            return
+        self._conn.executemany('UPDATE qr_cache SET last_used_at = ? WHERE cache_key = ?',
+                               [(used, key) for key, used in self._touched.items()])
+        self._conn.commit()
+        self._touched.clear()
+
+    def flush(self):
+        with self._lock:
+            self._flush_touched()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones above max_entries"""
+        with self._lock:
+            self._conn.execute('DELETE FROM qr_cache WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+            count = self._conn.execute('SELECT COUNT(*) FROM qr_cache').fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    'DELETE FROM qr_cache WHERE cache_key IN '
+                    '(SELECT cache_key FROM qr_cache ORDER BY last_used_at LIMIT ?)',
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def close(self):
+        try:
+            # Hits are recorded before eviction picks the least recently used entries
+            self.flush()
+            self.evict()
+        finally:
+            self._conn.close()
@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
 # NICL Recovery Action Processor - Master Controller
 # Processes different recovery actions (L0, L1, L2, MED) by routing to appropriate scripts
+# --in-process renders every level inside this interpreter instead of one subprocess each
+# --concurrent-levels renders all levels at once on one shared worker pool
+# --resume keeps the letters of an interrupted run and renders only the remaining rows
+# --incremental reuses the letters unchanged since the previous run
+# --stream [--chunk-rows N] makes each level script read and render its rows in chunks
+# --print-only [--print-chunk N] writes the merged print files while rendering (no merge
+#   step needed); individual letters are only written for rows with an email address
+# --write-excel also writes the main Excel file back with COMMENTS (otherwise on download)
 
 import pandas as pd
 import sys
@@ -8,23 +16,47 @@ import io
 import os
 import subprocess
 import glob
-from datetime import datetime
+import time
+import importlib
+import math
+from contextlib import redirect_stdout
+from itertools import zip_longest
+from address_cache import get_address_cache
+from excel_stream import get_chunk_rows
+from letter_engine import (LETTER_GENERATED, apply_outcomes, finish_letter_run, generate_letters,
+                           incremental_summary, open_letter_run, plan_letters, prepare_comments,
+                           prepare_letter_inputs, record_outcomes, validate_letters)
+from letter_index import clean_indexes
+from letter_journal import clean_journals
+from letter_pool import get_worker_count, render_jobs_parallel
+from letter_print import get_print_chunk
+from outcome_ledger import export_workbook, ledger_path, read_outcomes, remove_ledger, write_outcomes
+from progress_events import child_environment, emit
+from upload_cache import read_upload
+from zwennpay_qr import QRPrefetch, get_qr_concurrency
 
 # Set UTF-8 encoding for stdout to handle Unicode characters
 if sys.stdout.encoding != 'utf-8':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-def cleanup_output_folders():
-    """Clean up existing PDFs in all output folders"""
-    individual_folders = ['L0', 'L1', 'L2', 'output_mise_en_demeure']
+def cleanup_output_folders(resume=False):
+    """Clean up existing PDFs in all output folders
+
+    With resume=True (--resume or --incremental) the individual letters and their
+    journals are kept, so only the rows that are not already done get rendered.
+    """
+    individual_folders = [] if resume else ['L0', 'L1', 'L2', 'output_mise_en_demeure']
     merged_folders = ['L0_Merge', 'L1_Merge', 'L2_Merge', 'MED_Merge']
     
     print("🧹 Cleaning up existing PDFs...")
+    if resume:
+        print("   ⏩ Keeping the individual letters of the previous run")
     
     # Clean individual PDF folders
     print("   🔄 Cleaning individual PDF folders...")
     for folder in individual_folders:
         if os.path.exists(folder):
+            clean_journals(folder)
             # Find all PDF files in the folder
             pdf_files = glob.glob(os.path.join(folder, "*.pdf"))
             
@@ -47,6 +79,7 @@ def cleanup_output_folders():
     print("   🔄 Cleaning merged PDF folders...")
     for folder in merged_folders:
         if os.path.exists(folder):
+            clean_indexes(folder)
             # Find all PDF files in the folder
             pdf_files = glob.glob(os.path.join(folder, "*.pdf"))
             
@@ -67,12 +100,178 @@ def cleanup_output_folders():
     
     print("✅ Complete cleanup finished - all PDF folders cleaned\n")
 
+def run_letters_in_process(config, action_df):
+    """Render one recovery level with its letter template inside this interpreter
+
+    Replaces the temp_*.xlsx write, the letter script subprocess and the read-back:
+    the filtered rows go straight to the engine and come back with COMMENTS filled,
+    indexed like action_df. The letter output is captured, as subprocess.run
+    (capture_output=True) did. The run is journaled under the temp file's name,
+    so --resume picks up a level whichever mode rendered it.
+    """
+    letter_module = importlib.import_module(config['module'])
+    template = letter_module.TEMPLATE
+    # Same 0..n-1 index as the temp file, so file sequence numbers do not change
+    letters_df = action_df.reset_index(drop=True)
+
+    letter_output = io.StringIO()
+    try:
+        with redirect_stdout(letter_output):
+            prepare_comments(letters_df)
+            _, skip_counts = generate_letters(template, config['module'], 'TEMPLATE', letters_df,
+                                              template.output_folder, sys.argv, quiet_workers=True,
+                                              stage=config['action'], input_file=config['temp_file'])
+    except Exception:
+        print(f"   Letter output: ...{letter_output.getvalue()[-200:]}")
+        raise
+    if '--incremental' in sys.argv:
+        print(f"   ♻️  {incremental_summary(skip_counts)}")
+    return letters_df.set_axis(action_df.index)
+
+def run_levels_concurrently(df, action_mapping, total_records, update_overall_progress):
+    """Render every recovery level at the same time instead of one after another
+
+    --workers N is the global budget of render processes shared by all levels
+    (default: one per CPU core) and --qr-concurrency N the budget of QR requests.
+    The QR codes of the levels are requested in turn and each shard is rendered as
+    soon as its own codes are in. Overall progress is reported as shards of any
+    level complete. With --print-only each shard draws its letters into its own
+    print file part, in sequence order within the level. Results are returned in
+    action_mapping order, so the consolidated workbook is the same as a sequential
+    run. Returns (processed_dataframes, processing_summary).
+    """
+    workers = get_worker_count(sys.argv, default=os.cpu_count() or 1)
+    levels = {}
+    processed_so_far = 0
+
+    # Validate every level up front - skipped rows count as processed straight away
+    letter_output = io.StringIO()
+    for action, config in action_mapping.items():
+        action_df = df[df['Recovery_action'] == action].copy()
+        if len(action_df) == 0:
+            print(f"⏭️  Skipping {action}: No records found")
+            continue
+
+        print(f"\n📋 Processing {action}: {len(action_df)} records")
+        print(f"[STAGE] Starting {action} letters processing")
+        print(f"   🔄 Executing {config['script']}...")
+        template = importlib.import_module(config['module']).TEMPLATE
+        # Same 0..n-1 index as the temp file, so file sequence numbers do not change
+        letters_df = action_df.reset_index(drop=True)
+        with redirect_stdout(letter_output):
+            template.register_fonts()
+            os.makedirs(template.output_folder, exist_ok=True)
+            prepare_comments(letters_df)
+            schema = template.resolve_columns(letters_df)
+            run = open_letter_run(template, config['module'], len(letters_df), template.output_folder, sys.argv,
+                                  stage=action, input_file=config['temp_file'])
+            valid_df, _ = validate_letters(schema, letters_df, run, template.first_positive_amount)
+            records, done = plan_letters(template, run, valid_df, schema)
+            qr_payloads, address_lines = prepare_letter_inputs(template, records, run)
+        levels[action] = {'config': config, 'template': template, 'action_df': action_df,
+                          'letters_df': letters_df, 'records': records, 'run': run, 'done': done,
+                          'qr_payloads': qr_payloads, 'address_lines': address_lines}
+        processed_so_far += len(letters_df) - len(records)
+        if run.counts['resumed']:
+            print(f"   ⏩ Resume: {run.counts['resumed']} {action} letters already generated")
+        if '--incremental' in sys.argv:
+            print(f"   ♻️  {incremental_summary(run.counts)}")
+
+    print(f"\n⚡ Rendering {len(levels)} recovery levels concurrently with {workers} worker processes")
+    update_overall_progress(processed_so_far, total_records, "Validation completed")
+
+    def shard_done(action, shard_outcomes, level_finished):
+        nonlocal processed_so_far
+        level = levels[action]
+        record_outcomes(level['template'], level['run'], shard_outcomes)
+        processed_so_far += len(shard_outcomes)
+        update_overall_progress(processed_so_far, total_records,
+                                f"{action} completed" if level_finished else "")
+        if level_finished:
+            print(f"   ✅ {levels[action]['config']['script']} completed successfully")
+
+    # One QR prefetch for all levels, so --qr-concurrency is a global budget too; the
+    # levels' rows are requested in turn, so the first shards of every level get going
+    level_payloads = [[((action, index), payload) for index, payload in level['qr_payloads'].items()]
+                      for action, level in levels.items()]
+    qr_payloads = dict(item for group in zip_longest(*level_payloads) for item in group if item)
+    outcomes = {}
+    error = None
+    qr_prefetch = None
+    try:
+        with redirect_stdout(letter_output):
+            qr_prefetch = QRPrefetch(qr_payloads, get_qr_concurrency(sys.argv))
+
+        jobs = {}
+        for action, level in levels.items():
+            job = {
+                'module_name': level['config']['module'],
+                'template_name': 'TEMPLATE',
+                'records': level['records'],
+                'output_folder': level['template'].output_folder,
+                'address_lines': level['address_lines'],
+                'total_records': len(level['letters_df']),
+            }
+            print_run = level['run'].print_run
+            if print_run is not None and level['records']:
+                # One print file per contiguous range of rows keeps the parts in sequence order
+                records = len(level['records'])
+                job['shard_size'] = max(1, min(print_run.chunk_letters, math.ceil(records / workers)))
+                job['print_paths'] = [print_run.next_path() for _ in range(math.ceil(records / job['shard_size']))]
+            jobs[action] = job
+        # Levels whose rows were all skipped have nothing to render
+        for action, job in jobs.items():
+            if len(job['records']) == 0:
+                shard_done(action, [], True)
+        outcomes = render_jobs_parallel(jobs, workers, quiet=True, on_shard_done=shard_done,
+                                        qr_prefetch=qr_prefetch)
+    except Exception as e:
+        print(f"   Letter output: ...{letter_output.getvalue()[-200:]}")
+        error = e
+    finally:
+        if qr_prefetch is not None:
+            with redirect_stdout(letter_output):
+                qr_prefetch.close()
+        for level in levels.values():
+            finish_letter_run(level['run'], 'error' if error is not None else None)
+
+    processed_dataframes = []
+    processing_summary = {}
+    for action, level in levels.items():
+        script_name = level['config']['script']
+        if error is not None:
+            print(f"   ❌ Error executing {script_name}: {str(error)}")
+            processed_dataframes.append(level['action_df'])
+            processing_summary[action] = {'status': 'Error', 'processed': 0}
+            continue
+
+        updated_df = level['letters_df']
+        apply_outcomes(updated_df, {**level['done'], **outcomes.get(action, {})})
+        processed_dataframes.append(updated_df.set_axis(level['action_df'].index))
+
+        # Count successful generations
+        success_count = int((updated_df['COMMENTS'] == LETTER_GENERATED).sum())
+        processing_summary[action] = {
+            'status': 'Success',
+            'processed': len(updated_df),
+            'generated': success_count
+        }
+        print(f"   📊 {action}: generated {success_count} letters out of {len(updated_df)} records")
+
+    if error is not None:
+        update_overall_progress(total_records, total_records, "Concurrent processing error")
+    return processed_dataframes, processing_summary
+
 def main():
     print("🚀 NICL Recovery Action Processor Started")
     print("=" * 60)
+    started = time.time()
+    if '--print-only' in sys.argv and ('--resume' in sys.argv or '--incremental' in sys.argv):
+        print("❌ --print-only cannot be combined with --resume or --incremental")
+        sys.exit(1)
     
     # Clean up existing PDFs first
-    cleanup_output_folders()
+    cleanup_output_folders(resume='--resume' in sys.argv or '--incremental' in sys.argv)
     
     # Read the main Excel file - try multiple locations
     excel_filename = "Extracted_Arrears_Data.xlsx"
@@ -87,7 +286,7 @@ def main():
     for excel_path in excel_paths:
         try:
             if os.path.exists(excel_path):
-                df = pd.read_excel(excel_path, engine='openpyxl')
+                df = read_upload(excel_path)
                 used_path = excel_path
                 print(f"✅ Excel file loaded successfully from {excel_path} with {len(df)} rows")
                 print(f"📋 Available columns: {list(df.columns)}")
@@ -127,16 +326,25 @@ def main():
     
     # Define mapping of recovery actions to scripts
     action_mapping = {
-        'SMS 2 + L0': {'script': 'L0.py', 'temp_file': 'temp_L0.xlsx'},
-        'L0': {'script': 'L0.py', 'temp_file': 'temp_L0.xlsx'},
-        'L1': {'script': 'L1.py', 'temp_file': 'temp_L1.xlsx'},
-        'L2': {'script': 'L2.py', 'temp_file': 'temp_L2.xlsx'},
-        'MED': {'script': 'GI_MED_Arrears.py', 'temp_file': 'temp_MED.xlsx'}
+        'SMS 2 + L0': {'script': 'L0.py', 'module': 'L0', 'temp_file': 'temp_L0.xlsx'},
+        'L0': {'script': 'L0.py', 'module': 'L0', 'temp_file': 'temp_L0.xlsx'},
+        'L1': {'script': 'L1.py', 'module': 'L1', 'temp_file': 'temp_L1.xlsx'},
+        'L2': {'script': 'L2.py', 'module': 'L2', 'temp_file': 'temp_L2.xlsx'},
+        'MED': {'script': 'GI_MED_Arrears.py', 'module': 'GI_MED_Arrears', 'temp_file': 'temp_MED.xlsx'}
     }
+    for action, config in action_mapping.items():
+        config['action'] = action  # Stage name in progress events
+    in_process = '--in-process' in sys.argv
+    concurrent_levels = '--concurrent-levels' in sys.argv
+    if concurrent_levels:
+        print("⚡ Concurrent mode: all recovery levels share one pool of worker processes")
+    elif in_process:
+        print("⚡ In-process mode: letters are rendered without temporary files or subprocesses")
     
     # Calculate total records for overall progress
     total_records = sum(len(df[df['Recovery_action'] == action]) for action in action_mapping.keys())
     print(f"📊 Total records to process: {total_records}")
+    emit('metrics', run_total=total_records)
     processed_so_far = 0
     
     # Track overall progress across all recovery types
@@ -156,7 +364,13 @@ def main():
     # Initial progress update
     update_overall_progress(0, total_records, "Starting processing")
     
-    for action, config in action_mapping.items():
+    sequential_actions = action_mapping
+    if concurrent_levels:
+        processed_dataframes, processing_summary = run_levels_concurrently(
+            df, action_mapping, total_records, update_overall_progress)
+        sequential_actions = {}
+    
+    for action, config in sequential_actions.items():
         # Filter data for this recovery action
         action_df = df[df['Recovery_action'] == action].copy()
         
@@ -167,6 +381,34 @@ def main():
         print(f"\n📋 Processing {action}: {len(action_df)} records")
         print(f"[STAGE] Starting {action} letters processing")
         
+        if in_process:
+            script_name = config['script']
+            try:
+                print(f"   🔄 Executing {script_name}...")
+                updated_df = run_letters_in_process(config, action_df)
+                print(f"   ✅ {script_name} completed successfully")
+                processed_dataframes.append(updated_df)
+                
+                # Count successful generations
+                success_count = int((updated_df['COMMENTS'] == 'Letter generated successfully').sum())
+                processing_summary[action] = {
+                    'status': 'Success', 
+                    'processed': len(updated_df),
+                    'generated': success_count
+                }
+                print(f"   📊 Generated {success_count} letters out of {len(updated_df)} records")
+                
+                processed_so_far += len(updated_df)
+                update_overall_progress(processed_so_far, total_records, f"{action} completed")
+            except Exception as e:
+                print(f"   ❌ Error executing {script_name}: {str(e)}")
+                processed_dataframes.append(action_df)
+                processing_summary[action] = {'status': 'Error', 'processed': 0}
+                
+                processed_so_far += len(action_df)
+                update_overall_progress(processed_so_far, total_records, f"{action} error")
+            continue
+        
         # Create temporary Excel file for this action
         temp_filename = config['temp_file']
         try:
@@ -185,26 +427,50 @@ def main():
         
         try:
             print(f"   🔄 Executing {script_name}...")
+            # The letter script reports to our console only, so the level is one progress stage
+            emit('stage_start', stage=action, total=len(action_df))
             
             # Run the script and capture output
             # Static 120-minute timeout for all processes
             timeout_seconds = 120 * 60  # 120 minutes = 7200 seconds
             print(f"   ⏱️  Processing {len(action_df)} records (120 min timeout)")
             
+            # Forward --workers N / --qr-concurrency N so each letter script renders with a process pool
+            # --stage keeps the manifests of actions sharing a letter script apart (SMS 2 + L0 / L0)
+            script_args = [sys.executable, script_name, '--stage', action]
+            workers = get_worker_count(sys.argv)
+            if workers > 1:
+                script_args += ['--workers', str(workers)]
+            if '--qr-concurrency' in sys.argv:
+                script_args += ['--qr-concurrency', str(get_qr_concurrency(sys.argv))]
+            for flag in ('--resume', '--incremental', '--stream', '--print-only'):
+                if flag in sys.argv:
+                    script_args.append(flag)
+            if '--stream' in sys.argv and '--chunk-rows' in sys.argv:
+                script_args += ['--chunk-rows', str(get_chunk_rows(sys.argv))]
+            if '--print-only' in sys.argv and '--print-chunk' in sys.argv:
+                script_args += ['--print-chunk', str(get_print_chunk(sys.argv))]
+            
+            # The temp file is read once, so it is not worth a place in the upload cache
             result = subprocess.run(
-                [sys.executable, script_name],
+                script_args,
                 capture_output=True,
                 text=True,
                 encoding='utf-8',
-                timeout=timeout_seconds
+                timeout=timeout_seconds,
+                env=child_environment(UPLOAD_CACHE='0')
             )
             
             if result.returncode == 0:
                 print(f"   ✅ {script_name} completed successfully")
+                for line in result.stdout.splitlines():
+                    if line.startswith('Incremental - '):
+                        print(f"   ♻️  {line}")
                 
-                # Read the updated temporary file to get comments
+                # Read the comments the script recorded in the temporary file's outcome ledger
                 try:
-                    updated_df = pd.read_excel(temp_filename, engine='openpyxl')
+                    updated_df = action_df.copy()
+                    updated_df['COMMENTS'] = read_outcomes(temp_filename)
                     processed_dataframes.append(updated_df)
                     
                     # Count successful generations
@@ -215,6 +481,8 @@ def main():
                         'generated': success_count
                     }
                     print(f"   📊 Generated {success_count} letters out of {len(updated_df)} records")
+                    emit('stage_done', stage=action, total=len(action_df), status='success',
+                         generated=success_count)
                     
                     # Update overall progress
                     processed_so_far += len(updated_df)
@@ -224,11 +492,13 @@ def main():
                     print(f"   ⚠️  Warning: Could not read updated file {temp_filename}: {str(e)}")
                     processed_dataframes.append(action_df)  # Use original data
                     processing_summary[action] = {'status': 'Partial success', 'processed': len(action_df)}
+                    emit('stage_done', stage=action, total=len(action_df), status='partial')
             else:
                 print(f"   ❌ {script_name} failed with return code {result.returncode}")
                 print(f"   Error output: {result.stderr[:200]}...")
                 processed_dataframes.append(action_df)  # Use original data
                 processing_summary[action] = {'status': 'Failed', 'processed': 0}
+                emit('stage_done', stage=action, total=len(action_df), status='failed')
                 
                 # Update overall progress even for failed cases
                 processed_so_far += len(action_df)
@@ -238,6 +508,7 @@ def main():
             print(f"   ⏰ {script_name} timed out after 5 minutes")
             processed_dataframes.append(action_df)
             processing_summary[action] = {'status': 'Timeout', 'processed': 0}
+            emit('stage_done', stage=action, total=len(action_df), status='timeout')
             
             # Update overall progress for timeout
             processed_so_far += len(action_df)
@@ -247,6 +518,7 @@ def main():
             print(f"   ❌ Error executing {script_name}: {str(e)}")
             processed_dataframes.append(action_df)
             processing_summary[action] = {'status': 'Error', 'processed': 0}
+            emit('stage_done', stage=action, total=len(action_df), status='error')
             
             # Update overall progress for errors
             processed_so_far += len(action_df)
@@ -254,24 +526,32 @@ def main():
         
         # Clean up temporary file
         try:
+            remove_ledger(temp_filename)
             if os.path.exists(temp_filename):
                 os.remove(temp_filename)
                 print(f"   🧹 Cleaned up {temp_filename}")
         except Exception as e:
             print(f"   ⚠️  Warning: Could not remove {temp_filename}: {str(e)}")
     
-    # Consolidate all processed data back to main Excel
+    # Consolidate the COMMENTS of every level into the main Excel file's outcome ledger;
+    # the annotated workbook is only written on demand (download or --write-excel)
     if processed_dataframes:
         print(f"\n🔄 Consolidating results...")
         
         try:
-            # Combine all processed dataframes
-            consolidated_df = pd.concat(processed_dataframes, ignore_index=True)
+            # Processed rows keep their index in the main file
+            comments = df['COMMENTS'].astype(object)
+            for updated_df in processed_dataframes:
+                comments.loc[updated_df.index] = updated_df['COMMENTS']
             
-            # Save back to main Excel file (use the path we found the file at)
+            # Record them for the main Excel file (use the path we found the file at)
             save_path = used_path if used_path else excel_filename
-            consolidated_df.to_excel(save_path, index=False, engine='openpyxl')
-            print(f"✅ Updated main Excel file with processing results at {save_path}")
+            write_outcomes(save_path, [None if pd.isna(comment) else comment for comment in comments])
+            print(f"✅ Recorded processing results for {save_path} in {ledger_path(save_path)}")
+            if '--write-excel' in sys.argv:
+                export_workbook(save_path, save_path)
+                remove_ledger(save_path)
+                print(f"✅ Updated main Excel file with processing results at {save_path}")
             
         except Exception as e:
             print(f"❌ Error consolidating results: {str(e)}")
@@ -296,6 +576,11 @@ def main():
     
     print("-" * 60)
     print(f"{'TOTAL':15} | {'':23} | Processed: {total_processed:3} | Generated: {total_generated:3}")
+    if in_process or concurrent_levels:
+        print(get_address_cache().summary())
+    elapsed = time.time() - started
+    emit('metrics', rows=total_records, generated=total_generated, elapsed_seconds=round(elapsed, 3),
+         rows_per_second=round(total_records / elapsed, 2) if elapsed else None)
     
     print(f"\n🎉 Recovery Action Processing Completed!")
     print(f"📁 Check respective folders for generated PDFs:")
@@ -5,6 +5,8 @@ import path from 'path';
 import fs from 'fs-extra';
 import { fileURLToPath } from 'url';
 import { dirname } from 'path';
+import { cacheUpload, readUploadRows } from '../services/uploadCache.js';
+import { followProgress, progressSpawnOptions } from '../services/progressChannel.js';
 
 const router = express.Router();
 const __filename = fileURLToPath(import.meta.url);
@@ -144,6 +146,7 @@ let currentProgress = {
 };
 
 // Helper function to parse progress output from Python scripts
+// Fallback for scripts that do not write progress events (see services/progressChannel.js)
 const parseProgressOutput = (message) => {
     // Parse [PROGRESS] Processing row X of Y (Z.Z%)
     const progressMatch = message.match(/\[PROGRESS\]\s+Processing row (\d+) of (\d+) \((\d+\.?\d*)%\)/);
@@ -276,111 +279,55 @@ router.post('/upload-excel', arrearsUpload.single('file'), async (req, res) => {
 
         console.log(`🔍 Starting arrears record analysis for: ${req.file.originalname}`);
 
-        // Primary method: Use Node.js xlsx library for reliable analysis
+        // Primary method: parse the workbook once into the shared upload cache, which
+        // recovery_processor, the letter generators and /send-emails then read
         try {
-            const XLSX = await import('xlsx');
-            const workbook = XLSX.readFile(req.file.path);
-            const sheetName = workbook.SheetNames[0];
-            const worksheet = workbook.Sheets[sheetName];
-            const jsonData = XLSX.utils.sheet_to_json(worksheet);
+            const analysis = await cacheUpload(req.file.path);
+            recordCount = analysis.total_count;
 
-            recordCount = jsonData.length;
+            // For Non-Motors or files without Recovery_action column, default to L0
+            recoveryDistribution = analysis.recovery_distribution ||
+                (productType === 'nonmotor' ? { 'L0': recordCount } : { 'Unknown': recordCount });
 
-            // Calculate recovery distribution
-            if (jsonData.length > 0 && jsonData[0].Recovery_action !== undefined) {
-                const distribution = {};
-                jsonData.forEach(row => {
-                    const action = row.Recovery_action || 'Unknown';
-                    distribution[action] = (distribution[action] || 0) + 1;
-                });
-                recoveryDistribution = distribution;
-            } else {
-                // For Non-Motors or files without Recovery_action column, default to L0
-                if (productType === 'nonmotor') {
-                    recoveryDistribution = { 'L0': recordCount };
-                } else {
-                    recoveryDistribution = { 'Unknown': recordCount };
-                }
-            }
-
-            console.log(`✅ Excel analysis completed: ${recordCount} records`);
+            console.log(`✅ Excel analysis completed: ${recordCount} records (upload cache ${analysis.cache_key.slice(0, 12)})`);
             console.log(`📊 Recovery distribution:`, recoveryDistribution);
 
         } catch (analysisError) {
-            console.error('❌ Node.js analysis failed:', analysisError.message);
-            console.log('🔄 Trying Python fallback analysis...');
+            console.error('❌ Upload cache analysis failed:', analysisError.message);
+            console.log('🔄 Trying Node.js xlsx fallback analysis...');
 
-            // Fallback method: Use Python pandas
+            // Fallback method: Use Node.js xlsx library
             try {
-                const analysisScript = path.join(__dirname, '../analyze_arrears_data.py');
-                const scriptContent = `
-import pandas as pd
-import sys
-import json
-
-try:
-    df = pd.read_excel('${req.file.path.replace(/\\/g, '/')}')
-    
-    # Basic count
-    total_count = len(df)
-    
-    # Recovery action distribution
-    if 'Recovery_action' in df.columns:
-        recovery_dist = df['Recovery_action'].value_counts().to_dict()
-        # Convert numpy types to regular Python types for JSON serialization
-        recovery_dist = {str(k): int(v) for k, v in recovery_dist.items()}
-    else:
-        # For Non-Motors or files without Recovery_action column, check product type
-        # This is a fallback - we'll default to L0 for non-motor files
-        recovery_dist = {'L0': total_count}
-    
-    result = {
-        'success': True,
-        'total_count': total_count,
-        'recovery_distribution': recovery_dist
-    }
-    
-    print(json.dumps(result))
-    
-except Exception as e:
-    error_result = {
-        'success': False,
-        'error': str(e)
-    }
-    print(json.dumps(error_result))
-`;
-
-                await fs.writeFile(analysisScript, scriptContent);
-
-                const { execSync } = await import('child_process');
-                const result = execSync(`python "${analysisScript}"`, {
-                    encoding: 'utf8',
-                    cwd: path.dirname(analysisScript),
-                    timeout: 30000
-                });
-
-                const analysisResult = JSON.parse(result.trim());
-
-                if (analysisResult.success) {
-                    recordCount = analysisResult.total_count;
-                    recoveryDistribution = analysisResult.recovery_distribution;
-                    console.log(`✅ Python fallback analysis completed: ${recordCount} records`);
-                    console.log(`📊 Recovery distribution:`, recoveryDistribution);
+                const XLSX = await import('xlsx');
+                const workbook = XLSX.readFile(req.file.path);
+                const sheetName = workbook.SheetNames[0];
+                const worksheet = workbook.Sheets[sheetName];
+                const jsonData = XLSX.utils.sheet_to_json(worksheet);
+
+                recordCount = jsonData.length;
+
+                // Calculate recovery distribution
+                if (jsonData.length > 0 && jsonData[0].Recovery_action !== undefined) {
+                    const distribution = {};
+                    jsonData.forEach(row => {
+                        const action = row.Recovery_action || 'Unknown';
+                        distribution[action] = (distribution[action] || 0) + 1;
+                    });
+                    recoveryDistribution = distribution;
                 } else {
-                    console.error('❌ Python analysis failed:', analysisResult.error);
-                    recordCount = 0;
-                    recoveryDistribution = {};
+                    // For Non-Motors or files without Recovery_action column, default to L0
+                    if (productType === 'nonmotor') {
+                        recoveryDistribution = { 'L0': recordCount };
+                    } else {
+                        recoveryDistribution = { 'Unknown': recordCount };
+                    }
                 }
 
-                // Clean up temporary files
-                try {
-                    await fs.remove(analysisScript);
-                } catch (cleanupError) {
-                    console.warn('⚠️ Warning: Could not remove analysis script:', cleanupError.message);
-                }
+                console.log(`✅ Node.js fallback analysis completed: ${recordCount} records`);
+                console.log(`📊 Recovery distribution:`, recoveryDistribution);
 
-            } catch (pythonError) {
-                console.error('❌ Python fallback also failed:', pythonError.message);
+            } catch (xlsxError) {
+                console.error('❌ Node.js fallback also failed:', xlsxError.message);
                 recordCount = 0;
                 recoveryDistribution = {};
             }
@@ -533,7 +480,12 @@ router.post('/generate-letters', async (req, res) => {
         const startTime = Date.now();
         let progressPercent = 10;
 
+        let progressChannel = null;
+
         const progressInterval = setInterval(() => {
+            // Progress events report the real position once the script starts sending them
+            if (progressChannel && progressChannel.active) return;
+
             const elapsedMinutes = Math.floor((Date.now() - startTime) / 60000);
             const elapsedSeconds = Math.floor((Date.now() - startTime) / 1000) % 60;
             const timeDisplay = `${elapsedMinutes.toString().padStart(2, '0')}:${elapsedSeconds.toString().padStart(2, '0')}`;
@@ -558,9 +510,19 @@ router.post('/generate-letters', async (req, res) => {
             scriptArgs.push('--product-type', productType);
             scriptArgs.push('--input-file', excelPath);
         }
+        // printOnly: the letters are written straight into the merged print files
+        // (individual PDFs only for rows with an email address) - no merge step needed
+        if (req.body.printOnly) {
+            scriptArgs.push('--print-only');
+        }
 
-        const pythonProcess = spawn('python', scriptArgs, {
+        // The script writes typed JSON progress events to an extra pipe; its per-row
+        // console lines are switched off while that channel is open
+        const pythonProcess = spawn('python', scriptArgs, progressSpawnOptions({
             cwd: path.dirname(scriptPath)
+        }));
+        progressChannel = followProgress(pythonProcess, (progress, message, details) => {
+            updateProgress('running', progress, message, 'generate', details);
         });
 
         let output = '';
@@ -575,6 +537,7 @@ router.post('/generate-letters', async (req, res) => {
 
             for (const line of lines) {
                 console.log('Arrears Script:', line.trim());
+                if (progressChannel.active) continue;
 
                 // Parse enhanced progress information
                 const progressInfo = parseProgressOutput(line);
@@ -667,6 +630,10 @@ router.post('/merge-letters', async (req, res) => {
                         await fs.remove(path.join(dir, file));
                         totalCleaned++;
                     }
+                    // The letter indexes of the merged PDFs go with them
+                    for (const file of files.filter(file => file.endsWith('.index.json'))) {
+                        await fs.remove(path.join(dir, file));
+                    }
                     if (pdfFiles.length > 0) {
                         console.log(`🗑️ Cleaned up ${pdfFiles.length} old merged PDFs from ${path.basename(dir)}`);
                     }
@@ -684,8 +651,12 @@ router.post('/merge-letters', async (req, res) => {
         // Start time-based progress updates for merge (faster process)
         const startTime = Date.now();
         let progressPercent = 10;
+        let progressChannel = null;
 
         const progressInterval = setInterval(() => {
+            // Per-type progress events take over once the merger sends them
+            if (progressChannel && progressChannel.active) return;
+
             const elapsedMinutes = Math.floor((Date.now() - startTime) / 60000);
             const elapsedSeconds = Math.floor((Date.now() - startTime) / 1000) % 60;
             const timeDisplay = `${elapsedMinutes.toString().padStart(2, '0')}:${elapsedSeconds.toString().padStart(2, '0')}`;
@@ -712,11 +683,17 @@ router.post('/merge-letters', async (req, res) => {
             const outputFolder = Object.values(config.mergedFolders)[0].replace('../', '');
             scriptArgs.push('--input', inputFolder);
             scriptArgs.push('--output', outputFolder);
+        } else if (config.merger === 'arrears_merger.py') {
+            // Whole-document insert with a deduplicated, compressed save; L0/L1/L2/MED merged at once
+            scriptArgs.push('--optimize', '--concurrent-types');
         }
 
-        const pythonProcess = spawn('python', scriptArgs, {
+        const pythonProcess = spawn('python', scriptArgs, progressSpawnOptions({
             cwd: path.dirname(scriptPath)
-        });
+        }));
+        progressChannel = followProgress(pythonProcess, (progress, message, details) => {
+            updateProgress('running', progress, message, 'merge', details);
+        }, 'merging');
 
         let output = '';
         let errorOutput = '';
@@ -806,12 +783,18 @@ router.post('/send-emails', async (req, res) => {
 
         updateProgress('running', 20, 'Reading recipient data...', 'email');
 
-        // Read Excel file to get recipient data
-        const XLSX = await import('xlsx');
-        const workbook = XLSX.default.readFile(excelPath);
-        const sheetName = workbook.SheetNames[0];
-        const worksheet = workbook.Sheets[sheetName];
-        const data = XLSX.default.utils.sheet_to_json(worksheet);
+        // Read recipient data from the upload cache, parsing the Excel file only on a miss
+        let data;
+        try {
+            data = await readUploadRows(excelPath);
+        } catch (cacheError) {
+            console.warn('⚠️ Upload cache unavailable, reading Excel directly:', cacheError.message);
+            const XLSX = await import('xlsx');
+            const workbook = XLSX.default.readFile(excelPath);
+            const sheetName = workbook.SheetNames[0];
+            const worksheet = workbook.Sheets[sheetName];
+            data = XLSX.default.utils.sheet_to_json(worksheet);
+        }
 
         // Filter recipients with valid email addresses
         const recipients = data
@@ -890,6 +873,56 @@ router.post('/send-emails', async (req, res) => {
     }
 });
 
+/**
+ * Letters listed by the indexes of the merged PDFs in a folder (see backend/letter_index.py)
+ * @param {string} mergedDir - Merged PDF folder
+ * @returns {Promise<Object>} - Letter file name -> merged PDF holding it
+ */
+const readMergedIndexes = async (mergedDir) => {
+    const letters = {};
+    if (!await fs.pathExists(mergedDir)) return letters;
+    for (const file of await fs.readdir(mergedDir)) {
+        if (!file.endsWith('.index.json')) continue;
+        try {
+            const index = await fs.readJson(path.join(mergedDir, file));
+            if (!await fs.pathExists(path.join(mergedDir, index.merged_file))) continue;
+            for (const entry of index.letters) {
+                letters[entry.file] = index.merged_file;
+            }
+        } catch (error) {
+            console.warn(`⚠️ Ignoring unreadable letter index ${file}:`, error.message);
+        }
+    }
+    return letters;
+};
+
+/**
+ * Cut one letter out of the indexed merged PDFs of a folder
+ * @param {string} mergedDir - Merged PDF folder
+ * @param {string} filename - Individual letter file name
+ * @param {string} outputPath - Where to write the letter
+ * @returns {Promise<boolean>} - false when no index lists the letter
+ */
+const extractLetterFromMerged = async (mergedDir, filename, outputPath) => {
+    const { execFile } = await import('child_process');
+    return new Promise((resolve, reject) => {
+        execFile('python', [path.join(__dirname, '../letter_index.py'), mergedDir, filename, outputPath], {
+            cwd: path.join(__dirname, '..'),
+            encoding: 'utf8',
+            timeout: 60 * 1000
+        }, (error, stdout) => {
+            if (!error) {
+                console.log(stdout.trim());
+                resolve(true);
+            } else if (error.code === 2) {
+                resolve(false);
+            } else {
+                reject(new Error(stdout.trim() || error.message));
+            }
+        });
+    });
+};
+
 // Get files list by recovery type
 router.get('/files', async (req, res) => {
     try {
@@ -934,6 +967,22 @@ router.get('/files', async (req, res) => {
                         })
                 );
             }
+
+            // Letters only kept in a merged PDF are extracted when downloaded
+            if (config.mergedFolders[type]) {
+                const present = new Set(files.individual[type].map(file => file.name));
+                const indexed = await readMergedIndexes(path.join(__dirname, config.mergedFolders[type]));
+                for (const [file, mergedFile] of Object.entries(indexed)) {
+                    if (present.has(file)) continue;
+                    files.individual[type].push({
+                        name: file,
+                        downloadUrl: `/api/arrears/download/individual/${type}/${file}`,
+                        size: null,
+                        modified: null,
+                        mergedFile
+                    });
+                }
+            }
         }
 
         // Merged PDFs by recovery type
@@ -983,7 +1032,13 @@ router.get('/download/individual/:type/:filename', async (req, res) => {
         const filePath = path.join(__dirname, config.outputFolders[type], filename);
 
         if (!await fs.pathExists(filePath)) {
-            return res.status(404).json({ error: 'File not found' });
+            // Individual letters are a cache: cut the letter out of the merged PDF whose
+            // index lists it, and keep it for the next download and the email step
+            const extracted = config.mergedFolders[type] && path.basename(filename) === filename
+                && await extractLetterFromMerged(path.join(__dirname, config.mergedFolders[type]), filename, filePath);
+            if (!extracted) {
+                return res.status(404).json({ error: 'File not found' });
+            }
         }
 
         res.download(filePath, filename, (err) => {
@@ -1028,6 +1083,69 @@ router.get('/download/merged/:type/:filename', async (req, res) => {
     }
 });
 
+// Download the uploaded Excel file annotated with the COMMENTS of the last run
+// The generators only record outcomes in a ledger; the workbook is written here, on demand
+router.get('/download-updated-excel', async (req, res) => {
+    try {
+        const productType = req.query.productType || 'health';
+        const policyStatus = req.query.policyStatus || 'active';
+        const config = getProductConfig(productType, policyStatus);
+
+        // Same locations as /generate-letters, whose ledger sits next to the workbook it read
+        const excelPaths = [
+            path.join(__dirname, '..', config.inputFile),
+            path.join(__dirname, '../uploads/arrears', config.inputFile)
+        ];
+
+        let excelPath = null;
+        for (const testPath of excelPaths) {
+            const ledgerPath = testPath.replace(/\.xlsx?$/i, '') + '.outcomes.sqlite';
+            if (await fs.pathExists(testPath) && await fs.pathExists(ledgerPath)) {
+                excelPath = testPath;
+                break;
+            }
+        }
+
+        if (!excelPath) {
+            return res.status(404).json({ error: 'No processing results found. Please generate the letters first.' });
+        }
+
+        const exportDir = path.join(__dirname, '../uploads/arrears/exports');
+        await fs.ensureDir(exportDir);
+        const exportName = `Updated_${config.inputFile}`;
+        const exportPath = path.join(exportDir, exportName);
+
+        console.log(`📊 Writing annotated ${config.inputFile} for ${req.session.user}`);
+        const { execFile } = await import('child_process');
+        await new Promise((resolve, reject) => {
+            execFile('python', [path.join(__dirname, '../outcome_ledger.py'), excelPath, exportPath], {
+                cwd: path.join(__dirname, '..'),
+                encoding: 'utf8',
+                timeout: 10 * 60 * 1000
+            }, (error, stdout) => {
+                if (error) {
+                    reject(new Error(stdout.trim() || error.message));
+                } else {
+                    console.log(stdout.trim());
+                    resolve();
+                }
+            });
+        });
+
+        res.download(exportPath, exportName, (err) => {
+            if (err) {
+                console.error('Download error:', err);
+                if (!res.headersSent) {
+                    res.status(500).json({ error: 'Failed to download file' });
+                }
+            }
+        });
+    } catch (error) {
+        console.error('Arrears download updated Excel error:', error);
+        res.status(500).json({ error: 'Failed to create updated Excel file', details: error.message });
+    }
+});
+
 // Download all individual PDFs as zip by recovery type
 router.get('/download/all-individual/:type', async (req, res) => {
     try {
@@ -1264,6 +1382,8 @@ router.post('/reset', async (req, res) => {
                     await fs.remove(excelPath);
                     console.log(`🗑️ Removed input file: ${config.inputFile}`);
                 }
+                // Outcome ledger of the removed input
+                await fs.remove(excelPath.replace(/\.xlsx?$/i, '') + '.outcomes.sqlite');
             }
         } catch (error) {
             console.warn(`⚠️ Could not remove input file:`, error.message);
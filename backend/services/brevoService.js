@@ -5,10 +5,35 @@ import { fileURLToPath } from 'url';
 import { dirname } from 'path';
 import QRCode from 'qrcode';
 import fetch from 'node-fetch';
+import { getCachedQR, storeCachedQR } from './qrCache.js';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = dirname(__filename);
 
+/**
+ * Render a ZwennPay QR string as a base64 PNG data URL
+ * @param {string} qrData - QR string returned by ZwennPay
+ * @param {Object} recipient - Recipient details
+ * @returns {Promise<string>} - Base64 QR code image
+ */
+const createQRImage = async (qrData, recipient) => {
+  console.log(`🔄 Generating QR code image for ${recipient.name}...`);
+  const qrCodeDataURL = await QRCode.toDataURL(qrData, {
+    errorCorrectionLevel: 'L',
+    type: 'image/png',
+    quality: 0.6,
+    margin: 1,
+    color: {
+      dark: '#000000',
+      light: '#FFFFFF'
+    },
+    width: 150
+  });
+
+  console.log(`✅ QR code generated successfully for ${recipient.name} (length: ${qrCodeDataURL.length})`);
+  return qrCodeDataURL;
+};
+
 /**
  * Generate ZwennPay QR code for payment
  * @param {Object} recipient - Recipient details
@@ -61,6 +86,13 @@ const generateZwennPayQR = async (recipient) => {
       "AdditionalPurposeTransaction": "Arrears Payment"
     };
 
+    // Reuse the QR string from the shared cache (also filled by the letter generators)
+    const cachedQrData = await getCachedQR(payload);
+    if (cachedQrData) {
+      console.log(`♻️ QR data served from cache for ${recipient.name}`);
+      return await createQRImage(cachedQrData, recipient);
+    }
+
     // Call ZwennPay API
     console.log(`🌐 Calling ZwennPay API for ${recipient.name}...`);
     const response = await fetch("https://api.zwennpay.com:9425/api/v1.0/Common/GetMerchantQR", {
@@ -80,22 +112,8 @@ const generateZwennPayQR = async (recipient) => {
       console.log(`📄 QR data received for ${recipient.name}: ${qrData ? qrData.substring(0, 50) + '...' : 'empty'}`);
 
       if (qrData && qrData.toLowerCase() !== 'null' && qrData.toLowerCase() !== 'none') {
-        // Generate QR code as base64 image
-        console.log(`🔄 Generating QR code image for ${recipient.name}...`);
-        const qrCodeDataURL = await QRCode.toDataURL(qrData, {
-          errorCorrectionLevel: 'L',
-          type: 'image/png',
-          quality: 0.6,
-          margin: 1,
-          color: {
-            dark: '#000000',
-            light: '#FFFFFF'
-          },
-          width: 150
-        });
-
-        console.log(`✅ QR code generated successfully for ${recipient.name} (length: ${qrCodeDataURL.length})`);
-        return qrCodeDataURL;
+        await storeCachedQR(payload, qrData);
+        return await createQRImage(qrData, recipient);
       } else {
         console.log(`⚠️ No valid QR data received for ${recipient.name}: "${qrData}"`);
         return null;
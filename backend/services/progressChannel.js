@@ -0,0 +1,114 @@
+import readline from 'readline';
+
+// File descriptor of the extra pipe the generator scripts write their progress events
+// to, one JSON object per line (see backend/progress_events.py)
+export const PROGRESS_FD = 3;
+
+/**
+ * spawn() options adding the progress pipe to a Python generator
+ * @param {Object} options - Other spawn options (cwd, ...)
+ * @returns {Object}
+ */
+export const progressSpawnOptions = (options = {}) => ({
+  ...options,
+  stdio: ['pipe', 'pipe', 'pipe', 'pipe'],
+  env: { ...(options.env || process.env), PROGRESS_FD: String(PROGRESS_FD) }
+});
+
+/**
+ * Follow the progress events of a process started with progressSpawnOptions()
+ *
+ * Events: stage_start {stage, total}, row_done {stage, seq, status}, row_skipped
+ * {stage, seq, reason}, stage_done {stage, total, status, generated, ...} and
+ * metrics {run_total} / {rows, elapsed_seconds, rows_per_second, ...}.
+ * onProgress(progress, message, details) is called when the overall percentage
+ * moves and at stage boundaries; progress is mapped onto 15-90%.
+ * @param {ChildProcess} child - Spawned generator
+ * @param {Function} onProgress - Progress callback
+ * @param {string} activity - Word used in stage messages ('processing', 'merging')
+ * @returns {Object} - Channel state; active turns true with the first event
+ */
+export const followProgress = (child, onProgress, activity = 'processing') => {
+  const state = {
+    active: false,
+    runTotal: 0,
+    stages: [],
+    rows: { generated: 0, failed: 0, resumed: 0, reused: 0, skipped: 0 },
+    metrics: {},
+    lastProgress: null
+  };
+  const stream = child.stdio[PROGRESS_FD];
+  if (!stream) return state;
+
+  // The same stage name can run again later (one recovery level per stage instance)
+  const openStage = (name) => {
+    for (let i = state.stages.length - 1; i >= 0; i--) {
+      if (state.stages[i].stage === name && !state.stages[i].done) return state.stages[i];
+    }
+    return null;
+  };
+
+  const report = (message = null, force = false) => {
+    const processed = state.stages.reduce((sum, stage) => sum + Math.min(stage.processed, stage.total), 0);
+    const total = Math.max(state.runTotal, state.stages.reduce((sum, stage) => sum + stage.total, 0));
+    const percentage = total > 0 ? (processed / total) * 100 : 0;
+    const progress = Math.round(15 + percentage * 0.75);
+    if (!force && progress === state.lastProgress) return;
+    state.lastProgress = progress;
+
+    const current = state.stages[state.stages.length - 1];
+    onProgress(progress, message || `Processing ${processed}/${total} records (${percentage.toFixed(1)}%)`, {
+      current: processed,
+      total,
+      percentage: parseFloat(percentage.toFixed(1)),
+      stage: current ? current.stage : null,
+      ...state.rows,
+      metrics: state.metrics
+    });
+  };
+
+  readline.createInterface({ input: stream }).on('line', (line) => {
+    let event;
+    try {
+      event = JSON.parse(line);
+    } catch (error) {
+      console.warn('⚠️ Ignoring malformed progress event:', line);
+      return;
+    }
+    state.active = true;
+
+    switch (event.event) {
+      case 'stage_start':
+        state.stages.push({ stage: event.stage, total: event.total || 0, processed: 0, done: false });
+        report(`Starting ${event.stage} letters ${activity}...`, true);
+        break;
+      case 'row_done':
+      case 'row_skipped': {
+        const stage = openStage(event.stage);
+        if (stage) stage.processed++;
+        const status = event.event === 'row_skipped' ? 'skipped' : event.status;
+        state.rows[status] = (state.rows[status] || 0) + 1;
+        report();
+        break;
+      }
+      case 'stage_done': {
+        const stage = openStage(event.stage);
+        if (stage) {
+          stage.processed = stage.total;
+          stage.done = true;
+        }
+        const generated = event.generated !== undefined ? `: ${event.generated} letters generated` : '';
+        report(`${event.stage} ${event.status === 'success' ? 'completed' : event.status}${generated}`, true);
+        break;
+      }
+      case 'metrics':
+        if (event.run_total !== undefined) state.runTotal = event.run_total;
+        state.metrics = { ...state.metrics, ...event };
+        delete state.metrics.event;
+        break;
+      default:
+        break;
+    }
+  });
+  return state;
+};
@@ -0,0 +1,110 @@
+import crypto from 'crypto';
+import path from 'path';
+import { fileURLToPath } from 'url';
+import { dirname } from 'path';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = dirname(__filename);
+
+// Same SQLite file, table and key format as backend/qr_cache.py
+const QR_CACHE_DB = process.env.ZWENNPAY_QR_CACHE_DB || path.join(__dirname, '../qr_cache.sqlite');
+const QR_CACHE_TTL_SECONDS = parseFloat(process.env.ZWENNPAY_QR_CACHE_TTL_DAYS || '120') * 86400;
+
+const SCHEMA = `
+CREATE TABLE IF NOT EXISTS qr_cache (
+    cache_key TEXT PRIMARY KEY,
+    merchant_id TEXT NOT NULL,
+    bill_number TEXT NOT NULL,
+    mobile_no TEXT NOT NULL,
+    customer_label TEXT NOT NULL,
+    qr_data TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_qr_cache_last_used ON qr_cache (last_used_at);
+`;
+
+let dbPromise = null;
+
+const cacheEnabled = () => !['0', 'false', 'no', 'off'].includes((process.env.ZWENNPAY_QR_CACHE || '1').toLowerCase());
+
+/**
+ * Open the shared QR cache once (better-sqlite3 is optional - without it the cache is skipped)
+ * @returns {Promise<Object|null>} - Database handle or null if unavailable
+ */
+const openCache = () => {
+  if (!dbPromise) {
+    dbPromise = (async () => {
+      if (!cacheEnabled()) return null;
+      try {
+        const { default: Database } = await import('better-sqlite3');
+        const db = new Database(QR_CACHE_DB, { timeout: 30000 });
+        db.pragma('journal_mode = WAL');
+        db.exec(SCHEMA);
+        return db;
+      } catch (error) {
+        console.warn(`⚠️ QR cache unavailable (${QR_CACHE_DB}): ${error.message}`);
+        return null;
+      }
+    })();
+  }
+  return dbPromise;
+};
+
+const cacheKeyFields = (payload) => [
+  String(payload.MerchantId ?? ''),
+  String(payload.AdditionalBillNumber ?? ''),
+  String(payload.AdditionalMobileNo ?? ''),
+  String(payload.AdditionalCustomerLabel ?? '')
+];
+
+/**
+ * Build the cache key - must match make_cache_key() in qr_cache.py
+ * SHA-256 of the whole payload as JSON with sorted keys, as every field is encoded into the QR
+ * @param {Object} payload - GetMerchantQR request body
+ * @returns {string}
+ */
+export const makeCacheKey = (payload) => {
+  const canonical = JSON.stringify(Object.fromEntries(Object.keys(payload).sort().map((key) => [key, payload[key]])));
+  return crypto.createHash('sha256').update(canonical, 'utf8').digest('hex');
+};
+
+/**
+ * Look up a cached QR string for a GetMerchantQR payload
+ * @param {Object} payload - GetMerchantQR request body
+ * @returns {Promise<string|null>} - QR string or null on a miss / expired entry
+ */
+export const getCachedQR = async (payload) => {
+  const db = await openCache();
+  if (!db) return null;
+
+  try {
+    const now = Date.now() / 1000;
+    const key = makeCacheKey(payload);
+    const row = db.prepare('SELECT qr_data, created_at FROM qr_cache WHERE cache_key = ?').get(key);
+    if (!row || now - row.created_at > QR_CACHE_TTL_SECONDS) return null;
+    db.prepare('UPDATE qr_cache SET last_used_at = ? WHERE cache_key = ?').run(now, key);
+    return row.qr_data;
+  } catch (error) {
+    console.warn(`⚠️ QR cache lookup failed: ${error.message}`);
+    return null;
+  }
+};
+
+/**
+ * Store a valid QR string for a GetMerchantQR payload
+ * @param {Object} payload - GetMerchantQR request body
+ * @param {string} qrData - QR string returned by ZwennPay
+ */
+export const storeCachedQR = async (payload, qrData) => {
+  const db = await openCache();
+  if (!db || !qrData) return;
+
+  try {
+    const now = Date.now() / 1000;
+    db.prepare('INSERT OR REPLACE INTO qr_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
+      .run(makeCacheKey(payload), ...cacheKeyFields(payload), qrData, now, now);
+  } catch (error) {
+    console.warn(`⚠️ QR cache write failed: ${error.message}`);
+  }
+};
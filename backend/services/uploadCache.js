@@ -0,0 +1,80 @@
+import path from 'path';
+import crypto from 'crypto';
+import fs from 'fs-extra';
+import { execFile } from 'child_process';
+import { fileURLToPath } from 'url';
+import { dirname } from 'path';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = dirname(__filename);
+
+// Same folder and key (SHA-256 of the workbook bytes) as backend/upload_cache.py
+const BACKEND_DIR = path.join(__dirname, '..');
+const UPLOAD_CACHE_DIR = process.env.UPLOAD_CACHE_DIR || path.join(BACKEND_DIR, '.upload_cache');
+
+export const uploadCacheEnabled = () => !['0', 'false', 'no', 'off'].includes((process.env.UPLOAD_CACHE || '1').toLowerCase());
+
+/**
+ * SHA-256 of a file's content - the upload cache key
+ * @param {string} filePath - Workbook path
+ * @returns {Promise<string>}
+ */
+export const contentHash = (filePath) => new Promise((resolve, reject) => {
+  const hash = crypto.createHash('sha256');
+  fs.createReadStream(filePath)
+    .on('data', (chunk) => hash.update(chunk))
+    .on('end', () => resolve(hash.digest('hex')))
+    .on('error', reject);
+});
+
+/**
+ * Parse a workbook once into the upload cache (python upload_cache.py)
+ * @param {string} filePath - Workbook path
+ * @returns {Promise<Object>} - { cache_key, total_count, recovery_distribution }
+ */
+export const cacheUpload = (filePath) => new Promise((resolve, reject) => {
+  execFile('python', [path.join(BACKEND_DIR, 'upload_cache.py'), filePath], {
+    cwd: BACKEND_DIR,
+    encoding: 'utf8',
+    timeout: 120000
+  }, (error, stdout) => {
+    let result;
+    try {
+      result = JSON.parse(stdout.trim());
+    } catch (parseError) {
+      return reject(error || new Error(`Invalid upload cache output: ${parseError.message}`));
+    }
+    if (!result.success) return reject(new Error(result.error));
+    resolve(result);
+  });
+});
+
+/**
+ * Rows of a workbook as objects, read from the cached columnar JSON copy
+ * Like XLSX.utils.sheet_to_json, empty cells are left out of each row.
+ * @param {string} filePath - Workbook path
+ * @returns {Promise<Array<Object>>}
+ */
+export const readUploadRows = async (filePath) => {
+  if (!uploadCacheEnabled()) throw new Error('Upload cache disabled');
+
+  const jsonPath = path.join(UPLOAD_CACHE_DIR, `${await contentHash(filePath)}.json`);
+  if (await fs.pathExists(jsonPath)) {
+    const now = new Date();
+    await fs.utimes(jsonPath, now, now);
+  } else {
+    await cacheUpload(filePath);
+  }
+
+  const { rows, columns, data } = JSON.parse(await fs.readFile(jsonPath, 'utf8'));
+  const records = new Array(rows);
+  for (let i = 0; i < rows; i++) {
+    const record = {};
+    for (let j = 0; j < columns.length; j++) {
+      const value = data[j][i];
+      if (value !== null && value !== undefined) record[columns[j]] = value;
+    }
+    records[i] = record;
+  }
+  return records;
+};
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# NICL Tests - Shared fixtures for the letter generation modules
+# The backend scripts are flat modules run from the backend folder, so the tests
+# import them from there. Letters are generated in a temporary working folder with
+# the QR and upload caches off and the ZwennPay API replaced by fixed QR strings.
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A temporary current folder, as the generators write relative to it"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('ZWENNPAY_QR_CACHE', '0')
+    monkeypatch.setenv('UPLOAD_CACHE', '0')
+    monkeypatch.setenv('ADDRESS_CACHE', '0')
+    return tmp_path
+
+
+@pytest.fixture
+def fake_qr(monkeypatch):
+    """ZwennPay answering every request with a QR string built from the bill number"""
+    import zwennpay_qr
+    import letter_engine
+
+    def fetch_qr_data(payload, session=None, timeout=None):
+        return zwennpay_qr.cached_qr_result(f"QR-{payload.get('AdditionalBillNumber', '')}")
+
+    monkeypatch.setattr(zwennpay_qr, 'fetch_qr_data', fetch_qr_data)
+    monkeypatch.setattr(letter_engine, 'fetch_qr_data', fetch_qr_data)
+    return fetch_qr_data
+
+
+@pytest.fixture
+def arrears_frame():
+    """Build a recovery workbook DataFrame (temp_L0.xlsx columns) of count rows"""
+    def build(count, action='L0', emails=()):
+        rows = []
+        for n in range(count):
+            rows.append({
+                'PH_TITLE': 'Mr',
+                'POLICY_HOLDER': f'John Doe{n}',
+                'POL_PH_ADDR1': None,
+                'POL_PH_ADDR2': None,
+                'POL_PH_ADDR4': None,
+                'FULL_ADDRESS': '12 Royal Road Morcellement Soleil Quatre Bornes',
+                'POL_NO': f'HL/2024/{n:04d}',
+                'TrueArrears': 1500 + n,
+                'POL_FROM_DT': '01/01/2024',
+                'POL_TO_DT': '31/12/2024',
+                'PH_EMAIL': 'holder@example.com' if n in emails else None,
+                'PH_MOBILE': 57123456,
+                'Recovery_action': action,
+                'COMMENTS': '',
+            })
+        return pd.DataFrame(rows)
+    return build
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import os
+
+import fitz
+import pytest
+
+from arrears_merger import merge_recovery_letters
+from pdf_merge import merge_files_parallel
+
+
+@pytest.fixture
+def letters(tmp_path):
+    """Folder of 12 letters named in Excel sequence, every third one two pages long"""
+    folder = tmp_path / 'L0'
+    folder.mkdir()
+    for seq in range(1, 13):
+        doc = fitz.open()
+        for page in range(2 if seq % 3 == 0 else 1):
+            doc.new_page().insert_text((72, 72), f'letter {seq} page {page + 1}')
+        doc.set_metadata({'subject': f'P{seq}', 'title': f'Holder {seq}'})
+        doc.save(str(folder / f'{seq}_L0_P{seq}_arrears.pdf'))
+        doc.close()
+    return str(folder)
+
+
+def merged_pages(result):
+    with fitz.open(result['output_file']) as doc:
+        return [page.get_text().strip() for page in doc], doc.get_toc()
+
+
+@pytest.mark.parametrize('optimize,workers', [(False, 1), (True, 1), (True, 3)])
+def test_every_mode_merges_the_letters_in_sequence(letters, tmp_path, optimize, workers):
+    result = merge_recovery_letters(letters, str(tmp_path / 'L0_Merge'), 'L0', optimize, workers)
+    assert (result['processed_files'], result['total_pages']) == (12, 16)
+    texts, toc = merged_pages(result)
+    assert texts[:4] == ['letter 1 page 1', 'letter 2 page 1', 'letter 3 page 1', 'letter 3 page 2']
+    assert toc[2] == [1, '3 - P3 - Holder 3', 3] and toc[3][2] == 5
+
+
+def test_compare_reports_the_page_by_page_merge(letters, tmp_path):
+    output_folder = str(tmp_path / 'L0_Merge')
+    result = merge_recovery_letters(letters, output_folder, 'L0', optimize=True, compare=True)
+    assert result['baseline_size_mb'] > 0 and result['baseline_seconds'] >= 0
+    # The baseline is written to a temporary file only
+    assert sorted(os.listdir(output_folder)) == sorted(
+        [os.path.basename(result['output_file']), os.path.basename(result['output_file'])[:-4] + '.index.json'])
+
+
+def test_chunks_are_appended_in_sequence(letters, tmp_path):
+    pdf_files = sorted((os.path.join(letters, name) for name in os.listdir(letters)),
+                       key=lambda path: int(os.path.basename(path).split('_')[0]))
+    output_path = str(tmp_path / 'merged.pdf')
+    result = merge_files_parallel(pdf_files, output_path, 2, {'garbage': 4}, chunk_files=5,
+                                  toc=lambda merged: [[1, name, 1] for name, _, _ in merged[:2]])
+    assert result[:3] == (12, 16, [])
+    with fitz.open(output_path) as doc:
+        assert [page.get_text().strip() for page in doc][-2:] == ['letter 12 page 1', 'letter 12 page 2']
+        assert [entry[1] for entry in doc.get_toc()] == [os.path.basename(path) for path in pdf_files[:2]]
+    # One incremental save per appended chunk, and no chunk left behind
+    with open(output_path, 'rb') as merged:
+        assert merged.read().count(b'%%EOF') >= 3
+    assert sorted(os.listdir(str(tmp_path))) == ['L0', 'merged.pdf']
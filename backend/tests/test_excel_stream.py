@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+import excel_stream
+from excel_stream import ExcelStream, fill_comments
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    """Input workbook: header without COMMENTS, four rows (one blank), a bold cell and a second sheet"""
+    path = str(tmp_path / 'input.xlsx')
+    book = Workbook()
+    sheet = book.active
+    sheet.append(['POL_NO', 'POLICY_HOLDER', 'TrueArrears'])
+    sheet.append(['P1', 'Alice', 1500])
+    sheet.append(['P2', 'Bob', 50])
+    sheet.append([None, None, None])
+    sheet.append(['P4', 'Dan', 2500])
+    sheet['B2'].font = Font(bold=True)
+    book.create_sheet('Notes').append(['kept'])
+    book.save(path)
+    return path
+
+
+COMMENTS = ['Letter generated', 'Arrears amount too low (MUR 50.00 < MUR 100)', None, 'Letter generated & sent']
+
+
+def check_annotated(path):
+    df = pd.read_excel(path)
+    assert df.columns.tolist() == ['POL_NO', 'POLICY_HOLDER', 'TrueArrears', 'COMMENTS']
+    assert df['POL_NO'].tolist()[:2] == ['P1', 'P2'] and df['POL_NO'].tolist()[3] == 'P4'
+    assert df['COMMENTS'].fillna('').tolist() == [comment or '' for comment in COMMENTS]
+
+
+def test_fill_comments_patches_the_sheet_and_keeps_the_rest(workbook, tmp_path, monkeypatch):
+    def rewrite(*args):
+        raise AssertionError('the sheet should be patched, not rewritten')
+
+    monkeypatch.setattr(excel_stream, 'write_comments', rewrite)
+    output = str(tmp_path / 'annotated.xlsx')
+    fill_comments(workbook, output, COMMENTS)
+    check_annotated(output)
+    book = load_workbook(output)
+    assert book.sheetnames == ['Sheet', 'Notes']
+    assert book['Sheet']['B2'].font.bold
+    assert book['Notes']['A1'].value == 'kept'
+
+    # Round trip: an existing COMMENTS column is overwritten in place, None keeps the cell
+    again = str(tmp_path / 'again.xlsx')
+    fill_comments(output, again, ['Resumed', None, None, None])
+    df = pd.read_excel(again)
+    assert df.columns.tolist().count('COMMENTS') == 1
+    assert df['COMMENTS'].tolist()[:2] == ['Resumed', COMMENTS[1]]
+
+
+def test_fill_comments_falls_back_to_rewriting_the_sheet(workbook, tmp_path, monkeypatch):
+    def unpatchable(source, target, patch):
+        raise excel_stream._Unpatchable('test')
+
+    monkeypatch.setattr(excel_stream, '_patch_sheet', unpatchable)
+    output = str(tmp_path / 'annotated.xlsx')
+    fill_comments(workbook, output, COMMENTS)
+    check_annotated(output)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['annotated.xlsx', 'input.xlsx']
+
+
+def test_stream_chunks_match_read_excel(workbook):
+    stream = ExcelStream(workbook, chunk_rows=3)
+    chunks = list(stream.chunks())
+    assert stream.total_rows == 4
+    assert [len(chunk) for chunk in chunks] == [3, 1]
+    streamed = pd.concat(chunks)
+    pd.testing.assert_frame_equal(streamed, pd.read_excel(workbook), check_dtype=False)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import glob
+import os
+from datetime import datetime
+
+import fitz
+
+import letter_engine
+from letter_engine import LETTER_GENERATED, generate_letters
+
+
+def run_level(frame, stage):
+    import L0
+    df = frame.copy()
+    outcomes, counts = generate_letters(L0.TEMPLATE, 'L0', 'TEMPLATE', df, 'L0', ['--incremental'], stage=stage)
+    assert set(outcomes.values()) == {LETTER_GENERATED}
+    return counts
+
+
+def run_on(monkeypatch, day, frame, module_name):
+    """Run a letter level with --incremental as if today were day"""
+    class RunDate(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.combine(day, datetime.min.time())
+
+    monkeypatch.setattr(letter_engine, 'datetime', RunDate)
+    template = __import__(module_name).TEMPLATE
+    outcomes, counts = generate_letters(template, module_name, 'TEMPLATE', frame.copy(), template.output_folder,
+                                        ['--incremental'])
+    assert set(outcomes.values()) == {LETTER_GENERATED}
+    return counts
+
+
+def letter_texts(folder):
+    texts = []
+    for path in sorted(glob.glob(os.path.join(folder, '*.pdf'))):
+        with fitz.open(path) as doc:
+            texts.append(' '.join(' '.join(page.get_text() for page in doc).split()))
+    return texts
+
+
+def test_next_month_stamps_the_new_dates_on_unchanged_letters(workdir, arrears_frame, fake_qr, monkeypatch):
+    # L1 prints the letter date and the settlement deadline
+    rows = arrears_frame(3)
+    assert run_on(monkeypatch, datetime(2026, 10, 1), rows, 'L1')['new'] == 3
+
+    def no_request(payload, session=None, timeout=None):
+        raise AssertionError('re-dated letters need no QR code')
+
+    monkeypatch.setattr(letter_engine, 'fetch_qr_data', no_request)
+    import zwennpay_qr
+    monkeypatch.setattr(zwennpay_qr, 'fetch_qr_data', no_request)
+    counts = run_on(monkeypatch, datetime(2026, 11, 1), rows, 'L1')
+    assert (counts['reused'], counts['redated'], counts['new'] + counts['changed'] + counts['redate_failed']) == (3, 3, 0)
+
+    texts = letter_texts('L1')
+    assert len(texts) == 3
+    for text in texts:
+        assert '01 October 2026' not in text and '11 October 2026' not in text
+        assert text.count('01 November 2026') == 1 and text.count('11 November 2026') == 1
+
+    # Same dates again: the re-dated PDFs are reused as they are
+    counts = run_on(monkeypatch, datetime(2026, 11, 1), rows, 'L1')
+    assert (counts['reused'], counts['redated']) == (3, 0)
+
+
+def test_dates_that_do_not_fit_are_rendered_again(workdir, arrears_frame, fake_qr, monkeypatch):
+    # L0 prints the date inside its first paragraph, where September leaves no room after May
+    rows = arrears_frame(2)
+    run_on(monkeypatch, datetime(2026, 5, 1), rows, 'L0')
+    counts = run_on(monkeypatch, datetime(2026, 9, 1), rows, 'L0')
+    assert (counts['reused'], counts['redate_failed']) == (0, 2)
+    # The previous letters were only moved aside for the attempt
+    assert len(glob.glob(os.path.join('L0', '*.pdf'))) == 2 and not glob.glob(os.path.join('L0', '*.reuse'))
+    for text in letter_texts('L0'):
+        assert text.count('01 September 2026') == 2 and 'May' not in text
+
+
+def test_recovery_levels_sharing_l0_keep_their_letters(workdir, arrears_frame, fake_qr):
+    # SMS 2 + L0 and L0 both render with L0.py into the L0 folder
+    sms_rows = arrears_frame(3, action='SMS 2 + L0')
+    l0_rows = arrears_frame(5, action='L0')
+    l0_rows['POL_NO'] = [f'HL/2025/{n:04d}' for n in range(5)]
+
+    run_level(sms_rows, 'SMS 2 + L0')
+    run_level(l0_rows, 'L0')
+    assert len(glob.glob(os.path.join('L0', '*.pdf'))) == 8
+    assert sorted(os.path.basename(path) for path in glob.glob(os.path.join('L0', '.manifest_*'))) == [
+        '.manifest_L0.json', '.manifest_SMS_2_+_L0.json']
+
+    # The next run reuses every letter of both levels
+    assert run_level(sms_rows, 'SMS 2 + L0')['reused'] == 3
+    assert run_level(l0_rows, 'L0')['reused'] == 5
+    assert len(glob.glob(os.path.join('L0', '*.pdf'))) == 8
+
+
+def test_incremental_run_only_removes_its_own_stale_letters(workdir, arrears_frame, fake_qr):
+    run_level(arrears_frame(4), 'L0')
+    # A PDF the manifest never listed (e.g. put there by hand) is left alone
+    with open(os.path.join('L0', 'kept.pdf'), 'wb') as handle:
+        handle.write(b'%PDF-1.4\n')
+
+    counts = run_level(arrears_frame(2), 'L0')
+    assert counts['reused'] == 2
+    names = sorted(os.path.basename(path) for path in glob.glob(os.path.join('L0', '*.pdf')))
+    assert len(names) == 3 and 'kept.pdf' in names
+
+
+def test_recovery_levels_sharing_l0_resume_from_their_own_journal(workdir, arrears_frame, fake_qr):
+    import L0
+    sms_rows = arrears_frame(3, action='SMS 2 + L0')
+    l0_rows = arrears_frame(5, action='L0')
+    l0_rows['POL_NO'] = [f'HL/2025/{n:04d}' for n in range(5)]
+    generate_letters(L0.TEMPLATE, 'L0', 'TEMPLATE', sms_rows.copy(), 'L0', [], stage='SMS 2 + L0')
+    generate_letters(L0.TEMPLATE, 'L0', 'TEMPLATE', l0_rows.copy(), 'L0', [], stage='L0')
+
+    # The L0 run neither truncated nor replaced the SMS 2 + L0 journal
+    _, counts = generate_letters(L0.TEMPLATE, 'L0', 'TEMPLATE', sms_rows.copy(), 'L0', ['--resume'],
+                                 stage='SMS 2 + L0')
+    assert counts['resumed'] == 3
+    _, counts = generate_letters(L0.TEMPLATE, 'L0', 'TEMPLATE', l0_rows.copy(), 'L0', ['--resume'], stage='L0')
+    assert counts['resumed'] == 5
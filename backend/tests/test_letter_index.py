@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+
+import fitz
+import pytest
+
+from letter_index import bookmarks, extract_letter, find_letter, index_entries, index_path, write_index
+
+LETTERS = [('1_L0_P1_Alice_arrears.pdf', 1, 'P1', 'Alice'),
+           ('2_L0_P2_Bob_arrears.pdf', 2, 'P2', 'Bob'),
+           ('3_L0_P3_Carol_arrears.pdf', 1, 'P3', 'Carol')]
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def merged(tmp_path):
+    """A merged PDF of LETTERS with its index, every page showing '<file> page <n>'"""
+    folder = tmp_path / 'L0_Merge'
+    folder.mkdir()
+    path = str(folder / 'Arrears_L0_Letters_Merged_20261001_120000.pdf')
+    doc = fitz.open()
+    letters = []
+    for filename, pages, pol_no, holder in LETTERS:
+        for number in range(1, pages + 1):
+            doc.new_page().insert_text((72, 72), f'{filename} page {number}')
+        letters.append((filename, pages, {'subject': pol_no, 'title': holder}))
+    doc.set_toc(bookmarks(letters))
+    doc.save(path)
+    doc.close()
+    write_index(path, index_entries(letters))
+    return path
+
+
+def page_texts(path):
+    with fitz.open(path) as doc:
+        return [page.get_text().strip() for page in doc]
+
+
+def test_index_lists_page_ranges_and_bookmarks(merged):
+    merged_path, entry = find_letter(os.path.dirname(merged), '2_L0_P2_Bob_arrears.pdf')
+    assert merged_path == merged
+    assert entry == {'seq': 2, 'file': '2_L0_P2_Bob_arrears.pdf', 'pol_no': 'P2', 'policyholder': 'Bob',
+                     'first_page': 2, 'last_page': 3}
+    with fitz.open(merged) as doc:
+        assert doc.get_toc() == [[1, '1 - P1 - Alice', 1], [1, '2 - P2 - Bob', 2], [1, '3 - P3 - Carol', 4]]
+
+
+def test_extract_letter_writes_only_its_pages(merged, tmp_path):
+    output = str(tmp_path / 'out' / 'letter.pdf')
+    os.makedirs(os.path.dirname(output))
+    extract_letter(*find_letter(os.path.dirname(merged), '2_L0_P2_Bob_arrears.pdf'), output)
+    assert page_texts(output) == ['2_L0_P2_Bob_arrears.pdf page 1', '2_L0_P2_Bob_arrears.pdf page 2']
+    assert os.listdir(os.path.dirname(output)) == ['letter.pdf']
+
+
+def test_indexes_of_deleted_merged_files_are_skipped(merged):
+    os.remove(merged)
+    assert find_letter(os.path.dirname(merged), '1_L0_P1_Alice_arrears.pdf') == (None, None)
+    assert os.path.exists(index_path(merged))
+
+
+def run_cli(*args):
+    return subprocess.run([sys.executable, os.path.join(BACKEND_DIR, 'letter_index.py'), *args],
+                          capture_output=True, text=True, encoding='utf-8')
+
+
+def test_cli_extracts_a_letter_and_exits_2_when_it_is_not_indexed(merged, tmp_path):
+    folder = os.path.dirname(merged)
+    output = str(tmp_path / 'cache' / '3_L0_P3_Carol_arrears.pdf')
+    result = run_cli(folder, '3_L0_P3_Carol_arrears.pdf', output)
+    assert result.returncode == 0 and '[OK]' in result.stdout
+    assert page_texts(output) == ['3_L0_P3_Carol_arrears.pdf page 1']
+
+    missing = str(tmp_path / 'cache' / 'missing.pdf')
+    result = run_cli(folder, '9_L0_P9_Nobody_arrears.pdf', missing)
+    assert result.returncode == 2 and '[ERROR]' in result.stdout
+    assert not os.path.exists(missing)
+    assert run_cli(folder).returncode == 1
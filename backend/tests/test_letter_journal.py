@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import os
+
+from letter_engine import LETTER_GENERATED
+from letter_journal import LetterJournal, clean_journals
+
+
+def write_pdf(path, content=b'%PDF-1.4 letter\n'):
+    with open(path, 'wb') as handle:
+        handle.write(content)
+    return path
+
+
+def test_resume_skips_only_intact_letters_with_the_same_content(tmp_path):
+    first = write_pdf(str(tmp_path / '1_L0_a.pdf'))
+    second = write_pdf(str(tmp_path / '2_L0_b.pdf'))
+    journal = LetterJournal(str(tmp_path), 'L0')
+    journal.record(1, 'POL1', 'fp1', LETTER_GENERATED, first)
+    journal.record(2, 'POL2', 'fp2', LETTER_GENERATED, second)
+    journal.record(3, 'POL3', 'fp3', 'API Error due to data issues')
+    journal.close()
+    write_pdf(second, b'%PDF-1.4 truncated')
+
+    resumed = LetterJournal(str(tmp_path), 'L0', resume=True)
+    try:
+        assert resumed.resumed
+        assert resumed.completed(1, 'fp1', LETTER_GENERATED, first)
+        # Same row, different letter content
+        assert not resumed.completed(1, 'fp-new', LETTER_GENERATED, first)
+        # PDF changed on disk since it was journaled
+        assert not resumed.completed(2, 'fp2', LETTER_GENERATED, second)
+        # Failed rows are rendered again
+        assert not resumed.completed(3, 'fp3', LETTER_GENERATED, None)
+    finally:
+        resumed.close()
+
+
+def test_partial_last_line_is_ignored_and_appended_to(tmp_path):
+    path = write_pdf(str(tmp_path / '1_L0_a.pdf'))
+    journal = LetterJournal(str(tmp_path), 'L0')
+    journal.record(1, 'POL1', 'fp1', LETTER_GENERATED, path)
+    journal.close()
+    with open(journal.path, 'a', encoding='utf-8') as handle:
+        handle.write('{"seq": 2, "policy"')
+
+    resumed = LetterJournal(str(tmp_path), 'L0', resume=True)
+    resumed.close()
+    assert list(resumed.records) == [1]
+    with open(journal.path, encoding='utf-8') as handle:
+        assert handle.read().startswith('{"seq": 1')
+
+
+def test_fresh_run_truncates_only_its_own_journal(tmp_path):
+    path = write_pdf(str(tmp_path / '1_L0_a.pdf'))
+    for key in ('L0', 'SMS_2_+_L0'):
+        journal = LetterJournal(str(tmp_path), key)
+        journal.record(1, 'POL1', 'fp1', LETTER_GENERATED, path)
+        journal.close()
+
+    LetterJournal(str(tmp_path), 'L0').close()
+    truncated = LetterJournal(str(tmp_path), 'L0', resume=True)
+    truncated.close()
+    assert not truncated.resumed
+    other = LetterJournal(str(tmp_path), 'SMS_2_+_L0', resume=True)
+    other.close()
+    assert other.completed(1, 'fp1', LETTER_GENERATED, path)
+
+    clean_journals(str(tmp_path))
+    assert [name for name in os.listdir(tmp_path) if name.startswith('.journal_')] == []
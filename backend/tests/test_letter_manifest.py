@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import os
+
+from letter_journal import file_sha256
+from letter_manifest import REUSE_SUFFIX, LetterManifest
+
+OCTOBER = {'current_date': '01 October 2026', 'deadline_date': '11 October 2026'}
+NOVEMBER = {'current_date': '01 November 2026', 'deadline_date': '11 November 2026'}
+
+
+def write_letter(folder, name, content):
+    path = os.path.join(folder, name)
+    with open(path, 'wb') as handle:
+        handle.write(content)
+    return path
+
+
+def save_manifest(folder, key, letters, dates=OCTOBER):
+    """Manifest of a finished run: letters are (file name, fingerprint, policy) written with that content"""
+    entries = []
+    for name, fingerprint, policy in letters:
+        path = write_letter(folder, name, f'%PDF {name}'.encode('ascii'))
+        entries.append({'fingerprint': fingerprint, 'dates': dates, 'policy': policy,
+                        'path': path, 'sha256': file_sha256(path)})
+    LetterManifest(folder, key).save(entries)
+
+
+def test_take_reuses_unchanged_letters_and_discards_the_rest(tmp_path):
+    folder = str(tmp_path)
+    save_manifest(folder, 'L0', [('1_a.pdf', 'fp-a', 'A'), ('2_b.pdf', 'fp-b', 'B'), ('3_c.pdf', 'fp-c', 'C')])
+
+    manifest = LetterManifest(folder, 'L0')
+    manifest.stage()
+    assert sorted(os.listdir(folder)) == ['.manifest_L0.json', '1_a.pdf' + REUSE_SUFFIX,
+                                          '2_b.pdf' + REUSE_SUFFIX, '3_c.pdf' + REUSE_SUFFIX]
+
+    staged, dates = manifest.take('fp-a', OCTOBER, file_sha256)
+    assert staged == os.path.join(folder, '1_a.pdf' + REUSE_SUFFIX) and dates == OCTOBER
+    # Handed out once only
+    assert manifest.take('fp-a', OCTOBER, file_sha256) is None
+    # A letter of another month is handed out with the dates printed on it, to be re-dated
+    assert manifest.take('fp-b', NOVEMBER, file_sha256) == (os.path.join(folder, '2_b.pdf' + REUSE_SUFFIX), OCTOBER)
+    os.remove(os.path.join(folder, '2_b.pdf' + REUSE_SUFFIX))
+    assert manifest.classify('C') == 'changed'
+    assert manifest.classify('D') == 'new'
+    # A staged file that no longer matches its hash is not reused
+    write_letter(folder, '3_c.pdf' + REUSE_SUFFIX, b'%PDF damaged')
+    assert manifest.take('fp-c', OCTOBER, file_sha256) is None
+
+    os.replace(staged, os.path.join(folder, '1_a.pdf'))
+    manifest.discard_staged()
+    assert sorted(os.listdir(folder)) == ['.manifest_L0.json', '1_a.pdf']
+
+
+def test_take_prefers_the_letter_printed_with_the_same_dates(tmp_path):
+    # Two identical rows, the first one rendered last month and the second one this month
+    folder = str(tmp_path)
+    letters = []
+    for name, dates in (('1_a.pdf', OCTOBER), ('2_a.pdf', NOVEMBER)):
+        path = write_letter(folder, name, f'%PDF {name}'.encode('ascii'))
+        letters.append({'fingerprint': 'fp-a', 'dates': dates, 'policy': 'A', 'path': path,
+                        'sha256': file_sha256(path)})
+    LetterManifest(folder, 'L0').save(letters)
+
+    manifest = LetterManifest(folder, 'L0')
+    manifest.stage()
+    assert manifest.take('fp-a', NOVEMBER, file_sha256) == (os.path.join(folder, '2_a.pdf' + REUSE_SUFFIX), NOVEMBER)
+    assert manifest.take('fp-a', NOVEMBER, file_sha256) == (os.path.join(folder, '1_a.pdf' + REUSE_SUFFIX), OCTOBER)
+
+
+def test_stages_sharing_a_folder_only_stage_their_own_letters(tmp_path):
+    folder = str(tmp_path)
+    save_manifest(folder, 'SMS_2_+_L0', [('1_L0_x.pdf', 'fp-x', 'X')])
+    save_manifest(folder, 'L0', [('1_L0_y.pdf', 'fp-y', 'Y'), ('2_L0_z.pdf', 'fp-z', 'Z')])
+
+    manifest = LetterManifest(folder, 'L0')
+    manifest.stage()
+    assert manifest.take('fp-y', OCTOBER, file_sha256)
+    manifest.discard_staged()
+    manifest.save([])
+    # The other stage's letter and manifest are untouched
+    assert os.path.exists(os.path.join(folder, '1_L0_x.pdf'))
+    assert LetterManifest(folder, 'SMS_2_+_L0').policies == {'X'}
+    assert not os.path.exists(os.path.join(folder, '2_L0_z.pdf' + REUSE_SUFFIX))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+import fitz
+
+from letter_index import index_path
+from letter_print import PrintFile
+from zwennpay_qr import cached_qr_result
+
+
+def test_failed_letter_leaves_no_pages_in_print_file(workdir, arrears_frame, monkeypatch):
+    import L0
+    template = L0.TEMPLATE
+    template.register_fonts()
+
+    def break_second_letter(page):
+        # Fail after the letter already spans a page
+        if page.fields['pol_no'] == 'HL/2024/0001':
+            page.c.showPage()
+            raise ValueError('broken layout')
+
+    monkeypatch.setattr(template, 'blocks', template.blocks[:3] + [break_second_letter] + template.blocks[3:])
+    df = arrears_frame(3, emails={1, 2})
+    records = template.records(df, template.resolve_columns(df))
+    os.makedirs('L0')
+    print_path = os.path.join(str(workdir), 'print.pdf')
+    print_file = PrintFile(print_path)
+    failed = []
+    for index, record in records.items():
+        try:
+            template.render_letter(index, record, len(records), 'L0', cached_qr_result('QR'), None, print_file)
+        except ValueError:
+            failed.append(index)
+    assert print_file.close() == 2
+    assert failed == [1]
+
+    with open(index_path(print_path), encoding='utf-8') as handle:
+        letters = json.load(handle)['letters']
+    assert [entry['pol_no'] for entry in letters] == ['HL/2024/0000', 'HL/2024/0002']
+    assert letters[1]['first_page'] == letters[0]['last_page'] + 1
+    with fitz.open(print_path) as doc:
+        assert doc.page_count == letters[-1]['last_page']
+        assert [title for _, title, _ in doc.get_toc()] == [
+            '1 - HL/2024/0000 - Mr John Doe0', '3 - HL/2024/0002 - Mr John Doe2']
+    # Only the emailed letter that rendered gets its individual PDF
+    assert [name.split('_')[0] for name in os.listdir('L0')] == ['3']
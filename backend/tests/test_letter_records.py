@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import pickle
+
+import pandas as pd
+
+from letter_engine import ARREARS_COLUMNS
+from letter_records import build_records, first_amounts, resolve_schema
+from letter_validation import amount_column
+
+
+def test_records_hold_the_first_present_value_of_each_field(arrears_frame):
+    df = arrears_frame(2)
+    df.loc[0, 'POL_PH_ADDR1'] = '1 Royal Road'
+    df.loc[1, 'PH_MOBILE'] = None
+    records = build_records(resolve_schema(ARREARS_COLUMNS, list(df.columns)), df.set_index(pd.Index([5, 9])))
+
+    assert list(records) == [5, 9]
+    first, second = records[5], records[9]
+    assert (first.title, first.holder, first.pol_no, first.amount) == ('Mr', 'John Doe0', 'HL/2024/0000', 1500.0)
+    assert (first.start_date, first.end_date) == ('01/01/2024', '31/12/2024')
+    assert first.address == ('1 Royal Road', '', '') and second.address == ('', '', '')
+    assert second.full_address == '12 Royal Road Morcellement Soleil Quatre Bornes'
+    # As str(row.get()) gave: a column with blanks is read as floats, clean_mobile_number() copes
+    assert (first.mobile, second.mobile, first.email, first.product) == ('57123456.0', '', '', '')
+    # Records travel to the worker processes
+    assert pickle.loads(pickle.dumps(first)).pol_no == 'HL/2024/0000'
+
+
+def test_amounts_follow_the_validation_rules():
+    df = pd.DataFrame({'A': [None, 'abc', 0, -5, 200], 'B': [300, 400, 500, 0, 700]})
+    for first_positive in (True, False):
+        assert first_amounts(df, ['A', 'B'], first_positive) == amount_column(df, ['A', 'B'], first_positive).tolist()
+
+
+def test_schema_maps_each_field_to_the_variations_present():
+    columns = {'holder': ['POLICY_HOLDER', 'Policy Holder'], 'pol_no': ['POL_NO'], 'amount': ['TrueArrears'],
+               'product': [], 'address': [['ADDR1', 'Address 1'], ['ADDR2']]}
+    headers = ['Policy Holder', 'POL_NO', 'POLICY_HOLDER', 'Address 1', 'Branch', 'COMMENTS']
+    schema = resolve_schema(columns, headers)
+
+    # Priority order of the template, not of the headers
+    assert schema.fields['holder'] == ['POLICY_HOLDER', 'Policy Holder']
+    assert schema.fields['address'] == [['Address 1'], []]
+    assert schema.ambiguous == {'holder': ['POLICY_HOLDER', 'Policy Holder']}
+    # Fields without variations are not missing, COMMENTS is the output column
+    assert schema.missing == ['amount']
+    assert schema.unmapped == ['Branch']
+
+
+def test_schema_reports_a_missing_address():
+    schema = resolve_schema(ARREARS_COLUMNS, ['POL_NO', 'POLICY_HOLDER', 'TrueArrears'])
+    assert schema.fields['address'] == [[], [], []]
+    assert 'address' in schema.missing and 'full_address' in schema.missing
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+from letter_validation import (MISSING_DATA_COMMENT, NO_ADDRESS_COMMENT, amount_column,
+                               validate_arrears_rows)
+
+
+def rows(*values):
+    """DataFrame of (POL_NO, POLICY_HOLDER, TrueArrears, POL_PH_ADDR1, FULL_ADDRESS) rows"""
+    df = pd.DataFrame(list(values), columns=['POL_NO', 'POLICY_HOLDER', 'TrueArrears', 'POL_PH_ADDR1',
+                                             'FULL_ADDRESS'])
+    df['COMMENTS'] = ''
+    return df
+
+
+def test_each_row_gets_the_first_failing_rule_only():
+    df = rows(
+        (None, 'Alice', 20, None, None),               # missing data before low amount and no address
+        ('P2', None, 1500, '1 Royal Road', None),      # missing holder
+        ('P3', 'Carol', 50, None, None),               # low amount before no address
+        ('P4', 'Dan', 1500, '   ', None),              # blank address fields only
+        ('P5', 'Eve', 1500, None, 'Royal Road Curepipe'),
+        ('P6', 'Fred', 100, '2 Royal Road', None),     # MUR 100 is enough
+    )
+    valid_df, counts = validate_arrears_rows(df)
+
+    assert df['COMMENTS'].tolist() == [
+        MISSING_DATA_COMMENT, MISSING_DATA_COMMENT, 'Arrears amount too low (MUR 50.00 < MUR 100)',
+        NO_ADDRESS_COMMENT, '', '']
+    assert valid_df['POL_NO'].tolist() == ['P5', 'P6']
+    assert counts == {'missing_data': 2, 'low_amount': 1, 'no_address': 1, 'valid': 2}
+
+
+def test_column_variations_are_tried_in_order():
+    df = pd.DataFrame({'Policy No': [None, 'P2'], 'POL_NO': ['P1', 'P9'], 'POLICY_HOLDER': ['Alice', 'Bob'],
+                       'Arrears': ['n/a', 0], 'TrueArrears': [1500, 700], 'ADDR': ['1 Royal Road', '2 Royal Road'],
+                       'COMMENTS': ''})
+    valid_df, counts = validate_arrears_rows(df, ['Policy No', 'POL_NO'], 'POLICY_HOLDER',
+                                             ['Arrears', 'TrueArrears'], [['ADDR']])
+    assert counts['valid'] == 2
+    assert valid_df.index.tolist() == [0, 1]
+
+
+def test_amount_is_the_first_positive_variation():
+    df = pd.DataFrame({'A': [None, 'abc', 0, -5, 200], 'B': [300, 400, 500, 600, 700]})
+    assert amount_column(df, ['A', 'B']).tolist() == [300, 400, 500, 600, 200]
+    # No positive variation: the last parsed amount is kept
+    assert amount_column(pd.DataFrame({'A': [-5], 'B': [0]}), ['A', 'B']).tolist() == [0]
+    assert amount_column(pd.DataFrame({'B': [1]}), ['A']).tolist() == [0]
+
+
+def test_nonmotor_l0_takes_the_first_non_missing_amount():
+    import NonMotor_L0
+    assert NonMotor_L0.TEMPLATE.first_positive_amount is False
+    df = pd.DataFrame({'A': [None, 'abc', 0, 200], 'B': [300, 400, 500, 700]})
+    # An unparseable or zero first value is not replaced by a later variation
+    assert amount_column(df, ['A', 'B'], first_positive=False).tolist() == [300, 0, 0, 200]
+    df = rows(('P1', 'Alice', 'abc', '1 Royal Road', None), ('P2', 'Bob', 1500, '2 Royal Road', None))
+    valid_df, counts = validate_arrears_rows(df, first_positive_amount=False)
+    assert df['COMMENTS'].tolist() == ['Arrears amount too low (MUR 0.00 < MUR 100)', '']
+    assert counts['valid'] == 1
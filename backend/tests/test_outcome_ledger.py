@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pandas as pd
+import pytest
+
+from outcome_ledger import export_workbook, ledger_path, read_outcomes, remove_ledger, write_outcomes
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = str(tmp_path / 'temp_L0.xlsx')
+    pd.DataFrame({'POL_NO': ['P1', 'P2', 'P3'], 'TrueArrears': [1500, 50, 900]}).to_excel(path, index=False)
+    return path
+
+
+def test_a_new_run_replaces_the_recorded_outcomes(input_file):
+    path = write_outcomes(input_file, ['Letter generated', 'Arrears amount too low', None])
+    assert path == ledger_path(input_file) and path.endswith('temp_L0.outcomes.sqlite')
+    assert read_outcomes(input_file) == ['Letter generated', 'Arrears amount too low', None]
+
+    write_outcomes(input_file, ['API Error due to data issues', 'Arrears amount too low', 'Letter generated'])
+    assert read_outcomes(input_file) == ['API Error due to data issues', 'Arrears amount too low',
+                                         'Letter generated']
+    assert not os.path.exists(f"{ledger_path(input_file)}.tmp")
+
+
+def test_outcomes_only_apply_to_the_workbook_they_were_recorded_for(input_file):
+    with pytest.raises(FileNotFoundError):
+        read_outcomes(input_file)
+    write_outcomes(input_file, ['Letter generated'] * 3)
+    pd.DataFrame({'POL_NO': ['P9'], 'TrueArrears': [100]}).to_excel(input_file, index=False)
+    with pytest.raises(ValueError):
+        read_outcomes(input_file)
+    remove_ledger(input_file)
+    assert not os.path.exists(ledger_path(input_file))
+
+
+def test_export_writes_the_annotated_workbook(input_file, tmp_path):
+    write_outcomes(input_file, ['Letter generated', 'Arrears amount too low', None])
+    output = str(tmp_path / 'annotated.xlsx')
+    export_workbook(input_file, output)
+    df = pd.read_excel(output)
+    assert df['POL_NO'].tolist() == ['P1', 'P2', 'P3']
+    assert df['COMMENTS'].fillna('').tolist() == ['Letter generated', 'Arrears amount too low', '']
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from qr_cache import QRCache, make_cache_key
+from zwennpay_qr import build_qr_payload
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ARREARS = build_qr_payload(153, 'HL.2024.0001', '57123456', 'Mr John Doe')
+RENEWAL = build_qr_payload(153, 'HL.2024.0001', '57123456', 'Mr John Doe', purpose='Healthcare Renewal')
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = QRCache(str(tmp_path / 'qr_cache.sqlite'))
+    yield cache
+    cache.close()
+
+
+def test_payloads_differing_only_by_purpose_do_not_share_an_entry(cache):
+    assert make_cache_key(ARREARS) != make_cache_key(RENEWAL)
+    cache.put(ARREARS, 'QR-ARREARS')
+    assert cache.get(RENEWAL) is None
+    cache.put(RENEWAL, 'QR-RENEWAL')
+    assert cache.get(ARREARS) == 'QR-ARREARS'
+    assert cache.get(RENEWAL) == 'QR-RENEWAL'
+    assert (cache.hits, cache.misses, cache.stored) == (2, 1, 2)
+
+
+def test_every_payload_field_is_part_of_the_key():
+    # Same request whatever the key order, a new value for any field is a new QR
+    assert make_cache_key(dict(reversed(list(ARREARS.items())))) == make_cache_key(ARREARS)
+    without_mobile = build_qr_payload(153, 'HL.2024.0001', '57123456', 'Mr John Doe', set_mobile=False)
+    assert make_cache_key(without_mobile) != make_cache_key(ARREARS)
+    assert make_cache_key(dict(ARREARS, MerchantId=171)) != make_cache_key(ARREARS)
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+def test_key_matches_the_node_cache():
+    payloads = [ARREARS, RENEWAL, dict(ARREARS, AdditionalCustomerLabel='Mme Zoë "Lépine"')]
+    script = ("import { makeCacheKey } from './services/qrCache.js';"
+              "const payloads = JSON.parse(process.argv[1]);"
+              "console.log(JSON.stringify(payloads.map(makeCacheKey)));")
+    result = subprocess.run(['node', '--input-type=module', '-e', script, json.dumps(payloads)],
+                            cwd=BACKEND_DIR, capture_output=True, text=True, encoding='utf-8', check=True)
+    assert json.loads(result.stdout) == [make_cache_key(payload) for payload in payloads]
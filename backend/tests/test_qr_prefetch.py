@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import zwennpay_qr
+
+
+def test_when_ready_waits_for_every_key(workdir, monkeypatch):
+    release = {bill: threading.Event() for bill in ('A', 'B')}
+
+    def fetch_qr_data(payload, session=None, timeout=None):
+        release[payload['AdditionalBillNumber']].wait(5)
+        return zwennpay_qr.cached_qr_result(f"QR-{payload['AdditionalBillNumber']}")
+
+    monkeypatch.setattr(zwennpay_qr, 'fetch_qr_data', fetch_qr_data)
+    prefetch = zwennpay_qr.QRPrefetch({bill: {'AdditionalBillNumber': bill} for bill in release}, concurrency=2)
+    try:
+        calls = []
+        done = threading.Event()
+        prefetch.when_ready(['A', 'B'], lambda: (calls.append('AB'), done.set()))
+        # Keys never requested are available right away
+        prefetch.when_ready(['C'], lambda: calls.append('C'))
+        assert calls == ['C']
+
+        release['A'].set()
+        assert prefetch.get('A')['qr_data'] == 'QR-A'
+        assert not done.wait(0.2)
+        release['B'].set()
+        assert done.wait(5) and calls == ['C', 'AB']
+    finally:
+        for event in release.values():
+            event.set()
+        prefetch.close()
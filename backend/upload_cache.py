@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# NICL Upload Cache - Parse each uploaded workbook once, keyed by its content hash
+# The upload analysis, recovery_processor, the letter generators and /send-emails all
+# read the same xlsx. The first reader stores the parsed DataFrame (Arrow IPC when
+# pyarrow is installed, read memory-mapped; a pickle otherwise) and a columnar JSON
+# copy for Node; later readers of the same bytes load that instead of the xlsx.
+# Shared with services/uploadCache.js (same folder, same key).
+
+import glob
+import hashlib
+import json
+import os
+import sys
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+UPLOAD_CACHE_DIR = os.environ.get(
+    'UPLOAD_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.upload_cache')
+)
+UPLOAD_CACHE_MAX_ENTRIES = int(os.environ.get('UPLOAD_CACHE_MAX_ENTRIES', '32'))
+
+# Python copies in order of preference; the JSON copy is only written for Node
+FRAME_FORMATS = ('arrow', 'pkl')
+
+
+def upload_cache_enabled():
+    """The cache can be switched off with UPLOAD_CACHE=0"""
+    return os.environ.get('UPLOAD_CACHE', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def content_hash(path):
+    """Cache key: SHA-256 of the workbook bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(key, extension):
+    return os.path.join(UPLOAD_CACHE_DIR, f"{key}.{extension}")
+
+
+def _write_atomic(path, write):
+    temp_path = f"{path}.tmp"
+    write(temp_path)
+    os.replace(temp_path, path)
+
+
+def _load_frame(key):
+    """Cached DataFrame of a key, or None on a miss or an unreadable entry"""
+    for extension in FRAME_FORMATS:
+        path = cache_path(key, extension)
+        if not os.path.exists(path) or (extension == 'arrow' and feather is None):
+            continue
+        try:
+            df = feather.read_feather(path, memory_map=True) if extension == 'arrow' else pd.read_pickle(path)
+            os.utime(path)  # Eviction drops the least recently used keys
+            return df
+        except Exception as e:
+            print(f"[WARNING] Ignoring unreadable upload cache {path}: {str(e)}")
+    return None
+
+
+def _store_frame(key, df):
+    """Store the DataFrame, as Arrow IPC when pyarrow can represent every column"""
+    if feather is not None:
+        try:
+            _write_atomic(cache_path(key, 'arrow'), lambda path: feather.write_feather(df, path))
+            return
+        except Exception:
+            pass  # Mixed-type object columns - keep an exact pickle instead
+    _write_atomic(cache_path(key, 'pkl'), df.to_pickle)
+
+
+def write_rows_json(key, df):
+    """Columnar JSON copy for Node: {"rows": n, "columns": [...], "data": [[column values], ...]}"""
+    path = cache_path(key, 'json')
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+    columns = json.dumps([str(column) for column in df.columns], ensure_ascii=False)
+    data = ','.join(df[column].to_json(orient='values', date_format='iso', force_ascii=False)
+                    for column in df.columns)
+
+    def write(temp_path):
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            handle.write(f'{{"rows": {len(df)}, "columns": {columns}, "data": [{data}]}}')
+
+    _write_atomic(path, write)
+    return path
+
+
+def evict_uploads(max_entries=UPLOAD_CACHE_MAX_ENTRIES):
+    """Keep the files of the max_entries most recently used keys"""
+    keys = {}
+    for path in glob.glob(os.path.join(UPLOAD_CACHE_DIR, '*.*')):
+        key = os.path.basename(path).split('.')[0]
+        keys[key] = max(keys.get(key, 0), os.path.getmtime(path))
+    for key in sorted(keys, key=keys.get, reverse=True)[max_entries:]:
+        for path in glob.glob(os.path.join(UPLOAD_CACHE_DIR, f"{key}.*")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def read_upload(path, rows_json=False):
+    """pd.read_excel(path), answered from the upload cache when the bytes were parsed before
+
+    Returns a fresh DataFrame the caller may modify. With rows_json=True the JSON
+    copy for Node is written as well. Cache errors never fail the read.
+    """
+    if not upload_cache_enabled():
+        return pd.read_excel(path, engine='openpyxl')
+
+    key = content_hash(path)
+    df = _load_frame(key)
+    if df is not None:
+        print(f"[INFO] Loaded {os.path.basename(path)} from the upload cache ({key[:12]})")
+    else:
+        df = pd.read_excel(path, engine='openpyxl')
+    try:
+        os.makedirs(UPLOAD_CACHE_DIR, exist_ok=True)
+        if not any(os.path.exists(cache_path(key, extension)) for extension in FRAME_FORMATS):
+            _store_frame(key, df)
+        if rows_json:
+            write_rows_json(key, df)
+        evict_uploads()
+    except Exception as e:
+        print(f"[WARNING] Could not update upload cache: {str(e)}")
+    return df
+
+
+def upload_summary(df):
+    """Record count and Recovery_action distribution (None when the column is absent)
+
+    Blank actions count as 'Unknown', like the Node analysis of /upload-excel.
+    """
+    distribution = None
+    if 'Recovery_action' in df.columns:
+        actions = df['Recovery_action'].where(df['Recovery_action'].notna() & (df['Recovery_action'] != ''),
+                                              'Unknown')
+        distribution = {str(action): int(count) for action, count in actions.value_counts(sort=False).items()}
+    return {'total_count': len(df), 'recovery_distribution': distribution}
+
+
+def main():
+    """python upload_cache.py <workbook> - cache it and print its summary as JSON (used by Node)"""
+    if len(sys.argv) < 2:
+        print(json.dumps({'success': False, 'error': 'Usage: python upload_cache.py <workbook.xlsx>'}))
+        sys.exit(1)
+    try:
+        # Keep stdout a single JSON document for the caller
+        sys.stdout = sys.stderr
+        df = read_upload(sys.argv[1], rows_json=True)
+        result = {'success': True, 'cache_key': content_hash(sys.argv[1]), **upload_summary(df)}
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+    finally:
+        sys.stdout = sys.__stdout__
+    print(json.dumps(result))
+    sys.exit(0 if result['success'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+# NICL ZwennPay QR Client - Payload building and pooled, concurrent QR fetching
+# Shared by the letter generators so every row's MauCAS QR is fetched ahead of rendering
+
+import io
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+import segno
+from reportlab.lib.utils import ImageReader
+from requests.adapters import HTTPAdapter
+
+from qr_cache import QRCache
+
+# Endpoint can be pointed at zwennpay_stub.py for offline runs and benchmarks
+ZWENNPAY_QR_URL = os.environ.get(
+    'ZWENNPAY_QR_URL',
+    "https://api.zwennpay.com:9425/api/v1.0/Common/GetMerchantQR"
+)
+ZWENNPAY_HEADERS = {"accept": "text/plain", "Content-Type": "application/json"}
+ZWENNPAY_TIMEOUT = 20
+
+# Maximum number of QR requests in flight at once
+DEFAULT_QR_CONCURRENCY = int(os.environ.get('ZWENNPAY_QR_CONCURRENCY', '8'))
+
+# Titles removed from the start of a policy holder name before building the label
+NAME_TITLES = ['Mr', 'Mrs', 'Ms', 'Miss', 'Dr', 'Prof', 'Sir', 'Madam']
+
+
+def get_qr_concurrency(argv, default=DEFAULT_QR_CONCURRENCY):
+    """Read the --qr-concurrency N option from the command line"""
+    for i, arg in enumerate(argv):
+        if arg == '--qr-concurrency' and i + 1 < len(argv):
+            try:
+                return max(1, int(argv[i + 1]))
+            except ValueError:
+                print(f"[WARNING] Invalid --qr-concurrency value '{argv[i + 1]}', using {default}")
+    return default
+
+
+def build_customer_label(policy_holder, strip_titles=True):
+    """Build the 24-character "initial + surname" customer label for the QR"""
+    if not policy_holder or not policy_holder.strip():
+        return ''
+
+    # Clean the policy holder name - replace hyphens with spaces for API compatibility
+    clean_policy_holder = policy_holder.strip().replace('-', ' ')
+    name_parts = clean_policy_holder.split()
+
+    # Remove common titles from the beginning
+    if strip_titles and name_parts and name_parts[0] in NAME_TITLES:
+        name_parts = name_parts[1:]
+
+    if len(name_parts) >= 2:
+        # Assume last part is surname, first part is first name
+        first_name = name_parts[0]
+        surname = name_parts[-1]
+
+        # Create first initial + surname
+        first_initial = first_name[0].upper() if first_name else ''
+        customer_label_temp = f"{first_initial} {surname}" if first_initial and surname else surname
+
+        # Truncate intelligently if > 24 chars (prioritize keeping surname)
+        if len(customer_label_temp) > 24:
+            if len(surname) <= 22:  # Leave space for initial + space
+                return f"{first_initial} {surname}"[:24]
+            return surname[:24]  # Just surname if too long
+        return customer_label_temp
+    elif len(name_parts) == 1:
+        # Single name after removing title
+        return name_parts[0][:24]
+
+    # Fallback to original cleaned name
+    return clean_policy_holder[:24]
+
+
+def clean_mobile_number(mobile_raw):
+    """Convert an Excel mobile number (often a float) to a clean integer string"""
+    try:
+        if mobile_raw is None or mobile_raw == '' or mobile_raw != mobile_raw:
+            return ''
+        return str(int(float(mobile_raw)))
+    except (ValueError, TypeError):
+        return ''
+
+
+def build_qr_payload(merchant_id, bill_number, mobile_no, customer_label,
+                     purpose="Arrears Payment", set_mobile=True):
+    """Build the GetMerchantQR request body"""
+    return {
+        "MerchantId": merchant_id,
+        "SetTransactionAmount": False,
+        "TransactionAmount": 0,
+        "SetConvenienceIndicatorTip": False,
+        "ConvenienceIndicatorTip": 0,
+        "SetConvenienceFeeFixed": False,
+        "ConvenienceFeeFixed": 0,
+        "SetConvenienceFeePercentage": False,
+        "ConvenienceFeePercentage": 0,
+        "SetAdditionalBillNumber": True,
+        "AdditionalRequiredBillNumber": False,
+        "AdditionalBillNumber": str(bill_number),
+        "SetAdditionalMobileNo": set_mobile,
+        "AdditionalRequiredMobileNo": False,
+        "AdditionalMobileNo": str(mobile_no),
+        "SetAdditionalStoreLabel": False,
+        "AdditionalRequiredStoreLabel": False,
+        "AdditionalStoreLabel": "",
+        "SetAdditionalLoyaltyNumber": False,
+        "AdditionalRequiredLoyaltyNumber": False,
+        "AdditionalLoyaltyNumber": "",
+        "SetAdditionalReferenceLabel": False,
+        "AdditionalRequiredReferenceLabel": False,
+        "AdditionalReferenceLabel": "",
+        "SetAdditionalCustomerLabel": True,
+        "AdditionalRequiredCustomerLabel": False,
+        "AdditionalCustomerLabel": str(customer_label),
+        "SetAdditionalTerminalLabel": False,
+        "AdditionalRequiredTerminalLabel": False,
+        "AdditionalTerminalLabel": "",
+        "SetAdditionalPurposeTransaction": True,
+        "AdditionalRequiredPurposeTransaction": False,
+        "AdditionalPurposeTransaction": str(purpose)
+    }
+
+
+def create_session(pool_size=DEFAULT_QR_CONCURRENCY):
+    """Create one keep-alive session sized for pool_size concurrent requests"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(ZWENNPAY_HEADERS)
+    return session
+
+
+def fetch_qr_data(payload, session=None, timeout=ZWENNPAY_TIMEOUT):
+    """Request QR data for one payload and return a result dict
+
+    The result always has the keys qr_data (None unless valid), status_code,
+    response_text, error and network_error so callers can report failures the
+    same way they did when posting inline.
+    """
+    result = {'qr_data': None, 'status_code': None, 'response_text': '', 'error': None, 'network_error': False}
+    try:
+        poster = session if session is not None else requests
+        response = poster.post(ZWENNPAY_QR_URL, headers=ZWENNPAY_HEADERS, json=payload, timeout=timeout)
+        result['status_code'] = response.status_code
+        result['response_text'] = response.text
+        if response.status_code == 200:
+            qr_data = str(response.text).strip()
+            if qr_data and qr_data.lower() not in ('null', 'none', 'nan'):
+                result['qr_data'] = qr_data
+    except requests.exceptions.RequestException as e:
+        result['error'] = str(e)
+        result['network_error'] = True
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+def make_qr_image(qr_data):
+    """Render a QR string to an in-memory PNG ImageReader for canvas.drawImage"""
+    buffer = io.BytesIO()
+    segno.make(qr_data, error='L').save(buffer, kind='png', scale=8, border=2, dark='#000000')
+    buffer.seek(0)
+    return ImageReader(buffer)
+
+
+def cached_qr_result(qr_data):
+    """Result dict for a QR string served from the cache"""
+    return {'qr_data': qr_data, 'status_code': 200, 'response_text': qr_data, 'error': None, 'network_error': False}
+
+
+class QRPrefetch:
+    """Background QR fetches keyed by row, consumed by the render loop as they complete
+
+    Payloads found in the persistent QR cache are answered immediately; only the
+    misses go to the API, and every valid response is written back to the cache.
+    """
+
+    def __init__(self, payloads, concurrency=DEFAULT_QR_CONCURRENCY, cache=None):
+        self.concurrency = max(1, concurrency)
+        self._cache = cache if cache is not None else QRCache.open_default()
+        self._session = create_session(self.concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='qr')
+        self._futures = {}
+        cache_hits = 0
+        for key, payload in payloads.items():
+            qr_data = self._cache.get(payload) if self._cache is not None else None
+            if qr_data:
+                cache_hits += 1
+                future = Future()
+                future.set_result(cached_qr_result(qr_data))
+                self._futures[key] = future
+            else:
+                self._futures[key] = self._executor.submit(self._fetch, payload)
+        print(f"[INFO] Prefetching {len(self._futures) - cache_hits} QR codes with {self.concurrency} "
+              f"concurrent requests ({cache_hits} served from QR cache)")
+
+    def _fetch(self, payload):
+        result = fetch_qr_data(payload, self._session)
+        if self._cache is not None and result['qr_data']:
+            self._cache.put(payload, result['qr_data'])
+        return result
+
+    def __contains__(self, key):
+        return key in self._futures
+
+    def get(self, key):
+        """Block until the QR result for key is available (None if never requested)"""
+        future = self._futures.get(key)
+        return future.result() if future is not None else None
+
+    def when_ready(self, keys, callback):
+        """Call callback() once the QR results of all keys are available
+
+        It runs in the thread completing the last fetch, or right away when every
+        result is already there (keys never requested count as available).
+        """
+        futures = [self._futures[key] for key in keys if key in self._futures]
+        pending = [len(futures)]
+        lock = threading.Lock()
+
+        def fetched(future):
+            with lock:
+                pending[0] -= 1
+                ready = pending[0] == 0
+            if ready:
+                callback()
+
+        if not futures:
+            callback()
+        for future in futures:
+            future.add_done_callback(fetched)
+
+    def results(self):
+        """Wait for every fetch and return {key: result}"""
+        return {key: future.result() for key, future in self._futures.items()}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._session.close()
+        if self._cache is not None:
+            self._cache.close()
+
+
+def prefetch_qr_data(payloads, concurrency=DEFAULT_QR_CONCURRENCY, cache=None):
+    """Fetch every payload concurrently over one session and return {key: result}"""
+    prefetch = QRPrefetch(payloads, concurrency, cache)
+    try:
+        return prefetch.results()
+    finally:
+        prefetch.close()
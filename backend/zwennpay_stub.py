@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# NICL ZwennPay Stub Server - Local stand-in for GetMerchantQR
+# Lets the QR prefetch stage be exercised and benchmarked without network access
+#
+# Usage:
+#   python zwennpay_stub.py --port 8765 --latency 0.3
+#       then run a generator with ZWENNPAY_QR_URL=http://127.0.0.1:8765/api/v1.0/Common/GetMerchantQR
+#   python zwennpay_stub.py --benchmark 500 --concurrency 16 --latency 0.1
+#       compares one-by-one posting with the pooled prefetch stage
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from qr_cache import QRCache
+
+
+def make_handler(latency):
+    """Build a request handler that answers every POST after `latency` seconds"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length)
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                payload = {}
+
+            if latency:
+                time.sleep(latency)
+
+            # Deterministic QR string derived from the bill number and label
+            key = f"{payload.get('MerchantId')}|{payload.get('AdditionalBillNumber')}|{payload.get('AdditionalCustomerLabel')}"
+            qr_data = "00020101021226" + hashlib.sha1(key.encode('utf-8')).hexdigest().upper()
+
+            response = qr_data.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(port=0, latency=0.0):
+    """Start the stub in a background thread and return (server, url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(latency))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v1.0/Common/GetMerchantQR"
+    return server, url
+
+
+def run_benchmark(rows, concurrency, latency):
+    """Time sequential inline posting against the pooled prefetch stage"""
+    server, url = start_stub_server(latency=latency)
+    os.environ['ZWENNPAY_QR_URL'] = url
+    import zwennpay_qr
+    zwennpay_qr.ZWENNPAY_QR_URL = url
+
+    payloads = {
+        i: zwennpay_qr.build_qr_payload(153, f"HL.2024.{i:06d}", "57123456", f"J Customer{i}")
+        for i in range(rows)
+    }
+
+    print(f"📊 Benchmarking {rows} QR requests (stub latency {latency * 1000:.0f} ms)")
+
+    start = time.perf_counter()
+    for payload in payloads.values():
+        zwennpay_qr.fetch_qr_data(payload)
+    sequential_time = time.perf_counter() - start
+    print(f"   Sequential (new connection per row): {sequential_time:.2f}s ({rows / sequential_time:.1f} req/s)")
+
+    # Throwaway QR cache so the benchmark never touches the shared one
+    cache_dir = tempfile.mkdtemp()
+    cache_path = os.path.join(cache_dir, 'qr_cache.sqlite')
+
+    start = time.perf_counter()
+    results = zwennpay_qr.prefetch_qr_data(payloads, concurrency, QRCache(cache_path))
+    prefetch_time = time.perf_counter() - start
+    valid = sum(1 for result in results.values() if result['qr_data'])
+    print(f"   Prefetch (pooled, concurrency {concurrency}): {prefetch_time:.2f}s ({rows / prefetch_time:.1f} req/s)")
+    print(f"   ✅ {valid}/{rows} QR payloads received - speed-up x{sequential_time / prefetch_time:.1f}")
+
+    start = time.perf_counter()
+    zwennpay_qr.prefetch_qr_data(payloads, concurrency, QRCache(cache_path))
+    cached_time = time.perf_counter() - start
+    print(f"   Repeat run (QR cache warm): {cached_time:.2f}s - speed-up x{sequential_time / cached_time:.1f}")
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local ZwennPay GetMerchantQR stub')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated response latency in seconds')
+    parser.add_argument('--benchmark', type=int, default=0, help='Run a prefetch benchmark with N requests and exit')
+    parser.add_argument('--concurrency', type=int, default=8, help='Prefetch concurrency for --benchmark')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark, args.concurrency, args.latency)
+        return
+
+    server, url = start_stub_server(args.port, args.latency)
+    print(f"🚀 ZwennPay stub listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()